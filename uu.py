@@ -21,59 +21,677 @@
 # Thanks.
 
 
+import sys
 import struct
-import uuid
 import re
 import base64
 import zlib
 import traceback
+import mmap
+import os
+import stat
+import threading
+import io
+import weakref
+import itertools
+import errno
+import bisect
+import Queue
+import time
+import json
+import functools
+import hashlib
+import random
+
+from collections import OrderedDict
+
+# numpy is optional, with it tables of records are decoded in bulk ( see Table )
+# it is only imported once a table is, as importing it takes far longer than the
+# whole of this module, which short lived x.py runs would otherwise all pay for
+# 
+NUMPY = False # not looked for yet
+
+def optional_numpy():
+    # the numpy module, or None when it is unavailable
+    
+    global NUMPY
+    
+    if NUMPY is False:
+        try:
+            import numpy as NUMPY
+        except ImportError:
+            NUMPY = None
+    
+    return NUMPY
 
 
 ####################################################################################
 ## global to control block memoization
 ## every memoized block function must have an entry here or it will die
 
-# name : number-of-returns-to-memoize
+# name : bytes-of-returns-to-memoize
+# 
+# budgets can be changed at runtime with Common.set_memoization_budget, and from the
+# environment with a comma separated list of name=size, eg
+#   UU_MEMOIZATION=blocks=16m
+# 
+# every block device shares the one 'blocks' cache, each memoized function declaring
+# a priority for its entries ( see the CACHE_PRIORITY_* values below )
+# 
 MEMOIZATION = {
-    'file-blocks'               : 10 ,
-    'qcow2-blocks'              : 10 ,
-    'ext-inode-contents-blocks' : 10 ,
-    'apple-disk-image-blocks'   : 10 ,
+    'blocks' : 8 * 1024 * 1024 ,
     }
 
+# one budget for everything the governor watches, the memoization caches and the
+# read-ahead buffers, however many of them there are ( see MemoryGovernor )
+# overridden from the environment with, for example,
+#   UU_MEMORY_BUDGET=512m
+# 
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+# priorities for memoized entries, the lowest are evicted first
+# 
+#   streaming : raw data pulled off the backing file, likely read once and moved past
+#   contents  : blocks of layers built atop other layers, costlier to recreate
+#   metadata  : tables and directories consulted again and again while reading
+# 
+# a device may override the priority its function declared by setting _cachePriority
+# 
+CACHE_PRIORITY_STREAMING = 0
+CACHE_PRIORITY_CONTENTS  = 1
+CACHE_PRIORITY_METADATA  = 2
+
+# memoized entries are keyed on a small number handed out to each owner the first time
+# it caches anything, rather than on the owner itself, so the cache never holds it
+# 
+CACHE_IDENTITIES    = itertools.count( 1 )
+CACHE_IDENTITY_LOCK = threading.Lock()
+
+# what a memoized return is charged against the budget when it cannot tell us its size
+# mostly small rados pointing into other rados
+# 
+MEMOIZATION_ENTRY_COST = 256
+
 # for the File__BlockDevice class
 # 
 FILE_BLOCK_SIZE = 4096
 
+# handed out for every block that falls in a hole of a sparse file, instead of reading it
+# 
+FILE_ZERO_BLOCK = '\0' * FILE_BLOCK_SIZE
+
+# lseek whence values for finding the data and holes in sparse files ( see AllocationMap )
+# python 2 does not name them, so they are filled in for the platforms known to have them
+# 
+SEEK_DATA = getattr( os, 'SEEK_DATA', None )
+SEEK_HOLE = getattr( os, 'SEEK_HOLE', None )
+
+if SEEK_DATA == None:
+    if sys.platform.startswith( ( 'linux', 'freebsd', 'sunos' ) ):
+        SEEK_DATA, SEEK_HOLE = 3, 4
+    elif sys.platform == 'darwin':
+        SEEK_DATA, SEEK_HOLE = 4, 3
+
+# per layer i/o accounting, off by default as it costs a little on every read
+# turned on with Common.set_io_accounting, or from the environment with
+#   UU_IO_ACCOUNTING=1
+# 
+IO_ACCOUNTING = os.environ.get( 'UU_IO_ACCOUNTING', '' ) not in ( '', '0' )
+
+# tracing of reads, block fetches and model navigation as timed spans, also off by
+# default. turned on with Common.set_tracing, or from the environment with
+#   UU_TRACE=1
+# spans past TRACE_MAXIMUM_SPANS are counted but not kept
+# 
+TRACING             = os.environ.get( 'UU_TRACE', '' ) not in ( '', '0' )
+TRACE_MAXIMUM_SPANS = 1000000
+
+# worker threads in the executor shared by the asynchronous facade ( see AsyncRado )
+# 
+ASYNC_WORKERS = 4
+
+# model probing confirms its candidates on PROBE_WORKERS threads of its own when reading
+# the probe windows took longer than PROBE_SLOW_SECONDS, the backing store then being
+# slow enough ( deep inside a dmg, say ) that overlapping the checks pays. turned off with
+#   UU_PROBE_WORKERS=0
+# 
+PROBE_WORKERS      = int( os.environ.get( 'UU_PROBE_WORKERS', '4' ) )
+PROBE_SLOW_SECONDS = 0.005
+
 # this is a just in case mechanism to avoid stomping the memory
 # todo: there should be a flag or something to turn it off or
 #   change its value or something
 # 
 MAXIMUM_ALLOWED_READ = 64 * 1024
 
-####################################################################################
-## simple print statement debuggers to active / deactivate during development
+# default size of the chunks handed out by the rados iter_chunks, for bulk readers
+# a multiple of every block size in use, so chunks line up with the blocks beneath
+# 
+CHUNK_SIZE = 1024 * 1024
 
-class Debugger():
-    def __init__( self, name, active ):
+# cursor line reading pulls data in chunks and splits it, rather than going a byte at
+# a time. readline starts small and doubles up to the maximum for long lines
+# 
+LINE_CHUNK_MINIMUM = 256
+LINE_CHUNK_MAXIMUM = 64 * 1024
+
+# read-ahead for RadoBlock, in bytes
+# each read continuing where the last left off doubles the window from the minimum up
+# to the maximum, anything else drops it back to nothing
+# 
+READ_AHEAD_MINIMUM = 16 * 1024
+READ_AHEAD_MAXIMUM = 1024 * 1024
+
+####################################################################################
+## logging
+##   level gated messages for development and diagnosis, written to LOG_STREAM so
+##   stdout is left to the data. arguments are only formatted into the message if it
+##   is going to be written, and hot paths guard the call itself so a quiet logger
+##   costs them one attribute check
+##   
+##       if LOG_FILE.debugging:
+##           LOG_FILE.debug( 'read position:%s amount:%s', position, amount )
+##   
+##   levels are set with Common.set_log_level, or from the environment as a comma
+##   separated list of name=level, a bare level applying to every logger
+##       UU_LOG=info,ext=debug
+
+LOG_DEBUG   = 10
+LOG_INFO    = 20
+LOG_WARNING = 30
+LOG_ERROR   = 40
+LOG_OFF     = 50
+
+LOG_LEVELS = OrderedDict([
+    ( 'debug'  , LOG_DEBUG   ) ,
+    ( 'info'   , LOG_INFO    ) ,
+    ( 'warning', LOG_WARNING ) ,
+    ( 'error'  , LOG_ERROR   ) ,
+    ( 'off'    , LOG_OFF     ) ,
+    ])
+
+LOG_LEVEL  = LOG_WARNING # for loggers made from here on
+LOG_STREAM = sys.stderr
+LOG_LOCK   = threading.Lock()
+LOGGERS    = OrderedDict()
+
+class Logger():
+    def __init__( self, name ):
         self._name = name
-        self._active = active
+        self.set_level( LOG_LEVEL )
+        LOGGERS[ name ] = self
+        return
+    
+    def __repr__( self ):
+        return '<Logger name:%s level:%s>' % (
+            repr( self._name  ) ,
+            repr( self._level ) ,
+            )
+    
+    def set_level( self, level ):
+        self._level    = level
+        self.debugging = level <= LOG_DEBUG
+        return
+    
+    def enabled( self, level ):
+        return level >= self._level
+    
+    def log( self, level, message, *args ):
+        if level < self._level:
+            return
+        
+        if args:
+            message = message % args
+        
+        levelNames = [ name for name, value in LOG_LEVELS.items() if value == level ]
+        
+        with LOG_LOCK:
+            LOG_STREAM.write( '[%s:%s] %s\n' % (
+                    self._name                                    ,
+                    levelNames[0] if levelNames else str( level ) ,
+                    message                                       ,
+                    ))
+            LOG_STREAM.flush()
+        return
+    
+    def debug( self, message, *args ):
+        if self.debugging:
+            self.log( LOG_DEBUG, message, *args )
+    
+    def info( self, message, *args ):
+        self.log( LOG_INFO, message, *args )
+    
+    def warning( self, message, *args ):
+        self.log( LOG_WARNING, message, *args )
+    
+    def error( self, message, *args ):
+        self.log( LOG_ERROR, message, *args )
+
+LOG_FILE    = Logger( 'file'    )
+LOG_MEMO    = Logger( 'memo'    )
+LOG_MODELS  = Logger( 'models'  )
+LOG_EXT     = Logger( 'ext'     )
+LOG_HFS     = Logger( 'hfs'     )
+LOG_QCOW2   = Logger( 'qcow2'   )
+LOG_FAT     = Logger( 'fat'     )
+LOG_STUFFIT = Logger( 'stuffit' )
+LOG_CPIO    = Logger( 'cpio'    )
+LOG_ASYNC   = Logger( 'async'   )
+
+####################################################################################
+## threads
+##   one opened model tree may be read from any number of threads at once, all of them
+##   sharing its warm caches
+## 
+##   - rados, block devices and models only change what they learned opening the data
+##     behind locks. that is the memoization caches, RadoBlock read-ahead, the seeks of
+##     PositionalReader and the counters of blocks read
+##   - a cursor carries a position and belongs to whoever made it. every thread makes
+##     its own with rado.cursor(), they cost next to nothing
+##   - memoized values are produced outside the cache lock, so two threads missing on
+##     the same entry at once may both produce it. only one is kept
+##   - dmg udzo sectors each decompress from their own copy of the zlib state, so a
+##     decompressor is never shared between reads
+##   - a RadoBlock only locks to look at or swap its read-ahead buffer. reads it cannot
+##     serve go to the device straight away, so threads reading one shared layer ( the
+##     image file, a dmg partition, a qcow2 main image ) are not serialized on it
+##   - Common.check_threads reads one rado from many threads at once and compares what
+##     they saw with a single thread, x.py -check-threads runs it on the current model
+
+class Counter():
+    # a count that may be added to from many threads
+    
+    def __init__( self, value = 0 ):
+        self._value = value
+        self._lock  = threading.Lock()
+        return
+    
+    def __repr__( self ):
+        return '<Counter value:%s>' % (
+            repr( self._value ) ,
+            )
+    
+    def add( self, amount = 1 ):
+        with self._lock:
+            self._value += amount
+            return self._value
+    
+    def value( self ):
+        return self._value
+
+
+####################################################################################
+## least recently used cache backing the memoization
+
+class LruCache():
+    # holds values up to a budget of bytes, dropping the least recently used first
+    # the ordered dicts keep the recency order, so hits and evictions are O(1)
+    # 
+    # entries are stored in priority tiers, and under pressure the lowest tier is
+    # drained before anything is taken from a higher one, so a long streaming read
+    # through the data blocks cannot push out the tables every other read depends on
+    # 
+    # entries may belong to an owner ( normally a block device ), which is only held
+    # weakly. when the owner goes away its entries are dropped with it, rather than
+    # the cache keeping dead devices and their blocks alive until they age out
+    
+    def __init__( self, name, budget ):
+        self._name       = name
+        self._budget     = budget
+        self._tiers      = {}  # priority : OrderedDict( key : ( value, cost, stamp ) )
+        self._priorities = {}  # key : priority
+        self._used       = 0
+        
+        self._owners     = {}  # identity : weakref to the owner
+        self._ownerKeys  = {}  # identity : set of keys
+        self._keyOwners  = {}  # key : identity
+        
+        self._hits       = 0
+        self._misses     = 0
+        self._evictions  = 0
+        self._discards   = 0
+        
+        # read-ahead threads share the cache with the foreground
+        # reentrant, as collecting an owner can drop its entries from inside a store
+        # 
+        self._lock       = threading.RLock()
+        
+        GOVERNOR.register( self )
+        return
+    
+    def __repr__( self ):
+        return '<LruCache name:%s budget:%s used:%s entries:%s>' % (
+            repr( self._name              ) ,
+            repr( self._budget            ) ,
+            repr( self._used              ) ,
+            repr( len( self._priorities ) ) ,
+            )
+    
+    def lookup( self, key ):
+        # returns ( found, value ), marking the entry as most recently used
+        
+        with self._lock:
+            priority = self._priorities.get( key )
+            
+            if priority is None:
+                self._misses += 1
+                return False, None
+            
+            tier = self._tiers[ priority ]
+            
+            value, cost, _ = tier.pop( key )
+            tier[ key ] = ( value, cost, next( MEMORY_CLOCK ) )
+            
+            self._hits += 1
+            return True, value
+    
+    def store( self, key, value, cost, priority = 0, owner = None ):
+        with self._lock:
+            if key in self._priorities:
+                self._remove( key )
+            
+            # don't flush the whole cache for something that could never fit anyways
+            # 
+            if cost > self._budget:
+                return
+            
+            if priority not in self._tiers:
+                self._tiers[ priority ] = OrderedDict()
+            
+            self._tiers[ priority ][ key ] = ( value, cost, next( MEMORY_CLOCK ) )
+            self._priorities[ key ] = priority
+            self._used += cost
+            
+            if owner is not None:
+                self._adopt( key, owner )
+            
+            self._evict()
+            GOVERNOR.report( self, self._used )
+        
+        GOVERNOR.charge()
+        return
+    
+    def resize( self, budget ):
+        with self._lock:
+            self._budget = budget
+            self._evict()
+            GOVERNOR.report( self, self._used )
+            return
+    
+    def clear( self ):
+        with self._lock:
+            for key in list( self._priorities ):
+                self._remove( key )
+            GOVERNOR.report( self, self._used )
+            return
+    
+    def memory_used( self ):
+        return self._used
+    
+    def coldest( self ):
+        with self._lock:
+            for priority in sorted( self._tiers ):
+                tier = self._tiers[ priority ]
+                if tier:
+                    _, cost, stamp = tier[ next( iter( tier ) ) ]
+                    return priority, stamp, cost
+            return None
+    
+    def release_coldest( self ):
+        with self._lock:
+            for priority in sorted( self._tiers ):
+                tier = self._tiers[ priority ]
+                if tier:
+                    key = next( iter( tier ) )
+                    _, cost, _ = tier[ key ]
+                    self._remove( key )
+                    self._evictions += 1
+                    GOVERNOR.report( self, self._used )
+                    return cost
+            return 0
+    
+    def discard_owner( self, identity ):
+        # drops everything stored on behalf of the owner
+        
+        with self._lock:
+            for key in list( self._ownerKeys.get( identity, () ) ):
+                self._remove( key )
+                self._discards += 1
+            
+            self._ownerKeys.pop( identity, None )
+            self._owners.pop( identity, None )
+            GOVERNOR.report( self, self._used )
+            return
+    
+    def _adopt( self, key, owner ):
+        identity = Common.cache_identity( owner )
+        
+        if identity not in self._owners:
+            # the callback must not hold the owner, only its identity
+            # 
+            def collected( reference, identity = identity ):
+                self.discard_owner( identity )
+            
+            self._owners[ identity ] = weakref.ref( owner, collected )
+            self._ownerKeys[ identity ] = set()
+        
+        self._ownerKeys[ identity ].add( key )
+        self._keyOwners[ key ] = identity
+        return
+    
+    def _remove( self, key ):
+        priority = self._priorities.pop( key )
+        
+        _, cost, _ = self._tiers[ priority ].pop( key )
+        self._used -= cost
+        
+        identity = self._keyOwners.pop( key, None )
+        if identity is not None:
+            self._ownerKeys[ identity ].discard( key )
+        
+        return
+    
+    def _evict( self ):
+        while self._used > self._budget:
+            for priority in sorted( self._tiers ):
+                if self._tiers[ priority ]:
+                    break
+            
+            key = next( iter( self._tiers[ priority ] ) )
+            self._remove( key )
+            self._evictions += 1
+        return
+    
+    def stats( self ):
+        with self._lock:
+            attributes = Attributes()
+            
+            attributes.put( 'budget'   , self._budget            )
+            attributes.put( 'used'     , self._used              )
+            attributes.put( 'entries'  , len( self._priorities ) )
+            attributes.put( 'owners'   , len( self._owners )     )
+            attributes.put( 'hits'     , self._hits              )
+            attributes.put( 'misses'   , self._misses            )
+            attributes.put( 'evictions', self._evictions         )
+            attributes.put( 'discards' , self._discards          )
+            
+            tiers = Attributes()
+            for priority in sorted( self._tiers ):
+                tier = self._tiers[ priority ]
+                tiers.put( 'priority-%s' % priority, '%s entries, %s bytes' % (
+                    len( tier )                                     ,
+                    sum( cost for _, cost, _ in tier.itervalues() ) ,
+                    ))
+            attributes.put( 'tiers', tiers )
+            
+            return attributes
+
+# name : LruCache, filled in as memoized functions are declared
+# 
+CACHES = {}
+
+
+####################################################################################
+## memory governor
+##   each LruCache keeps to its own budget, but a process opening thousands of images
+##   holds read-ahead buffers for every rado it reads and a cache for every name, and
+##   nothing bounded the sum. the governor holds one budget over all of them
+##   
+##   consumers register themselves and report what they hold as it changes. when the
+##   total goes over budget the governor takes from whichever consumer offers the
+##   coldest entry: lowest priority first, then the largest cost times the time since
+##   it was last used, so a big stale block goes before a small one in use
+##   
+##   a consumer implements
+##     memory_used()     : bytes held
+##     coldest()         : ( priority, stamp, cost ) of what it would give up first,
+##                         or None if it holds nothing. stamps come from MEMORY_CLOCK
+##     release_coldest() : gives that up, returning the bytes freed, or None if it
+##                         cannot just now
+##   and calls GOVERNOR.report( self, used ) whenever what it holds changes, then
+##   GOVERNOR.charge() once it no longer holds its own lock
+
+MEMORY_CLOCK = itertools.count( 1 ) # stamps for recency, shared by all consumers
+
+class MemoryGovernor():
+    def __init__( self, budget ):
+        self._budget    = budget
+        self._consumers = {} # identity : weakref to the consumer
+        self._usage     = {} # identity : bytes last reported
+        self._used      = 0
+        self._evictions = 0
+        self._released  = 0
+        
+        # the usage lock is only ever taken last, consumers report while holding
+        # their own locks. the eviction lock is held while calling into consumers
+        # 
+        self._usageLock = threading.Lock()
+        self._evictLock = threading.Lock()
+        return
+    
+    def __repr__( self ):
+        return '<MemoryGovernor budget:%s used:%s consumers:%s>' % (
+            repr( self._budget           ) ,
+            repr( self._used             ) ,
+            repr( len( self._consumers ) ) ,
+            )
+    
+    def register( self, consumer ):
+        identity = Common.cache_identity( consumer )
+        
+        # when a consumer goes away, so does what it held
+        # 
+        def collected( reference, identity = identity ):
+            with self._usageLock:
+                self._consumers.pop( identity, None )
+                self._used -= self._usage.pop( identity, 0 )
+        
+        with self._usageLock:
+            if identity not in self._consumers:
+                self._consumers[ identity ] = weakref.ref( consumer, collected )
+                self._usage[ identity ] = 0
+        return
+    
+    def report( self, consumer, used ):
+        identity = Common.cache_identity( consumer )
+        
+        with self._usageLock:
+            if identity in self._usage:
+                self._used += used - self._usage[ identity ]
+                self._usage[ identity ] = used
+        return
+    
+    def charge( self ):
+        # brings the total back under budget, if need be
+        # a thread finding another already evicting leaves it to them
+        
+        if self._used <= self._budget:
+            return
+        
+        if not self._evictLock.acquire( False ):
+            return
+        
+        try:
+            busy = set()
+            while self._used > self._budget:
+                if not self._release_coldest( busy ):
+                    break
+        finally:
+            self._evictLock.release()
+        
         return
     
-    def debug( self, * messages ):
-        if self._active:
-            print ( '[%s]' % self._name ) ,
-            for message in messages:
-                print message ,
-            print
+    def _release_coldest( self, busy ):
+        # consumers that could not give anything up are skipped for the rest of
+        # this charge
+        
+        now = next( MEMORY_CLOCK )
+        
+        with self._usageLock:
+            references = self._consumers.items()
+        
+        victim = None
+        for identity, reference in references:
+            consumer = reference()
+            if consumer is None or identity in busy:
+                continue
+            
+            candidate = consumer.coldest()
+            if candidate is None:
+                continue
+            
+            priority, stamp, cost = candidate
+            score = ( -priority, ( now - stamp ) * max( cost, 1 ) )
+            
+            if victim is None or score > victim[ 0 ]:
+                victim = ( score, identity, consumer )
+        
+        if victim is None:
+            return False
+        
+        _, identity, consumer = victim
+        
+        released = consumer.release_coldest()
+        if released is None:
+            busy.add( identity )
+            return True
+        
+        self._evictions += 1
+        self._released  += released
+        return True
+    
+    def resize( self, budget ):
+        self._budget = budget
+        self.charge()
         return
     
-    __call__ = debug
+    def share( self ):
+        # the most a single buffer should take, so that filling it does not push out
+        # everything else, only to be pushed out itself on the next read
+        return self._budget / 4
+    
+    def stats( self ):
+        attributes = Attributes()
+        
+        attributes.put( 'budget'   , self._budget    )
+        attributes.put( 'used'     , self._used      )
+        attributes.put( 'evictions', self._evictions )
+        attributes.put( 'released' , self._released  )
+        
+        with self._usageLock:
+            references = sorted( self._consumers.items() )
+        
+        # named by identity as well, many rados share a name and repr
+        consumers = Attributes()
+        for identity, consumer in ( ( identity, reference() ) for identity, reference in references ):
+            if consumer is not None and consumer.memory_used():
+                consumers.put( '#%s %s' % ( identity, repr( consumer ) ), consumer.memory_used() )
+        attributes.put( 'consumers', consumers )
+        
+        return attributes
+
+GOVERNOR = MemoryGovernor( MEMORY_BUDGET )
 
-DEBUG_FILE    = Debugger( 'DEBUG-FILE'   , False )
-DEBUG_EXT     = Debugger( 'DEBUG-EXT'    , False )
-DEBUG_MEMO    = Debugger( 'DEBUG-MEMO'   , False )
-DEBUG_BACKING = Debugger( 'DEBUG-BACKING', False )
 
 ####################################################################################
 ## the cursor makes for simple interaction with the rados
@@ -98,6 +716,7 @@ class Cursor():
         # create a rado of size from the current location
         # do not optimize a size None rado from offset 0 to return the underlying rado directly
         # some rados depend on RadoRado to massage incoming reads, and may fail if it is bypassed
+        # wrapping is cheap, RadoRado folds itself into any RadoRado it is given
         return RadoRado( 
             name   = 'cursor-rado'  ,
             rado   = self._rado     ,
@@ -123,6 +742,14 @@ class Cursor():
         chunk, _ = self.readlen( amount )
         return chunk
     
+    def readinto( self, view ):
+        # fills as much of the given writable buffer as possible, returning the amount read
+        # the caller already owns the memory here, so MAXIMUM_ALLOWED_READ does not apply
+        # 
+        amount = self._rado.readintoat( self._position, memoryview( view ) )
+        self._position += amount
+        return amount
+    
     def skip( self, amount ):
         # you may skip backwards, but never before position 0
         
@@ -164,6 +791,7 @@ class Cursor():
         return chunk
     
     def uuid( self ):
+        import uuid # deferred, it loads ctypes and libuuid
         return str( uuid.UUID( bytes = self.read( 16 ) ) )
     
     def uint64lsb( self ):
@@ -193,22 +821,64 @@ class Cursor():
     # helperer functions
     
     def readline( self ):
-        line = []
+        # reads through the next newline, or to the end of the rado
+        
+        line   = []
+        amount = LINE_CHUNK_MINIMUM
         
         while True:
-            b = self.read( 1 )
-            line.append( b )
-            if b in [ '\n', '' ]:
+            chunk, chunkLen = self._rado.readatlen( self._position, amount )
+            if not chunkLen:
                 return ''.join( line )
+            
+            newline = chunk.find( '\n' )
+            if newline != -1:
+                line.append( chunk[ : newline + 1 ] )
+                self._position += newline + 1
+                return ''.join( line )
+            
+            line.append( chunk )
+            self._position += chunkLen
+            amount = min( amount * 2, LINE_CHUNK_MAXIMUM )
     
     def readlines( self ):
+        # yields each line through to the end of the rado, leaving the cursor after it
+        # data is read ahead a chunk at a time, if the cursor is moved between lines the
+        # buffer is dropped and reading carries on from wherever it was moved to
+        
+        buffered = '' # data from the cursor position onwards starts at offset
+        offset   = 0
+        
         while True:
-            b = self.read( 1 )
-            if b == '':
-                return
-            else:
-                self.skip( -1 )
-                yield self.readline()
+            newline = buffered.find( '\n', offset )
+            
+            if newline == -1:
+                chunk, chunkLen = self._rado.readatlen(
+                    self._position + len( buffered ) - offset ,
+                    LINE_CHUNK_MAXIMUM                        ,
+                    )
+                
+                if chunkLen:
+                    buffered = buffered[ offset: ] + chunk
+                    offset   = 0
+                    continue
+                
+                if offset == len( buffered ):
+                    return
+                
+                # the last line has no newline
+                newline = len( buffered ) - 1
+            
+            line            = buffered[ offset : newline + 1 ]
+            offset          = newline + 1
+            self._position += len( line )
+            expected        = self._position
+            
+            yield line
+            
+            if self._position != expected:
+                buffered = ''
+                offset   = 0
 
 
 
@@ -252,68 +922,832 @@ class Common():
         
         return reads
     
+    @staticmethod
+    def block_runs( blockDevice, blockNo, count ):
+        # gathers count blocks starting at blockNo as a list of ( blockCount, rado ) runs
+        # block devices that can hand back several blocks at once implement get_blocks
+        # the rest are asked for one block at a time
+        # 
+        if hasattr( blockDevice, 'get_blocks' ):
+            return blockDevice.get_blocks( blockNo, count )
+        
+        return [
+            ( 1, blockDevice.get_block( currentBlock ) )
+            for currentBlock in xrange( blockNo, blockNo + count )
+            ]
+    
+    @staticmethod
+    def iter_chunks( rado, chunkSize, start, end, phase = 0 ):
+        # yields the data of the rado from start to end in chunks of up to chunkSize
+        # chunk boundaries fall on multiples of chunkSize counted from phase bytes before
+        # the start of the rado, so windows can line their chunks up with what they sit on
+        # reads go straight to the rado, MAXIMUM_ALLOWED_READ is for cursors only
+        
+        if chunkSize <= 0: raise Exception( 'chunk size must be positive' )
+        if start     <  0: raise Exception( 'recieved negative start'     )
+        
+        if end == None or end > rado.size():
+            end = rado.size()
+        
+        position = start
+        while position < end:
+            amount = min( chunkSize - ( phase + position ) % chunkSize, end - position )
+            
+            chunk, chunkLen = rado.readatlen( position, amount )
+            if not chunkLen:
+                return
+            
+            yield chunk
+            position += chunkLen
+    
+    # every rado has extents( start = 0, end = None ), describing its contents as a list
+    # of ( position, length, isData ) ranges in order. holes ( isData False ) are known
+    # to read as zeros without having to be read. data may still turn out to be zeros
+    
+    @staticmethod
+    def add_extent( extents, position, length, isData ):
+        # appends to a list of ( position, length, isData ) extents, merging with the
+        # last one when it is of the same kind and runs right up to this one
+        
+        if length <= 0:
+            return
+        
+        if extents and extents[-1][2] == isData and extents[-1][0] + extents[-1][1] == position:
+            extents[-1] = ( extents[-1][0], extents[-1][1] + length, isData )
+        else:
+            extents.append( ( position, length, isData ) )
+    
+    @staticmethod
+    def add_run( runs, count, isData ):
+        # the same for the ( blockCount, isData ) runs of block device get_extents
+        
+        if count <= 0:
+            return
+        
+        if runs and runs[-1][1] == isData:
+            runs[-1] = ( runs[-1][0] + count, isData )
+        else:
+            runs.append( ( count, isData ) )
+    
+    @staticmethod
+    def block_length( blockDevice, blockNo ):
+        # how much of the block lies within the device, the last may be cut short
+        blockSize = blockDevice.block_size()
+        return max( 0, min( blockSize, blockDevice.size() - blockNo * blockSize ) )
+    
+    @staticmethod
+    def data_extents( rado, start, end, isData = True ):
+        # the extents of a rado that is one kind all the way through
+        
+        if end == None or end > rado.size():
+            end = rado.size()
+        
+        extents = []
+        Common.add_extent( extents, start, end - start, isData )
+        return extents
+    
+    @staticmethod
+    def required_runs( blockDevice, blockSize, position, amount ):
+        # like required_reads, but the reads are made against the runs handed back by the
+        # block device, so a stretch of physically contiguous blocks costs a single read
+        # 
+        if not amount:
+            return []
+        
+        firstBlock = position / blockSize
+        lastBlock  = ( position + amount - 1 ) / blockSize
+        
+        reads    = []
+        runStart = firstBlock * blockSize
+        
+        for runBlocks, runRado in Common.block_runs( blockDevice, firstBlock, lastBlock - firstBlock + 1 ):
+            runEnd = runStart + runBlocks * blockSize
+            
+            readStart = max( position         , runStart )
+            readEnd   = min( position + amount, runEnd   )
+            
+            reads.append({
+                    'rado'   : runRado              ,
+                    'offset' : readStart - runStart ,
+                    'amount' : readEnd - readStart  ,
+                    })
+            
+            runStart = runEnd
+        
+        return reads
+    
+    @staticmethod
+    def is_mappable( fileobj ):
+        # only regular files with some content in them can be memory mapped
+        # devices, pipes and empty files have to fall back to plain reads
+        # 
+        fileStat = os.fstat( fileobj.fileno() )
+        return stat.S_ISREG( fileStat.st_mode ) and fileStat.st_size > 0
+    
+    @staticmethod
+    def map_file( fileobj ):
+        return mmap.mmap( fileobj.fileno(), 0, access = mmap.ACCESS_READ )
+    
     @staticmethod
     def nicely( v ):
         return format( v, '#064b' )
     
     @staticmethod
-    def memoize( name ):
+    def memoize( name, priority = CACHE_PRIORITY_STREAMING ):
+        # memoizes a method into the named cache
+        # the instance the method is called on owns the entries and may override the
+        # priority with its _cachePriority attribute
+        
         if name not in MEMOIZATION:
-            raise Exception( 'you must specify the number of results to memoize for %s' % repr( name ) )
+            raise Exception( 'you must specify the number of bytes to memoize for %s' % repr( name ) )
         else:
             def decorate( fn ):
                 
-                if MEMOIZATION[ name ] == 0:
-                    DEBUG_MEMO( "don't bother memoizing if you can't actually store anything" )
-                    return fn
+                if name not in CACHES:
+                    CACHES[ name ] = LruCache( name, MEMOIZATION[ name ] )
                 
-                memoized = {}
-                lastUsed = []
+                cache = CACHES[ name ]
                 
-                def wrapped( *args, **kwargs ):
-                    key = args + tuple( sorted( kwargs.items() ) )
+                def wrapped( owner, *args, **kwargs ):
+                    key = ( Common.cache_identity( owner ), fn ) + args + tuple( sorted( kwargs.items() ) )
+                    
+                    found, rv = cache.lookup( key )
+                    
+                    if IO_ACCOUNTING:
+                        stats = IoStats.current()
+                        if stats:
+                            stats.count_cache( found )
                     
-                    if key in memoized:
-                        DEBUG_MEMO( 'USE MEMOIZED VALUE' )
-                        lastUsed.remove( key )
-                        lastUsed.append( key )
-                        return memoized[ key ]
+                    if found:
+                        if LOG_MEMO.debugging:
+                            LOG_MEMO.debug( 'use memoized value %s', name )
+                        return rv
                     else:
-                        DEBUG_MEMO( 'ADD MEMOIZED VALUE' )
-                        rv = fn( *args, **kwargs )
-                        memoized[ key ] = rv
-                        lastUsed.append( key )
-                        if len( lastUsed ) > MEMOIZATION[ name ]:
-                            DEBUG_MEMO( 'REM MEMOIZED VALUE' )
-                            del memoized[ lastUsed.pop( 0 ) ]
+                        if LOG_MEMO.debugging:
+                            LOG_MEMO.debug( 'add memoized value %s', name )
+                        rv = fn( owner, *args, **kwargs )
+                        cache.store(
+                            key      = key                                          ,
+                            value    = rv                                           ,
+                            cost     = Common.memory_cost( rv )                     ,
+                            priority = getattr( owner, '_cachePriority', priority ) ,
+                            owner    = owner                                        ,
+                            )
                         return rv
                 return wrapped
             return decorate
-
-
-####################################################################################
-## random access data objects, nestable to extract data in complex patterns at will
-
-class RadoBlob():
-    # random access data object for string data blob
     
-    def __init__( self, name, blob ):
-        self._name = name
-        self._blob = blob
-        self._size = len( blob )
-        return
+    @staticmethod
+    def cache_identity( owner ):
+        # a stable number for the owner, handed out the first time it is asked for
+        
+        try:
+            return owner._cacheIdentity
+        except AttributeError:
+            with CACHE_IDENTITY_LOCK:
+                if not hasattr( owner, '_cacheIdentity' ):
+                    owner._cacheIdentity = next( CACHE_IDENTITIES )
+                return owner._cacheIdentity
     
-    def __repr__( self ):
-        return '<RadoBlob name:%s blob:%s>' % (
-            repr( self._name ) ,
-            repr( self._blob ) ,
-            )
+    @staticmethod
+    def memory_cost( value ):
+        # values that hold on to data report how much through memory_cost
+        # 
+        if hasattr( value, 'memory_cost' ):
+            return value.memory_cost()
+        else:
+            return MEMOIZATION_ENTRY_COST
+    
+    @staticmethod
+    def set_memoization_budget( name, budget ):
+        if name not in MEMOIZATION:
+            raise Exception( 'no memoization named %s' % repr( name ) )
+        
+        if budget < 0:
+            raise Exception( 'memoization budget cannot be negative' )
+        
+        MEMOIZATION[ name ] = budget
+        if name in CACHES:
+            CACHES[ name ].resize( budget )
+        
+        return
+    
+    @staticmethod
+    def configure_memoization( specification ):
+        # applies a comma separated list of name=size budgets, as in UU_MEMOIZATION
+        # 
+        for setting in specification.split( ',' ):
+            if not setting.strip():
+                continue
+            
+            if '=' not in setting:
+                raise Exception( 'memoization setting should look like name=size : %s' % repr( setting ) )
+            
+            name, size = setting.split( '=', 1 )
+            Common.set_memoization_budget( name.strip(), Common.parse_size( size ) )
+        
+        return
+    
+    @staticmethod
+    def memoization_stats():
+        attributes = Attributes()
+        for name in sorted( CACHES ):
+            attributes.put( name, CACHES[ name ].stats() )
+        return attributes
+    
+    @staticmethod
+    def set_memory_budget( budget ):
+        # the budget held over every cache and read-ahead buffer together
+        
+        if budget < 0:
+            raise Exception( 'memory budget cannot be negative' )
+        
+        GOVERNOR.resize( budget )
+        return
+    
+    @staticmethod
+    def memory_stats():
+        return GOVERNOR.stats()
+    
+    @staticmethod
+    def check_threads( rado, threads = 8, reads = 64, chunkSize = 64 * 1024 ):
+        # reads the rado from many threads at once, half hashing it whole and half reading
+        # random chunks, and compares everything with what a single thread read first
+        
+        digests = [ hashlib.md5( chunk ).digest() for chunk in rado.iter_chunks( chunkSize ) ]
+        whole   = hashlib.md5( ''.join( digests ) ).digest()
+        
+        lock       = threading.Lock()
+        mismatches = Counter()
+        failures   = []
+        
+        def hash_whole():
+            seen = [ hashlib.md5( chunk ).digest() for chunk in rado.iter_chunks( chunkSize ) ]
+            if hashlib.md5( ''.join( seen ) ).digest() != whole:
+                mismatches.add()
+        
+        def read_random( seed ):
+            chooser = random.Random( seed )
+            for _ in xrange( reads ):
+                chunkNo = chooser.randrange( len( digests ) )
+                data, _ = rado.readatlen( chunkNo * chunkSize, min( chunkSize, rado.size() - chunkNo * chunkSize ) )
+                if hashlib.md5( data ).digest() != digests[ chunkNo ]:
+                    mismatches.add()
+        
+        def run( fn, *args ):
+            try:
+                fn( *args )
+            except Exception, e:
+                with lock:
+                    failures.append( repr( e ) )
+        
+        workers = []
+        for workerNo in xrange( threads ):
+            if workerNo % 2 or not digests:
+                args = ( hash_whole, )
+            else:
+                args = ( read_random, workerNo )
+            workers.append( threading.Thread( name = 'uu-check-threads-%s' % workerNo, target = run, args = args ) )
+        
+        started = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        attributes = Attributes()
+        attributes.put( 'threads'   , threads                     )
+        attributes.put( 'chunks'    , len( digests )              )
+        attributes.put( 'mismatches', mismatches.value()          )
+        attributes.put( 'failures'  , failures                    )
+        attributes.put( 'seconds'   , round( time.time() - started, 3 ) )
+        return attributes
+    
+    @staticmethod
+    def set_io_accounting( enabled ):
+        global IO_ACCOUNTING
+        IO_ACCOUNTING = bool( enabled )
+    
+    @staticmethod
+    def io_stats():
+        # the accounting tree, from each layer that was read from outside any other
+        
+        seen  = set()
+        trees = [ root.to_attributes( seen ) for root in IoStats.living( IO_STATS_ROOTS, IO_STATS_LOCK ) ]
+        
+        with IO_STATS_LOCK:
+            if IO_STATS_COLLECTED.reads:
+                trees.append( IoStats.collected_attributes( IO_STATS_COLLECTED ) )
+        
+        return Attributes.from_iterator( trees )
+    
+    @staticmethod
+    def reset_io_stats():
+        # forgets the layers seen so far, new reads start new trees
+        with IO_STATS_LOCK:
+            IO_STATS_ROOTS.clear()
+            IO_STATS_COLLECTED.__init__()
+    
+    @staticmethod
+    def traced( kind ):
+        # records a Span for each call of the method while tracing is on
+        # the arguments are described as TRACE_ARGUMENTS gives for the kind
+        
+        def decorate( fn ):
+            @functools.wraps( fn )
+            def wrapped( owner, *args, **kwargs ):
+                if not TRACING:
+                    return fn( owner, *args, **kwargs )
+                
+                with Span( kind, owner, args, kwargs ):
+                    return fn( owner, *args, **kwargs )
+            return wrapped
+        return decorate
+    
+    @staticmethod
+    def set_tracing( enabled ):
+        global TRACING
+        TRACING = bool( enabled )
+    
+    @staticmethod
+    def trace_events():
+        # the spans recorded so far as chrome trace events, complete events ( ph X )
+        # with times in microseconds from when the module was loaded
+        
+        with TRACE_LOCK:
+            spans   = list( TRACE_SPANS )
+            dropped = TRACE_DROPPED[0]
+        
+        processId = os.getpid()
+        
+        events = []
+        for spanId, parentId, kind, name, started, seconds, threadId, arguments in spans:
+            arguments = dict( arguments )
+            arguments[ 'id' ] = spanId
+            if parentId != None:
+                arguments[ 'parent' ] = parentId
+            
+            events.append({
+                    'name' : name                                        ,
+                    'cat'  : kind                                        ,
+                    'ph'   : 'X'                                         ,
+                    'ts'   : round( ( started - TRACE_EPOCH ) * 1e6, 3 ) ,
+                    'dur'  : round( seconds * 1e6, 3 )                   ,
+                    'pid'  : processId                                   ,
+                    'tid'  : threadId                                    ,
+                    'args' : arguments                                   ,
+                    })
+        
+        if dropped:
+            events.append({
+                    'name' : 'spans-dropped'               ,
+                    'ph'   : 'C'                           ,
+                    'ts'   : 0                             ,
+                    'pid'  : processId                     ,
+                    'args' : { 'spans-dropped' : dropped } ,
+                    })
+        
+        return events
+    
+    @staticmethod
+    def write_trace( fileobj ):
+        # writes the spans recorded so far as chrome trace json, for chrome://tracing
+        # or https://ui.perfetto.dev
+        
+        json.dump(
+            {
+                'traceEvents'     : Common.trace_events() ,
+                'displayTimeUnit' : 'ms'                  ,
+                },
+            fileobj ,
+            )
+        return
+    
+    @staticmethod
+    def reset_trace():
+        with TRACE_LOCK:
+            del TRACE_SPANS[:]
+            TRACE_DROPPED[0] = 0
+    
+    @staticmethod
+    def set_log_level( name, level ):
+        # sets the level of the named logger, or of every logger if name is None
+        # the level may be given by name ( debug, info, warning, error, off )
+        
+        global LOG_LEVEL
+        
+        if not isinstance( level, ( int, long ) ):
+            if level.strip().lower() not in LOG_LEVELS:
+                raise Exception( 'unknown log level : %s' % repr( level ) )
+            level = LOG_LEVELS[ level.strip().lower() ]
+        
+        if name == None:
+            LOG_LEVEL = level
+            for logger in LOGGERS.values():
+                logger.set_level( level )
+        elif name in LOGGERS:
+            LOGGERS[ name ].set_level( level )
+        else:
+            raise Exception( 'no logger named %s' % repr( name ) )
+        
+        return
+    
+    @staticmethod
+    def configure_logging( specification ):
+        # applies a comma separated list of name=level settings, as in UU_LOG
+        # a bare level applies to every logger
+        # 
+        for setting in specification.split( ',' ):
+            if not setting.strip():
+                continue
+            
+            if '=' in setting:
+                name, level = setting.split( '=', 1 )
+                Common.set_log_level( name.strip(), level )
+            else:
+                Common.set_log_level( None, setting )
+        
+        return
+    
+    @staticmethod
+    def varint( value ):
+        # unsigned, seven bits a byte with the high bit set on all but the last
+        
+        if value < 0: raise Exception( 'varints cannot be negative' )
+        
+        out = []
+        while value > 0x7f:
+            out.append( chr( ( value & 0x7f ) | 0x80 ) )
+            value >>= 7
+        out.append( chr( value ) )
+        
+        return ''.join( out )
+    
+    @staticmethod
+    def attributes_writer( format, fileobj ):
+        # a writer of Attributes trees to the file object, format is one of
+        # ATTRIBUTES_FORMATS
+        
+        writers = {
+            'text'   : AttributesWriter__Text      ,
+            'json'   : AttributesWriter__JsonLines ,
+            'binary' : AttributesWriter__Binary    ,
+            }
+        
+        if format not in writers:
+            raise Exception( 'unknown attributes format : %s' % repr( format ) )
+        
+        return writers[ format ]( fileobj )
+    
+    @staticmethod
+    def parse_size( text ):
+        # a number of bytes, optionally suffixed by k, m or g
+        # 
+        text        = text.strip().lower()
+        multipliers = { 'k' : 1024, 'm' : 1024 ** 2, 'g' : 1024 ** 3 }
+        
+        if text and text[-1] in multipliers:
+            return int( text[:-1] ) * multipliers[ text[-1] ]
+        else:
+            return int( text )
+
+
+Common.configure_memoization( os.environ.get( 'UU_MEMOIZATION', '' ) )
+Common.set_memory_budget( Common.parse_size( os.environ.get( 'UU_MEMORY_BUDGET', str( MEMORY_BUDGET ) ) ) )
+Common.configure_logging( os.environ.get( 'UU_LOG', '' ) )
+
+
+####################################################################################
+## i/o accounting
+##   each RadoBlock, RadoFile and RadoMmap keeps an IoStats of the reads made of it.
+##   a layer reading from another while serving a read becomes its parent, so the
+##   stats form a tree following the nesting ( file > qcow2 > partition > inode ),
+##   and a small read at the top can be followed down to what it cost at the bottom
+## 
+##   layers are only held weakly, by their parents and as roots. once a layer is
+##   collected its counts are folded into those its parent keeps of collected layers,
+##   and the layers beneath it that are still alive move up to the parent, so batch
+##   runs over many images do not keep every layer they ever read
+
+IO_STATS_ROOTS = OrderedDict() # id -> weakref, layers read from outside any other layer
+IO_STATS_LOCK  = threading.RLock() # the collector may fold a root in while it is held
+
+class IoCounts():
+    # the counters of an IoStats, apart from it so they can outlive it
+    # 
+    #   requested    : bytes asked of the layer
+    #   delivered    : bytes it handed back
+    #   reads        : reads asked of it
+    #   device-reads : reads it made of its block device, or of the file at the bottom
+    #   device-bytes : bytes of whole blocks those covered
+    #   cache-hits   : memoized entries found while it was reading
+    #   cache-misses : and those that had to be produced
+    #   seconds      : spent in device reads, including every layer beneath
+    
+    def __init__( self ):
+        self.requested   = 0
+        self.delivered   = 0
+        self.reads       = 0
+        self.deviceReads = 0
+        self.deviceBytes = 0
+        self.hits        = 0
+        self.misses      = 0
+        self.seconds     = 0.0
+        return
+    
+    def add( self, other ):
+        self.requested   += other.requested
+        self.delivered   += other.delivered
+        self.reads       += other.reads
+        self.deviceReads += other.deviceReads
+        self.deviceBytes += other.deviceBytes
+        self.hits        += other.hits
+        self.misses      += other.misses
+        self.seconds     += other.seconds
+        return
+    
+    def put_into( self, attributes ):
+        attributes.put( 'requested'   , self.requested   )
+        attributes.put( 'delivered'   , self.delivered   )
+        attributes.put( 'reads'       , self.reads       )
+        attributes.put( 'device-reads', self.deviceReads )
+        attributes.put( 'device-bytes', self.deviceBytes )
+        attributes.put( 'cache-hits'  , self.hits        )
+        attributes.put( 'cache-misses', self.misses      )
+        attributes.put( 'seconds'     , round( self.seconds, 6 ) )
+        return attributes
+
+IO_STATS_COLLECTED = IoCounts() # of the roots since collected
+
+class IoStats():
+    # counters for one layer, see IoCounts
+    
+    _active = threading.local() # the stack of layers each thread is reading through
+    
+    def __init__( self, name ):
+        self._name      = name
+        self._lock      = threading.RLock() # the collector may fold a child in while it is held
+        self._children  = OrderedDict()     # id -> weakref, layers read through this one
+        self._counts    = IoCounts()
+        self._collected = IoCounts()        # of the layers beneath since collected
+        return
+    
+    def __repr__( self ):
+        return '<IoStats name:%s>' % (
+            repr( self._name ) ,
+            )
+    
+    @staticmethod
+    def current():
+        # the layer this thread is reading through, if any
+        stack = getattr( IoStats._active, 'stack', None )
+        return stack[-1] if stack else None
+    
+    def count_read( self, requested, delivered ):
+        with self._lock:
+            self._counts.reads     += 1
+            self._counts.requested += requested
+            self._counts.delivered += delivered
+    
+    def count_cache( self, hit ):
+        with self._lock:
+            if hit:
+                self._counts.hits   += 1
+            else:
+                self._counts.misses += 1
+    
+    def device_read( self, deviceReads, deviceBytes ):
+        # context for reading from what lies beneath, timing it and making this layer
+        # the parent of any other read through while it lasts
+        return IoStats__DeviceRead( self, deviceReads, deviceBytes )
+    
+    def _attach( self, children, lock, collected ):
+        # holds this layer weakly in children, guarded by lock. once it is collected its
+        # counts go into collected, and the layers beneath it still alive take its place
+        
+        with lock:
+            if id( self ) in children:
+                return
+            
+            key, counts, beneath, orphans = id( self ), self._counts, self._collected, self._children
+            
+            def fold( ref ):
+                with lock:
+                    children.pop( key, None )
+                    collected.add( counts  )
+                    collected.add( beneath )
+                    for orphanRef in orphans.values():
+                        orphan = orphanRef()
+                        if orphan:
+                            orphan._attach( children, lock, collected )
+            
+            children[ key ] = weakref.ref( self, fold )
+    
+    def _enter( self ):
+        stack = getattr( IoStats._active, 'stack', None )
+        if stack == None:
+            stack = IoStats._active.stack = []
+        
+        parent = stack[-1] if stack else None
+        
+        if parent:
+            self._attach( parent._children, parent._lock, parent._collected )
+        else:
+            self._attach( IO_STATS_ROOTS, IO_STATS_LOCK, IO_STATS_COLLECTED )
+        
+        stack.append( self )
+    
+    def _leave( self, deviceReads, deviceBytes, seconds ):
+        IoStats._active.stack.pop()
+        
+        with self._lock:
+            self._counts.deviceReads += deviceReads
+            self._counts.deviceBytes += deviceBytes
+            self._counts.seconds     += seconds
+    
+    @staticmethod
+    def living( children, lock ):
+        # the layers still alive among those held weakly in children
+        with lock:
+            refs = children.values()
+        return [ layer for layer in ( ref() for ref in refs ) if layer ]
+    
+    @staticmethod
+    def collected_attributes( collected ):
+        attributes = Attributes()
+        attributes.put( 'name', 'collected layers' )
+        return collected.put_into( attributes )
+    
+    def to_attributes( self, seen ):
+        # a layer reached again by another path is only named the second time
+        
+        attributes = Attributes()
+        attributes.put( 'name', self._name )
+        
+        if self in seen:
+            attributes.put( 'shown-above', True )
+            return attributes
+        
+        seen.add( self )
+        
+        with self._lock:
+            self._counts.put_into( attributes )
+            collected = IoCounts()
+            collected.add( self._collected )
+        
+        layers = [ child.to_attributes( seen ) for child in IoStats.living( self._children, self._lock ) ]
+        if collected.reads:
+            layers.append( IoStats.collected_attributes( collected ) )
+        
+        if layers:
+            attributes.put( 'layers', Attributes.from_iterator( layers ) )
+        
+        return attributes
+
+
+class IoStats__DeviceRead():
+    # see IoStats.device_read
+    
+    def __init__( self, stats, deviceReads, deviceBytes ):
+        self._stats       = stats
+        self._deviceReads = deviceReads
+        self._deviceBytes = deviceBytes
+        return
+    
+    def __enter__( self ):
+        self._stats._enter()
+        self._started = time.time()
+        return self
+    
+    def __exit__( self, excType, excValue, excTraceback ):
+        self._stats._leave( self._deviceReads, self._deviceBytes, time.time() - self._started )
+        return False
+
+
+####################################################################################
+## tracing
+##   with tracing on every readatlen and readintoat of a RadoBlock, RadoFile or RadoMmap,
+##   every get_block and get_blocks of a block device and every list and select of a
+##   model is recorded as a span. a span started while another is open on the same
+##   thread is its child, so a select can be followed down through the table walks
+##   and decompression it caused. Common.write_trace saves them for chrome://tracing
+
+TRACE_EPOCH   = time.time()
+TRACE_SPANS   = [] # ( id, parent id, kind, name, started, seconds, thread id, arguments )
+TRACE_DROPPED = [ 0 ]
+TRACE_LOCK    = threading.Lock()
+TRACE_IDS     = itertools.count( 1 )
+
+# names given to the positional arguments of each kind of traced call
+# arguments holding buffers are described by their length
+# 
+TRACE_ARGUMENTS = {
+    'readatlen'  : ( 'offset', 'size'  ) ,
+    'readintoat' : ( 'offset', 'size'  ) ,
+    'get_block'  : ( 'block' ,         ) ,
+    'get_blocks' : ( 'block' , 'count' ) ,
+    'list'       : (                   ) ,
+    'select'     : ( 'what'  ,         ) ,
+    }
+
+class Span():
+    # one traced call, see Common.traced
+    
+    _active = threading.local() # the ids of the spans open on each thread
+    
+    def __init__( self, kind, owner, args, kwargs = None ):
+        self._kind   = kind
+        self._owner  = owner
+        self._args   = args
+        self._kwargs = kwargs
+        return
+    
+    def __enter__( self ):
+        stack = getattr( Span._active, 'stack', None )
+        if stack == None:
+            stack = Span._active.stack = []
+        
+        self._parentId = stack[-1] if stack else None
+        self._id       = next( TRACE_IDS )
+        stack.append( self._id )
+        
+        self._started = time.time()
+        return self
+    
+    def __exit__( self, excType, excValue, excTraceback ):
+        seconds = time.time() - self._started
+        Span._active.stack.pop()
+        
+        name = getattr( self._owner, '_name', None ) or getattr( self._owner, 'name', None )
+        name = '%s ( %s )' % ( name, self._owner.__class__.__name__ ) if name else self._owner.__class__.__name__
+        
+        # keyword arguments are described under their own names
+        arguments = {}
+        described = zip( TRACE_ARGUMENTS.get( self._kind, () ), self._args ) + sorted( ( self._kwargs or {} ).items() )
+        for argumentName, value in described:
+            if isinstance( value, ( int, long, str, unicode ) ):
+                arguments[ argumentName ] = value
+            elif hasattr( value, '__len__' ):
+                arguments[ argumentName ] = len( value )
+            else:
+                arguments[ argumentName ] = repr( value )
+        
+        if excType:
+            arguments[ 'error' ] = repr( excValue )
+        
+        with TRACE_LOCK:
+            if len( TRACE_SPANS ) < TRACE_MAXIMUM_SPANS:
+                TRACE_SPANS.append((
+                        self._id                         ,
+                        self._parentId                   ,
+                        self._kind                       ,
+                        name                             ,
+                        self._started                    ,
+                        seconds                          ,
+                        threading.current_thread().ident ,
+                        arguments                        ,
+                        ))
+            else:
+                TRACE_DROPPED[0] += 1
+        
+        return False
+
+
+####################################################################################
+## random access data objects, nestable to extract data in complex patterns at will
+
+class RadoBlob():
+    # random access data object for string data blob
+    
+    def __init__( self, name, blob ):
+        self._name = name
+        self._blob = blob
+        self._size = len( blob )
+        return
+    
+    def __repr__( self ):
+        return '<RadoBlob name:%s blob:%s>' % (
+            repr( self._name ) ,
+            repr( self._blob ) ,
+            )
     
     def cursor( self ): return Cursor(
         name = 'radoblob-cursor',
         rado = self             ,
         )
     
+    def size( self ):
+        return self._size
+    
+    def memory_cost( self ):
+        return MEMOIZATION_ENTRY_COST + self._size
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end )
+    
+    def extents( self, start = 0, end = None ):
+        return Common.data_extents( self, start, end )
+    
     def readatlen( self, position, amount ):
         if position < 0: raise Exception( 'recieved negative position' )
         if amount   < 0: raise Exception( 'recieved negative amount'   )
@@ -328,348 +1762,2553 @@ class RadoBlob():
         #     )
         
         return v, len( v )
+    
+    def readintoat( self, position, view ):
+        if position < 0: raise Exception( 'recieved negative position' )
+        
+        amount = max( 0, min( len( view ), self._size - position ) )
+        view[ 0 : amount ] = memoryview( self._blob )[ position : position + amount ]
+        
+        return amount
 
 
 
-class RadoFile():
+class PositionalReader():
+    # reads from a file descriptor at a given position without relying on a shared
+    # file position, so any number of threads and cursors may read the same file at once
+    # 
+    # uses os.pread where the platform offers it. without it, the seek and read
+    # are paired under a lock, which is still safe but serializes the reads
     
-    def __init__( self, name, fileobj ):
-        self._name = name
-        self._fo   = fileobj
-        
-        self._fo.seek( 0, 2 )
-        self._size = self._fo.tell()
+    def __init__( self, fileobj ):
+        self._fileobj = fileobj
+        self._fd      = fileobj.fileno()
+        self._lock    = None if hasattr( os, 'pread' ) else threading.Lock()
         return
     
     def __repr__( self ):
-        return '<RadoFile name:%s fileobj:%s>' % (
-            repr( self._name ) ,
-            repr( self._fo   ) ,
+        return '<PositionalReader fileobj:%s>' % (
+            repr( self._fileobj ) ,
             )
     
-    def cursor( self ):
-        return Cursor(
-            name = 'radofile-cursor' ,
-            rado = self              ,
-            )
+    def read( self, position, amount ):
+        if position < 0: raise Exception( 'recieved negative position' )
+        if amount   < 0: raise Exception( 'recieved negative amount'   )
+        
+        # short reads are retried until the amount is gathered or we hit the end of the file
+        # 
+        bits = []
+        while amount:
+            bit = self._read_once( position, amount )
+            if not bit:
+                break
+            bits.append( bit )
+            position += len( bit )
+            amount   -= len( bit )
+        
+        return ''.join( bits )
     
-    def size( self ):
-        return self._size
+    def readinto( self, position, view ):
+        if position < 0: raise Exception( 'recieved negative position' )
+        
+        done = 0
+        while done < len( view ):
+            amount = self._readinto_once( position + done, view[ done : ] )
+            if not amount:
+                break
+            done += amount
+        
+        return done
     
-    def readatlen( self, position, amount ):
+    def _readinto_once( self, position, view ):
+        if not self._lock:
+            # pread always hands back a new string, so this path costs one extra copy
+            # 
+            chunk = os.pread( self._fd, len( view ), position )
+            view[ 0 : len( chunk ) ] = chunk
+            return len( chunk )
         
-        DEBUG_FILE( 'FILE[:position=%s:amount=%s]' % (
-                str( position ),
-                str( amount   ),
-                ))
+        # an unowned FileIO over our descriptor reads straight into the buffer
+        # 
+        with self._lock:
+            os.lseek( self._fd, position, os.SEEK_SET )
+            return io.FileIO( self._fd, closefd = False ).readinto( view ) or 0
+    
+    def allocation_map( self, size ):
+        # mapping the file moves its position, so it must not happen between the seek
+        # and the read of another thread
         
-        if position < 0: raise Exception( 'recieved negative position' )
-        if amount   < 0: raise Exception( 'recieved negative amount'   )
+        if not self._lock:
+            return AllocationMap.of( self._fileobj, size )
+        
+        with self._lock:
+            return AllocationMap.of( self._fileobj, size )
+    
+    def _read_once( self, position, amount ):
+        if not self._lock:
+            return os.pread( self._fd, amount, position )
+        
+        with self._lock:
+            os.lseek( self._fd, position, os.SEEK_SET )
+            return os.read( self._fd, amount )
+
+
+class AllocationMap():
+    # which parts of a sparse host file hold data, learned up front with lseek SEEK_DATA
+    # and SEEK_HOLE, so the holes can be handed out as zeros without reading them
+    # 
+    # AllocationMap.of returns None when the platform, the file system or the file
+    # cannot tell us, and everything should be taken to be data
+    
+    def __init__( self, starts, ends ):
+        self._starts = starts # sorted starts of the data ranges
+        self._ends   = ends   # and their ends, one past the last byte
+        return
+    
+    def __repr__( self ):
+        return '<AllocationMap ranges:%s data:%s>' % (
+            repr( len( self._starts ) ) ,
+            repr( sum( end - start for start, end in zip( self._starts, self._ends ) ) ) ,
+            )
+    
+    @staticmethod
+    def of( fileobj, size ):
+        if SEEK_DATA == None:
+            return None
+        
+        try:
+            fd = fileobj.fileno()
+        except ( AttributeError, IOError, io.UnsupportedOperation ):
+            return None
+        
+        starts, ends = [], []
+        position     = 0
+        
+        try:
+            while position < size:
+                try:
+                    start = os.lseek( fd, position, SEEK_DATA )
+                except OSError, e:
+                    if e.errno == errno.ENXIO:
+                        # nothing but hole from here to the end
+                        break
+                    raise
+                
+                end = min( os.lseek( fd, start, SEEK_HOLE ), size )
+                
+                if start >= end:
+                    break
+                
+                starts.append( start )
+                ends.append( end )
+                position = end
+            
+        except OSError, e:
+            # EINVAL and friends, whence values the file system does not understand
+            LOG_FILE.debug( 'no allocation map %r', e )
+            return None
+        
+        finally:
+            os.lseek( fd, 0, os.SEEK_SET )
+        
+        return AllocationMap( starts, ends )
+    
+    def is_hole( self, start, end ):
+        # true if no byte from start up to end holds data
+        index = bisect.bisect_right( self._ends, start )
+        return index == len( self._starts ) or self._starts[ index ] >= end
+    
+    def extents( self, start, end ):
+        # ( position, length, isData ) extents from start up to end
+        
+        extents = []
+        index   = bisect.bisect_right( self._ends, start )
+        
+        position = start
+        while position < end:
+            if index < len( self._starts ):
+                dataStart = min( max( self._starts[ index ], position ), end )
+                dataEnd   = min( self._ends[ index ], end )
+            else:
+                dataStart = dataEnd = end
+            
+            Common.add_extent( extents, position, dataStart - position, False )
+            Common.add_extent( extents, dataStart, dataEnd - dataStart, True  )
+            
+            position = max( dataStart, dataEnd )
+            index   += 1
+        
+        return extents
+    
+    def runs( self, blockSize, blockNo, count ):
+        # ( blockCount, isData ) runs over the blocks, any data in a block making it data
+        
+        runs    = []
+        current = blockNo
+        
+        for position, length, isData in self.extents( blockNo * blockSize, ( blockNo + count ) * blockSize ):
+            if isData:
+                endBlockNo = ( position + length + blockSize - 1 ) / blockSize
+                Common.add_run( runs, endBlockNo - current, True )
+                current = max( current, endBlockNo )
+            else:
+                # only blocks lying wholly inside the hole are holes
+                firstBlockNo = ( position + blockSize - 1 ) / blockSize
+                endBlockNo   = ( position + length ) / blockSize
+                if endBlockNo > firstBlockNo:
+                    Common.add_run( runs, firstBlockNo - current, True )
+                    Common.add_run( runs, endBlockNo - firstBlockNo, False )
+                    current = endBlockNo
+        
+        Common.add_run( runs, blockNo + count - current, True )
+        
+        # the offsets from lseek are longs, but block counts are counted and shown as ints
+        return [ ( int( blockCount ), isData ) for blockCount, isData in runs ]
+
+
+class RadoFile():
+    
+    def __init__( self, name, fileobj ):
+        self._name = name
+        self._fo   = fileobj
+        
+        self._fo.seek( 0, 2 )
+        self._size = self._fo.tell()
+        
+        self._reader = PositionalReader( fileobj )
+        
+        self._allocation = None # learned on the first call to extents
+        self._ioStats    = IoStats( '%s ( RadoFile )' % name )
+        return
+    
+    def __repr__( self ):
+        return '<RadoFile name:%s fileobj:%s>' % (
+            repr( self._name ) ,
+            repr( self._fo   ) ,
+            )
+    
+    def cursor( self ):
+        return Cursor(
+            name = 'radofile-cursor' ,
+            rado = self              ,
+            )
+    
+    def size( self ):
+        return self._size
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end )
+    
+    def extents( self, start = 0, end = None ):
+        if self._allocation == None:
+            self._allocation = self._reader.allocation_map( self._size ) or False
+        
+        if not self._allocation:
+            return Common.data_extents( self, start, end )
+        
+        if end == None or end > self._size:
+            end = self._size
+        
+        return self._allocation.extents( start, end )
+    
+    @Common.traced( 'readatlen' )
+    def readatlen( self, position, amount ):
+        
+        if LOG_FILE.debugging:
+            LOG_FILE.debug( 'read position:%s amount:%s', position, amount )
+        
+        if position < 0: raise Exception( 'recieved negative position' )
+        if amount   < 0: raise Exception( 'recieved negative amount'   )
+        
+        if not IO_ACCOUNTING:
+            chunk = self._reader.read( position, amount )
+            return chunk, len( chunk )
+        
+        with self._ioStats.device_read( 1, amount ):
+            chunk = self._reader.read( position, amount )
+        
+        self._ioStats.count_read( amount, len( chunk ) )
+        return chunk, len( chunk )
+    
+    @Common.traced( 'readintoat' )
+    def readintoat( self, position, view ):
+        if not IO_ACCOUNTING:
+            return self._reader.readinto( position, view )
+        
+        with self._ioStats.device_read( 1, len( view ) ):
+            done = self._reader.readinto( position, view )
+        
+        self._ioStats.count_read( len( view ), done )
+        return done
+
+
+class File__BlockDevice():
+    def __init__( self, name, fileobj ):
+        self._name    = name
+        self._fileobj = fileobj
+        
+        # sneaky seek to end to get filesize
+        self._fileobj.seek( 0, 2 )
+        self._size = self._fileobj.tell()
+        
+        self._reader     = PositionalReader( fileobj )
+        self._allocation = self._reader.allocation_map( self._size )
+        
+        self._blocksRead = Counter()
+        return
+    
+    def __repr__( self ):
+        return '<File__BlockDevice name:%s fileobj:%s>' % (
+            repr( self._name    ) ,
+            repr( self._fileobj ) ,
+            )
+    
+    def get_blocks_read( self ):
+        return self._blocksRead.value()
+    
+    def block_size( self ):
+        return FILE_BLOCK_SIZE
+    
+    def size( self ):
+        return self._size
+    
+    @Common.traced( 'get_block' )
+    def get_block( self, blockNo ):
+        # blocks in holes of a sparse file are never read, nor memoized
+        
+        if self._allocation and self._allocation.is_hole( blockNo * FILE_BLOCK_SIZE, ( blockNo + 1 ) * FILE_BLOCK_SIZE ):
+            return RadoBlob(
+                name = 'file-block-device/hole-block-rado'                                   ,
+                blob = buffer( FILE_ZERO_BLOCK, 0, Common.block_length( self, blockNo ) ) ,
+                )
+        
+        return self._read_block( blockNo )
+    
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_STREAMING )
+    def _read_block( self, blockNo ):
+        
+        self._blocksRead.add()
+        
+        if LOG_FILE.debugging:
+            LOG_FILE.debug( 'read position:%s amount:%s', blockNo * FILE_BLOCK_SIZE, FILE_BLOCK_SIZE )
+        
+        return RadoBlob(
+            name = 'file-block-device/get-block-rado'                              ,
+            blob = self._reader.read( blockNo * FILE_BLOCK_SIZE, FILE_BLOCK_SIZE ) ,
+            )
+    
+    @Common.traced( 'get_blocks' )
+    def get_blocks( self, blockNo, count ):
+        # each stretch of data comes back from a single read, bypassing the block memoization
+        # and stretches of hole come back as zeros without any read at all
+        # 
+        
+        runs = []
+        
+        for runCount, isData in self.get_extents( blockNo, count ):
+            if isData:
+                self._blocksRead.add( runCount )
+                
+                runs.append(( runCount, RadoBlob(
+                            name = 'file-block-device/get-blocks-rado'                                        ,
+                            blob = self._reader.read( blockNo * FILE_BLOCK_SIZE, runCount * FILE_BLOCK_SIZE ) ,
+                            )))
+            else:
+                runs.append(( runCount, RadoZero(
+                            name = 'file-block-device/hole-blocks-rado' ,
+                            size = runCount * FILE_BLOCK_SIZE           ,
+                            )))
+            
+            blockNo += runCount
+        
+        return runs
+    
+    def get_extents( self, blockNo, count ):
+        if not self._allocation:
+            return [ ( count, True ) ]
+        
+        return self._allocation.runs( FILE_BLOCK_SIZE, blockNo, count )
+
+
+class RadoMmap():
+    # random access data object over a memory mapped file
+    # reads are slices of the mapping, leaving the caching to the kernel page cache
+    
+    def __init__( self, name, fileobj ):
+        self._name = name
+        self._fo   = fileobj
+        self._map  = Common.map_file( fileobj )
+        self._size = len( self._map )
+        
+        self._ioStats = IoStats( '%s ( RadoMmap )' % name )
+        return
+    
+    def __repr__( self ):
+        return '<RadoMmap name:%s fileobj:%s>' % (
+            repr( self._name ) ,
+            repr( self._fo   ) ,
+            )
+    
+    def cursor( self ):
+        return Cursor(
+            name = 'radommap-cursor' ,
+            rado = self              ,
+            )
+    
+    def size( self ):
+        return self._size
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end )
+    
+    def extents( self, start = 0, end = None ):
+        return Common.data_extents( self, start, end )
+    
+    @Common.traced( 'readatlen' )
+    def readatlen( self, position, amount ):
+        if position < 0: raise Exception( 'recieved negative position' )
+        if amount   < 0: raise Exception( 'recieved negative amount'   )
+        
+        if not IO_ACCOUNTING:
+            chunk = self._map[ position : position + amount ]
+            return chunk, len( chunk )
+        
+        with self._ioStats.device_read( 1, amount ):
+            chunk = self._map[ position : position + amount ]
+        
+        self._ioStats.count_read( amount, len( chunk ) )
+        return chunk, len( chunk )
+    
+    @Common.traced( 'readintoat' )
+    def readintoat( self, position, view ):
+        if position < 0: raise Exception( 'recieved negative position' )
+        
+        amount = max( 0, min( len( view ), self._size - position ) )
+        
+        if not IO_ACCOUNTING:
+            view[ 0 : amount ] = buffer( self._map, position, amount )
+            return amount
+        
+        with self._ioStats.device_read( 1, amount ):
+            view[ 0 : amount ] = buffer( self._map, position, amount )
+        
+        self._ioStats.count_read( len( view ), amount )
+        return amount
+
+
+class Mmap__BlockDevice():
+    # block device over a memory mapped file
+    # 
+    # blocks are handed out as buffers into the mapping rather than copied out of it, and
+    # are not memoized since the page cache already keeps the hot parts of the file around
+    # 
+    
+    def __init__( self, name, fileobj ):
+        self._name    = name
+        self._fileobj = fileobj
+        self._map     = Common.map_file( fileobj )
+        self._size    = len( self._map )
+        
+        self._allocation = AllocationMap.of( fileobj, self._size )
+        
+        self._blocksRead = Counter()
+        return
+    
+    def __repr__( self ):
+        return '<Mmap__BlockDevice name:%s fileobj:%s>' % (
+            repr( self._name    ) ,
+            repr( self._fileobj ) ,
+            )
+    
+    def get_blocks_read( self ):
+        return self._blocksRead.value()
+    
+    def block_size( self ):
+        return FILE_BLOCK_SIZE
+    
+    def size( self ):
+        return self._size
+    
+    @Common.traced( 'get_block' )
+    def get_block( self, blockNo ):
+        # holes are kept away from the mapping, so their pages are never faulted in
+        
+        if self._allocation and self._allocation.is_hole( blockNo * FILE_BLOCK_SIZE, ( blockNo + 1 ) * FILE_BLOCK_SIZE ):
+            return RadoBlob(
+                name = 'mmap-block-device/hole-block-rado'                                   ,
+                blob = buffer( FILE_ZERO_BLOCK, 0, Common.block_length( self, blockNo ) ) ,
+                )
+        
+        self._blocksRead.add()
+        
+        return RadoBlob(
+            name = 'mmap-block-device/get-block-rado'                               ,
+            blob = buffer( self._map, blockNo * FILE_BLOCK_SIZE, FILE_BLOCK_SIZE ) ,
+            )
+    
+    @Common.traced( 'get_blocks' )
+    def get_blocks( self, blockNo, count ):
+        
+        runs = []
+        
+        for runCount, isData in self.get_extents( blockNo, count ):
+            if isData:
+                self._blocksRead.add( runCount )
+                
+                runs.append(( runCount, RadoBlob(
+                            name = 'mmap-block-device/get-blocks-rado'                                         ,
+                            blob = buffer( self._map, blockNo * FILE_BLOCK_SIZE, runCount * FILE_BLOCK_SIZE ) ,
+                            )))
+            else:
+                runs.append(( runCount, RadoZero(
+                            name = 'mmap-block-device/hole-blocks-rado' ,
+                            size = runCount * FILE_BLOCK_SIZE           ,
+                            )))
+            
+            blockNo += runCount
+        
+        return runs
+    
+    def get_extents( self, blockNo, count ):
+        if not self._allocation:
+            return [ ( count, True ) ]
+        
+        return self._allocation.runs( FILE_BLOCK_SIZE, blockNo, count )
+
+
+class RadoRado():
+    # anything requiring a specific segment of another rado should be run through this
+    # as the read capping logic exists only here for simplicity in other rados
+    # 
+    # a RadoRado over another RadoRado is composed into a single window over the rado
+    # underneath them both, so reads take one hop however deep the nesting goes.
+    # the parents clipping is kept in _limit, which may be less than the size we
+    # report when we were told we're bigger than the parent actually allows
+    
+    def __init__( self, name, rado, offset = 0, size = None ):
+        self._name   = name
+        self._offset = offset
+        
+        self._size   = (
+            size if size != None else ( rado.size() - self._offset )
+            )
+        
+        self._limit  = self._size
+        
+        if isinstance( rado, RadoRado ):
+            self._limit   = min( self._limit, rado._limit - offset )
+            self._offset += rado._offset
+            rado          = rado._rado
+        
+        self._rado   = rado
+        
+        return
+    
+    def __repr__( self ):
+        return '<RadoRado name:%s offset:%s size:%s rado:%s>' % (
+            repr( self._name   ) ,
+            repr( self._offset ) ,
+            repr( self._size   ) ,
+            repr( self._rado   ) ,
+            )
+    
+    def cursor( self ):
+        return Cursor(
+            name = 'radorado-cursor' ,
+            rado = self              ,
+            )
+    
+    def size( self ):
+        return self._size
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end, phase = self._offset )
+    
+    def extents( self, start = 0, end = None ):
+        # the extents of the window, clipped to what can actually be read through it
+        
+        if end == None or end > self._limit:
+            end = self._limit
+        
+        if start >= end:
+            return []
+        
+        return [
+            ( position - self._offset, length, isData )
+            for position, length, isData in self._rado.extents( self._offset + start, self._offset + end )
+            ]
+    
+    def readatlen( self, position, amount ):
+        if position < 0: raise Exception( 'received negative position' )
+        if amount   < 0: raise Exception( 'received negative amount'   )
+        
+        if self._size == None:
+            raise Exception( 'oh god wat' )
+        
+        else:
+            # size underflow detection?
+            # like, the size thinks there should be data, but the underlying rado runs out?
+            
+            if position > self._limit:
+                return '', 0
+            
+            if position + amount > self._limit:
+                amount = self._limit - position
+            
+            return self._rado.readatlen( self._offset + position, amount )
+    
+    def readintoat( self, position, view ):
+        if position < 0: raise Exception( 'received negative position' )
+        
+        if position > self._limit:
+            return 0
+        
+        amount = min( len( view ), self._limit - position )
+        
+        return self._rado.readintoat( self._offset + position, view[ 0 : amount ] )
+
+
+class RadoBlock():
+    # rado over a block device
+    # calls .size()
+    # calls .block_size()
+    # calls .get_block( blockNo )
+    # calls .get_blocks( blockNo, count ) if the device has it
+    #   returns a list of ( blockCount, rado ) runs covering the blocks in order
+    #   each rado holding blockCount blocks of data back to back
+    # calls .get_extents( blockNo, count ) if the device has it
+    #   returns a list of ( blockCount, isData ) runs covering the blocks in order
+    #   runs that are not data are holes, unallocated and read as zeros
+    # checks ._slow on the device
+    #   if true, producing blocks costs real work ( decompression, table walks ) and
+    #   read-ahead is done on a background thread while the last window is consumed
+    # 
+    # sequential reads are served out of a read-ahead buffer filled a window at a time,
+    # so small reads walking a rado front to back don't each go down to the device
+    
+    def __init__( self, name, blockDevice ):
+        self._name        = name
+        self._blockDevice = blockDevice
+        self._blockSize   = blockDevice.block_size()
+        self._size        = blockDevice.size()
+        self._slow        = getattr( blockDevice, '_slow', False )
+        self._ioStats     = IoStats( '%s ( %s )' % ( name, blockDevice.__class__.__name__ ) )
+        
+        # the state lock guards everything below it, and is only ever held to look at
+        # or swap the read-ahead buffer, never across a read of the device. reads the
+        # buffer cannot serve go straight to the device, and only one fill of the
+        # buffer, foreground or background, is in flight at a time
+        # 
+        self._stateLock    = threading.Lock()
+        self._nextPosition = None
+        self._window       = 0
+        self._ahead        = None # ( position, data )
+        self._aheadStamp   = None
+        self._pending      = None # ReadAhead
+        self._filling      = False
+        return
+    
+    def __repr__( self ):
+        return '<RadoBlock name:%s blocksize:%s size:%s blockDevice:%s>' % (
+            repr( self._name        ) ,
+            repr( self._blockSize   ) ,
+            repr( self._size        ) ,
+            repr( self._blockDevice ) ,
+            )
+    
+    def cursor( self ):
+        # use RadoRado to clip and check incoming readatlen args
+        # 
+        return Cursor(
+            name = 'radoblock-indirect-cursor' ,
+            rado = self                        ,
+            ).rado().cursor()
+    
+    def size( self ):
+        # not in blocks. final block may be only partially filled with
+        # usable data. we won't read past where we're told is good
+        # 
+        return self._blockDevice.size()
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end )
+    
+    def extents( self, start = 0, end = None ):
+        # devices without get_extents are taken to be data all the way through
+        
+        if end == None or end > self._size:
+            end = self._size
+        
+        if start >= end:
+            return []
+        
+        if not hasattr( self._blockDevice, 'get_extents' ):
+            return Common.data_extents( self, start, end )
+        
+        firstBlockNo = start / self._blockSize
+        blockCount   = ( end - 1 ) / self._blockSize - firstBlockNo + 1
+        
+        extents  = []
+        position = firstBlockNo * self._blockSize
+        
+        for runCount, isData in self._blockDevice.get_extents( firstBlockNo, blockCount ):
+            runStart = max( position, start )
+            runEnd   = min( position + runCount * self._blockSize, end )
+            
+            Common.add_extent( extents, runStart, runEnd - runStart, isData )
+            
+            position += runCount * self._blockSize
+        
+        return extents
+    
+    @Common.traced( 'readatlen' )
+    def readatlen( self, position, amount ):
+        # position and amount have passed through RadoRado, so they should
+        # never ask for data that the underlying block device does not 
+        # purport to have
+        # 
+        
+        data = self._read_ahead( position, amount )
+        
+        if data is None:
+            data, _ = self._read_device( position, amount )
+        
+        if IO_ACCOUNTING:
+            self._ioStats.count_read( amount, len( data ) )
+        
+        return data, len( data )
+    
+    @Common.traced( 'readintoat' )
+    def readintoat( self, position, view ):
+        data = self._read_ahead( position, len( view ) )
+        
+        if data is not None:
+            view[ 0 : len( data ) ] = data
+            done = len( data )
+        else:
+            done = self._read_device_into( position, view )
+        
+        if IO_ACCOUNTING:
+            self._ioStats.count_read( len( view ), done )
+        
+        return done
+    
+    def _read_ahead( self, position, amount ):
+        # returns the data if the read could be served from read-ahead, else None
+        
+        with self._stateLock:
+            held       = self._ahead
+            data, fill = self._serve_ahead( position, amount )
+        
+        if fill:
+            # the buffer is filled without the state lock, so other readers carry on
+            # meanwhile. whatever they did to the state is looked at afresh after
+            try:
+                ahead = fill()
+            finally:
+                with self._stateLock:
+                    self._filling = False
+            
+            with self._stateLock:
+                if ahead:
+                    self._set_ahead( ahead )
+                data = self._from_ahead( position, amount )
+                if data is not None and position + amount == self._nextPosition:
+                    self._schedule_ahead()
+        
+        if self._ahead is not held:
+            GOVERNOR.charge()
+        
+        return data
+    
+    def _serve_ahead( self, position, amount ):
+        # the body of _read_ahead, under the state lock
+        # returns ( data, fill ), fill being what to call to fill the buffer when it
+        # could not serve the read, and the caller should do so
+        
+        sequential = ( position == self._nextPosition )
+        self._nextPosition = position + amount
+        
+        if sequential:
+            self._window = min( max( self._window * 2, READ_AHEAD_MINIMUM ), READ_AHEAD_MAXIMUM, GOVERNOR.share() )
+        else:
+            self._window = 0
+        
+        data = self._from_ahead( position, amount )
+        
+        if data is None and not self._filling:
+            if self._pending:
+                pending       = self._pending
+                self._pending = None
+                self._filling = True
+                return None, pending.collect
+            
+            if sequential and amount < self._window:
+                start         = position - position % self._blockSize
+                window        = self._window
+                self._filling = True
+                return None, lambda: self._fetch( start, window )
+        
+        if data is not None and sequential:
+            self._schedule_ahead()
+        
+        return data, None
+    
+    def _schedule_ahead( self ):
+        # starts fetching the window after the buffer in the background, for slow devices
+        
+        if not self._slow or self._pending or self._filling or not self._ahead:
+            return
+        
+        aheadEnd = self._ahead[0] + len( self._ahead[1] )
+        if aheadEnd < self._size:
+            self._pending = ReadAhead(
+                fetch    = self._fetch  ,
+                position = aheadEnd     ,
+                amount   = self._window ,
+                )
+        
+        return
+    
+    def _from_ahead( self, position, amount ):
+        if not self._ahead:
+            return None
+        
+        aheadPosition, aheadData = self._ahead
+        
+        if aheadPosition <= position and position + amount <= aheadPosition + len( aheadData ):
+            self._aheadStamp = next( MEMORY_CLOCK )
+            return aheadData[ position - aheadPosition : position - aheadPosition + amount ]
+        else:
+            return None
+    
+    def _set_ahead( self, ahead ):
+        # the read-ahead buffer is held under the memory governor, which may take it
+        # back between reads. rados only register once they first read ahead
+        
+        if ahead and self._ahead is None:
+            GOVERNOR.register( self )
+        
+        self._ahead      = ahead
+        self._aheadStamp = next( MEMORY_CLOCK )
+        
+        GOVERNOR.report( self, self.memory_used() )
+        return
+    
+    def memory_used( self ):
+        ahead = self._ahead
+        return len( ahead[1] ) if ahead else 0
+    
+    def coldest( self ):
+        ahead = self._ahead
+        if not ahead:
+            return None
+        return CACHE_PRIORITY_STREAMING, self._aheadStamp, len( ahead[1] )
+    
+    def release_coldest( self ):
+        # the buffer may be in use by a read on this very thread, which is left alone
+        
+        if not self._stateLock.acquire( False ):
+            return None
+        
+        try:
+            released = self.memory_used()
+            self._ahead = None
+            GOVERNOR.report( self, 0 )
+            return released
+        finally:
+            self._stateLock.release()
+    
+    def _fetch( self, position, amount ):
+        # reads whole blocks, stopping at the end of the device
+        
+        amount = amount + ( -( position + amount ) % self._blockSize )
+        amount = min( amount, self._size - position )
+        
+        data, _ = self._read_device( position, amount )
+        return position, data
+    
+    def _read_device( self, position, amount ):
+        if IO_ACCOUNTING:
+            with self._device_read( position, amount ):
+                return self._read_blocks( position, amount )
+        
+        return self._read_blocks( position, amount )
+    
+    def _read_device_into( self, position, view ):
+        if IO_ACCOUNTING:
+            with self._device_read( position, len( view ) ):
+                return self._read_blocks_into( position, view )
+        
+        return self._read_blocks_into( position, view )
+    
+    def _device_read( self, position, amount ):
+        # accounting for a read of the device, counted as one read unless the device
+        # has to be asked for its blocks one at a time
+        
+        if not amount:
+            return self._ioStats.device_read( 0, 0 )
+        
+        blockCount = ( position + amount - 1 ) / self._blockSize - position / self._blockSize + 1
+        
+        if blockCount == 1 or hasattr( self._blockDevice, 'get_blocks' ):
+            deviceReads = 1
+        else:
+            deviceReads = blockCount
+        
+        return self._ioStats.device_read( deviceReads, blockCount * self._blockSize )
+    
+    def _read_blocks( self, position, amount ):
+        # reads within a single block are handed back from the block rado as is
+        # 
+        if amount and position / self._blockSize == ( position + amount - 1 ) / self._blockSize:
+            return self._blockDevice.get_block( position / self._blockSize ).readatlen(
+                position % self._blockSize ,
+                amount                     ,
+                )
+        
+        requiredReads = Common.required_runs(
+            blockDevice = self._blockDevice ,
+            blockSize   = self._blockSize   ,
+            position    = position          ,
+            amount      = amount            ,
+            )
+        
+        if len( requiredReads ) == 1:
+            return requiredReads[0]['rado'].readatlen(
+                requiredReads[0]['offset'] ,
+                requiredReads[0]['amount'] ,
+                )
+        
+        bits = []
+        for requiredRead in requiredReads:
+            bit, _ = requiredRead['rado'].readatlen(
+                requiredRead['offset'] ,
+                requiredRead['amount'] ,
+                )
+            bits.append( bit )
+        
+        data = ''.join( bits )
+        return data, len( data )
+    
+    def _read_blocks_into( self, position, view ):
+        # each run copies its piece directly into the callers buffer
+        # 
+        
+        requiredReads = Common.required_runs(
+            blockDevice = self._blockDevice ,
+            blockSize   = self._blockSize   ,
+            position    = position          ,
+            amount      = len( view )       ,
+            )
+        
+        done = 0
+        for requiredRead in requiredReads:
+            amount = requiredRead['rado'].readintoat(
+                requiredRead['offset']                       ,
+                view[ done : done + requiredRead['amount'] ] ,
+                )
+            done += amount
+            if amount < requiredRead['amount']:
+                break
+        
+        return done
+
+
+class ReadAhead():
+    # fetches a span on a background thread, for RadoBlock
+    # fetch( position, amount ) returns ( position, data )
+    
+    def __init__( self, fetch, position, amount ):
+        self._fetch    = fetch
+        self._position = position
+        self._amount   = amount
+        self._result   = None
+        
+        self._thread = threading.Thread(
+            name   = 'uu-read-ahead' ,
+            target = self._run       ,
+            )
+        self._thread.daemon = True
+        self._thread.start()
+        return
+    
+    def __repr__( self ):
+        return '<ReadAhead position:%s amount:%s>' % (
+            repr( self._position ) ,
+            repr( self._amount   ) ,
+            )
+    
+    def _run( self ):
+        # a failed read-ahead is just dropped, the foreground will
+        # run into the same error itself when it reads there
+        # 
+        try:
+            self._result = self._fetch( self._position, self._amount )
+        except Exception, e:
+            LOG_FILE.warning( 'read ahead failed %r', e )
+        return
+    
+    def collect( self ):
+        # waits for the fetch, returning its ( position, data ) or None
+        self._thread.join()
+        return self._result
+
+
+class RadoZero():
+    # rado providing a range of zeroed memory
+    
+    def __init__( self, name, size ):
+        self._name = name
+        self._size = size
+        return
+    
+    def __repr__( self ):
+        return '<RadoZero name:%s size:%s>' % (
+            repr( self._name ) ,
+            repr( self._size ) ,
+            )
+    
+    def cursor( self ):
+        return Cursor( 
+            name = 'radozero-indirect-cursor' ,
+            rado = self                       ,
+            ).rado().cursor()
+    
+    def size( self ):
+        return self._size
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return Common.iter_chunks( self, chunkSize, start, end )
+    
+    def extents( self, start = 0, end = None ):
+        return Common.data_extents( self, start, end, isData = False )
+    
+    def readatlen( self, position, amount ):
+        # requires radorado to do limits?
+        return '\0' * amount, amount
+    
+    def readintoat( self, position, view ):
+        # requires radorado to do limits?
+        view[ 0 : len( view ) ] = '\0' * len( view )
+        return len( view )
+
+
+###############################################################################################
+## attributes handler
+
+class Attributes():
+    # an ordered dict with custom string-ing
+    
+    class Default(): pass
+    
+    @staticmethod
+    def from_iterator( iterator ):
+        attributes = Attributes()
+        for item in iterator:
+            attributes.append( item )
+        return attributes
+    
+    def __init__( self ):
+        self._byname  = {}
+        self._byorder = []
+        
+        self._longestName = 0
+        return
+    
+    def contains( self, name ):
+        return name in self._byname
+    
+    def put( self, name, value ):
+        if name in self._byname:
+            self._byname[ name ][ 0 ] = value
+        else:
+            box = [ value ]
+            self._byname[ name ] = box
+            self._byorder.append( (name, box) )
+            if len( name ) > self._longestName:
+                self._longestName = len( name )
+    
+    def append( self, value ):
+        # will add one to last key ( assumed number ) stored and append
+        # useful for building numeric array, not for anything else really
+        
+        ll = int( self._byorder[-1][0] ) if self._byorder else 0
+        nn = 1 + ll
+        self.put( str( nn ), value )
+        return
+    
+    def get( self, name, default = Default ):
+        if name in self._byname:
+            return self._byname[ name ][ 0 ]
+        elif default != self.Default:
+            return default
+        else:
+            raise Exception(
+                'no such attribute %s' % repr( name )
+                )
+        
+    def to_string( self, depth = 0 ):
+        return Attributes.render(
+            [ ( name, box[ 0 ] ) for name, box in self._byorder ] ,
+            self._longestName                                    ,
+            depth                                                ,
+            )
+    
+    @staticmethod
+    def render( items, longestName, depth ):
+        # the string-ing of to_string, shared with Record
+        
+        out = []
+        
+        out.append( ( " " * depth ) + "{\n" )
+        for ( name, value ) in items:
+            out.append(
+                "  "
+                + ( depth * " " )
+                + name
+                + ( " " * ( longestName - len( name ) ) )
+                + " : " 
+                + ( "\n" + value.to_string( depth = depth + 2 ) 
+                    if isinstance( value, ( Attributes, Record, Flags ) ) 
+                    else repr( value )
+                    )
+                + "\n"
+                )
+        out.append( ( " " * depth ) + "}" )
+        
+        return ''.join( out )
+    
+    def to_flat( self ):
+        return ' ; '.join( re.sub( ' +', ' ', self.to_string() ).split( '\n' ) )
+    
+    def items( self ):
+        return [ (k, v[0]) for k,v in self._byorder ]
+    
+    def __str__( self ):
+        return self.to_string()
+    
+    def __repr__( self ):
+        return self.to_string()
+
+
+#########################################################################################
+## record layouts
+##   fixed records declared once as a list of fields and compiled to a single struct,
+##   so a whole header comes from one read instead of a read per field
+
+class Layout():
+    # fields are ( name, format ) or ( name, format, converter )
+    # 
+    #   format is a struct code without the byte order, 'I', 'H', 'Q', 'B', 'b', '4s' ...
+    #     a repeat count on a number, as in '4I', gathers them into a list
+    #     'x' fields ( '105x' ) are padding and get no name, pass None
+    #   format may also be another Layout, which is decoded into nested Attributes
+    #   converter turns the raw value into what is stored. it may be a function, or the
+    #     name of a method looked up on the owner given to read or unpack, which lets a
+    #     layout declared in a class body use that classes flag decoders
+    # 
+    # records are decoded into a Record, unless Attributes to put them in are given
+    # 
+    
+    def __init__( self, name, byteOrder, fields ):
+        self._name       = name
+        self._byteOrder  = byteOrder
+        self._fields     = [] # ( name, valueCount or None for a scalar, converter or Layout )
+        self._values     = {} # name : ( index of first value, valueCount or None )
+        self._converters = {} # name : converter or Layout, for the fields having one
+        self._ownerNames = [] # of the fields converted by the owner, here or nested
+        self._names      = [] # of the fields, in order
+        self._longest    = 0  # length of the longest name
+        self._columns    = [] # ( name, numpy format, offset ) for dtype
+        self._dtype      = None
+        
+        formats = [ byteOrder ]
+        index   = 0
+        
+        for field in fields:
+            fieldName, fieldFormat = field[ 0 ], field[ 1 ]
+            converter              = field[ 2 ] if len( field ) > 2 else None
+            
+            offset = struct.calcsize( ''.join( formats ) )
+            
+            if isinstance( fieldFormat, Layout ):
+                formats.append( '%ss' % fieldFormat.size() )
+                self._fields.append( ( fieldName, None, fieldFormat ) )
+                self._values[ fieldName ] = ( index, None )
+                self._columns.append( ( fieldName, fieldFormat, offset ) )
+                index += 1
+                continue
+            
+            match = re.match( r'^(\d*)([a-zA-Z?])$', fieldFormat )
+            if not match:
+                raise Exception( 'bad format %s for field %s' % ( repr( fieldFormat ), repr( fieldName ) ) )
+            
+            count, code = match.groups()
+            formats.append( fieldFormat )
+            
+            if code == 'x':
+                continue
+            elif code in 'sp' or not count:
+                self._fields.append( ( fieldName, None, converter ) )
+                self._values[ fieldName ] = ( index, None )
+                self._columns.append( ( fieldName, fieldFormat, offset ) )
+                index += 1
+            else:
+                self._fields.append( ( fieldName, int( count ), converter ) )
+                self._values[ fieldName ] = ( index, int( count ) )
+                self._columns.append( ( fieldName, fieldFormat, offset ) )
+                index += int( count )
+        
+        for fieldName, _, converter in self._fields:
+            self._names.append( fieldName )
+            self._longest = max( self._longest, len( fieldName ) )
+            if converter:
+                self._converters[ fieldName ] = converter
+            if isinstance( converter, str ) or ( isinstance( converter, Layout ) and converter._ownerNames ):
+                self._ownerNames.append( fieldName )
+        
+        self._struct = struct.Struct( ''.join( formats ) )
+        return
+    
+    def __repr__( self ):
+        return '<Layout name:%s size:%s>' % (
+            repr( self._name        ) ,
+            repr( self._struct.size ) ,
+            )
+    
+    def size( self ):
+        return self._struct.size
+    
+    def read( self, cursor, owner = None, attributes = None ):
+        # decodes the record at the cursor, leaving the cursor after it
+        
+        data = cursor.read( self._struct.size )
+        
+        if len( data ) != self._struct.size:
+            raise Exception( 'expected %s bytes for %s, found %s' % (
+                    repr( self._struct.size ) ,
+                    repr( self._name        ) ,
+                    repr( len( data )       ) ,
+                    ))
+        
+        return self.unpack( data, owner, attributes )
+    
+    def unpack( self, data, owner = None, attributes = None ):
+        # values are put into the given attributes, or held by a new Record
+        
+        values = self._struct.unpack( data )
+        
+        if attributes == None:
+            return Record( self, values, owner )
+        
+        for fieldName in self._names:
+            attributes.put( fieldName, self.convert( values, fieldName, owner ) )
+        
+        return attributes
+    
+    def convert( self, values, name, owner ):
+        # the value of the field among the unpacked values, converter applied
+        
+        index, count = self._values[ name ]
+        
+        if count == None:
+            value = values[ index ]
+        else:
+            value = list( values[ index : index + count ] )
+        
+        converter = self._converters.get( name )
+        
+        if isinstance( converter, Layout ):
+            value = converter.unpack( value, owner )
+        elif isinstance( converter, str ):
+            if owner == None:
+                raise Exception( 'field %s of %s needs an owner to convert it' % ( repr( name ), repr( self._name ) ) )
+            value = getattr( owner, converter )( value )
+        elif converter:
+            value = converter( value )
+        
+        return value
+    
+    def value( self, data, name, offset = 0 ):
+        # the raw value of a single field of the record at offset, no converter applied
+        
+        if name not in self._values:
+            raise Exception( 'no field %s in %s' % ( repr( name ), repr( self._name ) ) )
+        
+        index, count = self._values[ name ]
+        values       = self._struct.unpack_from( data, offset )
+        
+        if count == None:
+            return values[ index ]
+        else:
+            return list( values[ index : index + count ] )
+    
+    def dtype( self ):
+        # a numpy structured dtype laid out the same as the record, or None when it has
+        # pascal strings, which numpy cannot decode. nested layouts become nested dtypes,
+        # padding is left out of the names
+        # 
+        # strings are kept as raw void bytes, numpys own strings would drop trailing
+        # nuls and hand back something different from struct
+        
+        numpy = optional_numpy()
+        if not numpy:
+            raise Exception( 'numpy is unavailable' )
+        
+        if self._dtype == None:
+            byteOrder = { '!' : '>', '@' : '=' }.get( self._byteOrder, self._byteOrder )
+            
+            names, formats, offsets = [], [], []
+            
+            for fieldName, fieldFormat, offset in self._columns:
+                if isinstance( fieldFormat, Layout ):
+                    numpyFormat = fieldFormat.dtype()
+                    if numpyFormat is None:
+                        self._dtype = False
+                        return None
+                else:
+                    count, code = re.match( r'^(\d*)([a-zA-Z?])$', fieldFormat ).groups()
+                    if code == 'p':
+                        self._dtype = False
+                        return None
+                    elif code == 's':
+                        numpyFormat = 'V%s' % ( count or '1' )
+                    elif count:
+                        numpyFormat = ( byteOrder + NUMPY_CODES[ code ], ( int( count ), ) )
+                    else:
+                        numpyFormat = byteOrder + NUMPY_CODES[ code ]
+                
+                names.append( fieldName )
+                formats.append( numpyFormat )
+                offsets.append( offset )
+            
+            self._dtype = numpy.dtype({
+                    'names'    : names             ,
+                    'formats'  : formats           ,
+                    'offsets'  : offsets           ,
+                    'itemsize' : self._struct.size ,
+                    })
+        
+        return None if self._dtype is False else self._dtype
+    
+    # converters matching the cursor helpers of the same name
+    
+    @staticmethod
+    def uuid( value ):
+        import uuid # deferred, it loads ctypes and libuuid
+        return str( uuid.UUID( bytes = value ) )
+    
+    @staticmethod
+    def clipped( value ):
+        return value.split( '\x00' )[0]
+
+
+class Record( object ):
+    # a record decoded by a Layout, read the same as Attributes ( get, put, contains,
+    # items, to_string ) but holding only the tuple of unpacked values. converters and
+    # nested layouts are applied the first time a field is asked for, so the flags and
+    # dates of the entries in a directory go unbuilt unless someone looks at them
+    # 
+    # a new style class, for the __slots__. fields converted by the owner are decoded
+    # up front, so the record never holds on to the owner. memoized records then
+    # neither keep their file systems alive nor break once they are gone
+    
+    __slots__ = ( '_layout', '_values', '_decoded', '_extra' )
+    
+    def __init__( self, layout, values, owner = None ):
+        self._layout  = layout
+        self._values  = values
+        self._decoded = None # name : value, for converted fields and those put over
+        self._extra   = None # [ name, value ] for names the layout does not have
+        
+        if owner != None and layout._ownerNames:
+            self._decoded = {}
+            for name in layout._ownerNames:
+                self._decoded[ name ] = layout.convert( values, name, owner )
+        
+        return
+    
+    def contains( self, name ):
+        if name in self._layout._values:
+            return True
+        
+        return any( extra[ 0 ] == name for extra in self._extra or () )
+    
+    def get( self, name, default = Attributes.Default ):
+        if self._decoded and name in self._decoded:
+            return self._decoded[ name ]
+        
+        if name in self._layout._values:
+            value = self._layout.convert( self._values, name, None )
+            
+            if name in self._layout._converters:
+                if self._decoded == None:
+                    self._decoded = {}
+                self._decoded[ name ] = value
+            
+            return value
+        
+        for extra in self._extra or ():
+            if extra[ 0 ] == name:
+                return extra[ 1 ]
+        
+        if default != Attributes.Default:
+            return default
+        else:
+            raise Exception(
+                'no such attribute %s' % repr( name )
+                )
+    
+    def put( self, name, value ):
+        if name in self._layout._values:
+            if self._decoded == None:
+                self._decoded = {}
+            self._decoded[ name ] = value
+            return
+        
+        if self._extra == None:
+            self._extra = []
+        
+        for extra in self._extra:
+            if extra[ 0 ] == name:
+                extra[ 1 ] = value
+                return
+        
+        self._extra.append( [ name, value ] )
+        return
+    
+    def items( self ):
+        return (
+            [ ( name, self.get( name ) ) for name in self._layout._names ]
+            + [ ( name, value ) for name, value in self._extra or () ]
+            )
+    
+    def to_string( self, depth = 0 ):
+        longestName = max(
+            [ self._layout._longest ]
+            + [ len( name ) for name, _ in self._extra or () ]
+            )
+        
+        return Attributes.render( self.items(), longestName, depth )
+    
+    def to_flat( self ):
+        return ' ; '.join( re.sub( ' +', ' ', self.to_string() ).split( '\n' ) )
+    
+    def __str__( self ):
+        return self.to_string()
+    
+    def __repr__( self ):
+        return self.to_string()
+
+
+class Flags( object ):
+    # flags decoded from a number, read the same as Attributes but holding only the
+    # number and the ( name, mask ) flags it is read with, shared by every decoding
+    # 
+    # a mask of several bits is set when all of them are, and its bits are taken out
+    # before the flags after it are checked. with unknown the bits left over once all
+    # the flags are checked are given as '::unknown'. values put are kept aside, over
+    # the flag of the same name or after the rest
+    
+    __slots__ = ( '_flags', '_value', '_unknown', '_extra' )
+    
+    def __init__( self, flags, value, unknown = False ):
+        self._flags   = flags
+        self._value   = value
+        self._unknown = unknown
+        self._extra   = None # [ name, value ]
+        return
+    
+    def put( self, name, value ):
+        if self._extra == None:
+            self._extra = []
+        
+        for extra in self._extra:
+            if extra[ 0 ] == name:
+                extra[ 1 ] = value
+                return
+        
+        self._extra.append( [ name, value ] )
+        return
+    
+    def items( self ):
+        items = []
+        value = self._value
+        
+        for flagName, flagValue in self._flags:
+            active = ( flagValue & value ) == flagValue
+            items.append( ( flagName, active ) )
+            if active:
+                value -= flagValue
+        
+        if self._unknown:
+            items.append( ( '::unknown', value ) )
+        
+        if self._extra:
+            extra = dict( self._extra )
+            items = [ ( name, extra.pop( name, active ) ) for name, active in items ]
+            items.extend( ( name, value ) for name, value in self._extra if name in extra )
+        
+        return items
+    
+    def contains( self, name ):
+        return any( flagName == name for flagName, _ in self.items() )
+    
+    def get( self, name, default = Attributes.Default ):
+        for flagName, active in self.items():
+            if flagName == name:
+                return active
+        
+        if default != Attributes.Default:
+            return default
+        else:
+            raise Exception(
+                'no such attribute %s' % repr( name )
+                )
+    
+    def to_string( self, depth = 0 ):
+        items = self.items()
+        return Attributes.render( items, max( len( name ) for name, _ in items ), depth )
+    
+    def to_flat( self ):
+        return ' ; '.join( re.sub( ' +', ' ', self.to_string() ).split( '\n' ) )
+    
+    def __str__( self ):
+        return self.to_string()
+    
+    def __repr__( self ):
+        return self.to_string()
+
+
+# struct codes to numpy type codes, for Layout.dtype
+NUMPY_CODES = {
+    'b' : 'i1' , 'B' : 'u1' ,
+    'h' : 'i2' , 'H' : 'u2' ,
+    'i' : 'i4' , 'I' : 'u4' ,
+    'l' : 'i4' , 'L' : 'u4' ,
+    'q' : 'i8' , 'Q' : 'u8' ,
+    'f' : 'f4' , 'd' : 'f8' ,
+    '?' : 'b1' , 'c' : 'V1' ,
+    }
+
+
+class Table():
+    # a run of records sharing one layout, read from a rado in one go
+    # 
+    # with numpy about, the run is decoded all at once into a structured array, and
+    # columns come back as arrays that can be compared and searched without a python
+    # loop per record. without it the same calls walk the records with struct.
+    # 
+    # get, column and find work on the raw stored values. record decodes through the
+    # layout with its converters, exactly as Layout.read would
+    # 
+    
+    def __init__( self, name, layout, data, stride = None ):
+        self._name   = name
+        self._layout = layout
+        self._data   = data
+        self._stride = stride or layout.size()
+        
+        if self._stride < layout.size():
+            raise Exception( 'stride %s is smaller than the %s byte records of %s' % (
+                    repr( self._stride ) ,
+                    repr( layout.size() ) ,
+                    repr( name          ) ,
+                    ))
+        
+        # a trailing record needs only its own bytes, not a full stride
+        if len( data ) < layout.size():
+            self._count = 0
+        else:
+            self._count = ( len( data ) - layout.size() ) / self._stride + 1
+        
+        numpy = optional_numpy()
+        if numpy and layout.dtype() is not None:
+            self._array = numpy.ndarray(
+                shape   = ( self._count,  ) ,
+                dtype   = layout.dtype()    ,
+                buffer  = data              ,
+                strides = ( self._stride, ) ,
+                )
+        else:
+            self._array = None
+        
+        return
+    
+    @staticmethod
+    def read( name, rado, layout, offset, count, stride = None ):
+        # reads count records starting at offset, fewer if the rado ends first
+        # each takes its full stride, so stride_data has the whole of the last one too
+        
+        stride = stride or layout.size()
+        
+        if count > 0:
+            data = ''.join( rado.iter_chunks(
+                    start = offset                  ,
+                    end   = offset + count * stride ,
+                    ))
+        else:
+            data = ''
+        
+        return Table(
+            name   = name   ,
+            layout = layout ,
+            data   = data   ,
+            stride = stride ,
+            )
+    
+    def __repr__( self ):
+        return '<Table name:%s records:%s>' % (
+            repr( self._name  ) ,
+            repr( self._count ) ,
+            )
+    
+    def __len__( self ):
+        return self._count
+    
+    def memory_cost( self ):
+        return MEMOIZATION_ENTRY_COST + len( self._data )
+    
+    def _check_index( self, index ):
+        if index < 0 or index >= self._count:
+            raise Exception( 'record %s is outside the %s records of %s' % (
+                    repr( index       ) ,
+                    repr( self._count ) ,
+                    repr( self._name  ) ,
+                    ))
+    
+    def get( self, index, name ):
+        # the raw value of one field of one record
+        
+        self._check_index( index )
+        
+        if self._array is not None:
+            return self._array[ index ][ name ].tolist()
+        else:
+            return self._layout.value( self._data, name, index * self._stride )
+    
+    def column( self, name ):
+        # the raw values of a field across every record
+        # a numpy array when numpy is available, otherwise a list. strings come back as
+        # a list either way, numpy only holds them as void bytes
+        
+        if self._array is not None:
+            column = self._array[ name ]
+            if column.dtype.kind == 'V' and column.dtype.fields is None:
+                return column.tolist()
+            return column
+        else:
+            return [
+                self._layout.value( self._data, name, index * self._stride )
+                for index in xrange( self._count )
+                ]
+    
+    def find( self, name, value, start = 0 ):
+        # index of the first record at or after start with the given raw value, or None
+        
+        if self._array is not None:
+            numpy  = optional_numpy()
+            column = self._array[ name ][ start: ]
+            
+            # strings are void bytes in the array, and only ever equal at full width
+            if column.dtype.kind == 'V' and column.dtype.fields is None and isinstance( value, str ):
+                if len( value ) != column.dtype.itemsize:
+                    return None
+                value = numpy.void( value )
+            
+            found = numpy.flatnonzero( column == value )
+            if len( found ):
+                return start + int( found[0] )
+            else:
+                return None
+        else:
+            for index in xrange( start, self._count ):
+                if self._layout.value( self._data, name, index * self._stride ) == value:
+                    return index
+            return None
+    
+    def runs( self, name, mask = None, start = 0, end = None ):
+        # ( count, isSet ) runs over the records from start to end, isSet being whether
+        # the raw value, anded with mask when one is given, is non-zero
+        
+        if end == None or end > self._count:
+            end = self._count
+        
+        if start >= end:
+            return []
+        
+        runs = []
+        
+        if self._array is not None:
+            numpy  = optional_numpy()
+            values = self._array[ name ][ start : end ]
+            if mask != None:
+                values = values & numpy.array( mask, dtype = values.dtype )
+            
+            isSet   = ( values != 0 )
+            changes = ( numpy.flatnonzero( isSet[ 1: ] != isSet[ :-1 ] ) + 1 ).tolist()
+            bounds  = [ 0 ] + changes + [ end - start ]
+            
+            for first, last in zip( bounds[ :-1 ], bounds[ 1: ] ):
+                runs.append( ( last - first, bool( isSet[ first ] ) ) )
+        else:
+            for index in xrange( start, end ):
+                value = self._layout.value( self._data, name, index * self._stride )
+                if mask != None:
+                    value = value & mask
+                
+                if runs and runs[-1][1] == bool( value ):
+                    runs[-1] = ( runs[-1][0] + 1, runs[-1][1] )
+                else:
+                    runs.append( ( 1, bool( value ) ) )
+        
+        return runs
+    
+    def record_data( self, index ):
+        self._check_index( index )
+        
+        offset = index * self._stride
+        return self._data[ offset : offset + self._layout.size() ]
+    
+    def stride_data( self, index ):
+        # the record along with whatever follows it up to the next one
+        self._check_index( index )
+        
+        offset = index * self._stride
+        return self._data[ offset : offset + self._stride ]
+    
+    def record( self, index, owner = None ):
+        return self._layout.unpack( self.record_data( index ), owner )
+    
+    def records( self, owner = None, end = None ):
+        if end == None or end > self._count:
+            end = self._count
+        
+        for index in xrange( end ):
+            yield self.record( index, owner )
+
+
+####################################################################################
+## serialization
+##   Attributes trees, and the Records and Flags read like them, written to a file
+##   object a node at a time for other programs to read. nothing is built up past
+##   the name and value at hand, however big the tree
+##   
+##   text       : as to_string renders them
+##   json lines : each tree one json object on a line of its own, names in order.
+##                byte strings that aren't utf-8 are written as { "$bytes" : base64 }
+##   binary     : tagged values, see AttributesWriter__Binary. read back with
+##                AttributesReader__Binary
+## 
+## writers have write( value ), and are made by name with Common.attributes_writer
+
+ATTRIBUTES_FORMATS = [ 'text', 'json', 'binary' ]
+
+class AttributesWriter__Text():
+    def __init__( self, fileobj ):
+        self._fileobj = fileobj
+        return
+    
+    def write( self, value ):
+        self._write_value( value, 0 )
+        self._fileobj.write( '\n' )
+        return
+    
+    def _write_value( self, value, depth ):
+        # follows Attributes.render
+        
+        if not isinstance( value, ( Attributes, Record, Flags ) ):
+            self._fileobj.write( repr( value ) )
+            return
+        
+        items       = value.items()
+        longestName = max( [ 0 ] + [ len( name ) for name, _ in items ] )
+        
+        self._fileobj.write( ( ' ' * depth ) + '{\n' )
+        for name, item in items:
+            self._fileobj.write( '  ' + ( ' ' * depth ) + name + ( ' ' * ( longestName - len( name ) ) ) + ' : ' )
+            if isinstance( item, ( Attributes, Record, Flags ) ):
+                self._fileobj.write( '\n' )
+                self._write_value( item, depth + 2 )
+            else:
+                self._fileobj.write( repr( item ) )
+            self._fileobj.write( '\n' )
+        self._fileobj.write( ( ' ' * depth ) + '}' )
+        return
+
+
+class AttributesWriter__JsonLines():
+    def __init__( self, fileobj ):
+        self._fileobj = fileobj
+        return
+    
+    def write( self, value ):
+        self._write_value( value )
+        self._fileobj.write( '\n' )
+        return
+    
+    def _write_value( self, value ):
+        write = self._fileobj.write
+        
+        if isinstance( value, ( Attributes, Record, Flags ) ):
+            write( '{' )
+            for index, ( name, item ) in enumerate( value.items() ):
+                if index:
+                    write( ',' )
+                write( json.dumps( name ) )
+                write( ':' )
+                self._write_value( item )
+            write( '}' )
+        
+        elif isinstance( value, ( list, tuple ) ):
+            write( '[' )
+            for index, item in enumerate( value ):
+                if index:
+                    write( ',' )
+                self._write_value( item )
+            write( ']' )
+        
+        elif isinstance( value, str ):
+            try:
+                value.decode( 'utf-8' )
+            except UnicodeDecodeError:
+                write( '{"$bytes":"%s"}' % base64.b64encode( value ) )
+            else:
+                write( json.dumps( value ) )
+        
+        elif value == None or isinstance( value, ( bool, int, long, float, unicode ) ):
+            write( json.dumps( value ) )
+        
+        else:
+            write( json.dumps( repr( value ) ) )
+        
+        return
+
+
+class AttributesWriter__Binary():
+    # each value is a tag byte followed by what the tag calls for. counts, lengths
+    # and integers are varints, seven bits a byte least significant first, integers
+    # zigzagged so small negative numbers stay small
+    # 
+    #   A count, then count pairs of name ( bytes ) and value : Attributes
+    #   L count, then count values                            : list
+    #   S length, then the bytes                              : byte string
+    #   U length, then the utf-8                              : unicode
+    #   I integer
+    #   D eight byte big endian double
+    #   T true, F false, N none
+    # 
+    # anything else is written as the unicode of its repr. the stream opens with
+    # ATTRIBUTES_BINARY_MAGIC, written with the first tree, then holds the trees one
+    # after the other
+    
+    def __init__( self, fileobj ):
+        self._fileobj = fileobj
+        self._started = False
+        return
+    
+    def write( self, value ):
+        # the magic waits for the first tree, so a writer made and never used leaves
+        # its file empty
+        
+        if not self._started:
+            self._fileobj.write( ATTRIBUTES_BINARY_MAGIC )
+            self._started = True
+        
+        self._write_value( value )
+        return
+    
+    def _write_value( self, value ):
+        write = self._fileobj.write
+        
+        if isinstance( value, ( Attributes, Record, Flags ) ):
+            items = value.items()
+            write( 'A' + Common.varint( len( items ) ) )
+            for name, item in items:
+                write( Common.varint( len( name ) ) + name )
+                self._write_value( item )
+        
+        elif isinstance( value, ( list, tuple ) ):
+            write( 'L' + Common.varint( len( value ) ) )
+            for item in value:
+                self._write_value( item )
+        
+        elif isinstance( value, bool ):
+            write( 'T' if value else 'F' )
+        
+        elif isinstance( value, ( int, long ) ):
+            write( 'I' + Common.varint( value * 2 if value >= 0 else -value * 2 - 1 ) )
+        
+        elif isinstance( value, float ):
+            write( 'D' + struct.pack( '>d', value ) )
+        
+        elif isinstance( value, str ):
+            write( 'S' + Common.varint( len( value ) ) + value )
+        
+        elif value == None:
+            write( 'N' )
+        
+        else:
+            if not isinstance( value, unicode ):
+                value = unicode( repr( value ) )
+            value = value.encode( 'utf-8' )
+            write( 'U' + Common.varint( len( value ) ) + value )
+        
+        return
+
+
+class AttributesReader__Binary():
+    # the trees written by AttributesWriter__Binary, as Attributes
+    
+    def __init__( self, fileobj ):
+        self._fileobj = fileobj
+        
+        if self._read( len( ATTRIBUTES_BINARY_MAGIC ) ) != ATTRIBUTES_BINARY_MAGIC:
+            raise Exception( 'not a binary attributes stream' )
+        return
+    
+    def __iter__( self ):
+        while True:
+            tag = self._fileobj.read( 1 )
+            if not tag:
+                return
+            yield self._read_value( tag )
+    
+    def read( self ):
+        # the next tree, or None at the end of the stream
+        tag = self._fileobj.read( 1 )
+        return self._read_value( tag ) if tag else None
+    
+    def _read( self, amount ):
+        data = self._fileobj.read( amount )
+        if len( data ) != amount:
+            raise Exception( 'binary attributes stream ends early' )
+        return data
+    
+    def _read_varint( self ):
+        value = 0
+        shift = 0
+        while True:
+            byte   = ord( self._read( 1 ) )
+            value |= ( byte & 0x7f ) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+    
+    def _read_value( self, tag ):
+        if tag == 'A':
+            attributes = Attributes()
+            for _ in xrange( self._read_varint() ):
+                name = self._read( self._read_varint() )
+                attributes.put( name, self._read_value( self._read( 1 ) ) )
+            return attributes
+        
+        if tag == 'L':
+            return [ self._read_value( self._read( 1 ) ) for _ in xrange( self._read_varint() ) ]
+        
+        if tag == 'I':
+            value = self._read_varint()
+            return value >> 1 if not value & 1 else -( ( value + 1 ) >> 1 )
         
-        self._fo.seek( position )
-        chunk = self._fo.read( amount )
+        if tag == 'S': return self._read( self._read_varint() )
+        if tag == 'U': return self._read( self._read_varint() ).decode( 'utf-8' )
+        if tag == 'D': return struct.unpack( '>d', self._read( 8 ) )[0]
+        if tag == 'T': return True
+        if tag == 'F': return False
+        if tag == 'N': return None
         
-        return chunk, len( chunk )
+        raise Exception( 'unknown tag in binary attributes stream : %s' % repr( tag ) )
 
+ATTRIBUTES_BINARY_MAGIC = 'uuA\x01'
 
-class File__BlockDevice():
-    def __init__( self, name, fileobj ):
-        self._name    = name
-        self._fileobj = fileobj
-        
-        # sneaky seek to end to get filesize
-        self._fileobj.seek( 0, 2 )
-        self._size = self._fileobj.tell()
-        
-        self._blocksRead = 0
+
+#########################################################################################
+## asynchronous access
+##   python 2 has no asyncio, so the facade hands back Futures resolved by a pool of
+##   worker threads. callbacks given to add_done_callback run on the worker thread, an
+##   event loop should pass them back to its own ( tornados IOLoop.add_callback, or
+##   twisteds reactor.callFromThread ). any number of inspections can be in flight at
+##   once, each only blocking the worker doing its read
+
+class Future():
+    # the result of a call running on an Executor
+    
+    def __init__( self ):
+        self._condition = threading.Condition()
+        self._done      = False
+        self._result    = None
+        self._excInfo   = None
+        self._callbacks = []
         return
     
     def __repr__( self ):
-        return '<File__BlockDevice name:%s fileobj:%s>' % (
-            repr( self._name    ) ,
-            repr( self._fileobj ) ,
+        return '<Future done:%s>' % (
+            repr( self._done ) ,
             )
     
-    def get_blocks_read( self ):
-        return self._blocksRead
+    def done( self ):
+        return self._done
     
-    def block_size( self ):
-        return FILE_BLOCK_SIZE
+    def wait( self, timeout = None ):
+        # returns whether the future is done
+        with self._condition:
+            if not self._done:
+                self._condition.wait( timeout )
+            return self._done
     
-    def size( self ):
-        return self._size
+    def result( self, timeout = None ):
+        # the result, or the exception raised getting it raised again here
+        
+        if not self.wait( timeout ):
+            raise Exception( 'timed out waiting for future' )
+        
+        if self._excInfo:
+            raise self._excInfo[0], self._excInfo[1], self._excInfo[2]
+        
+        return self._result
     
-    @Common.memoize( 'file-blocks' )
-    def get_block( self, blockNo ):
+    def exception( self, timeout = None ):
+        if not self.wait( timeout ):
+            raise Exception( 'timed out waiting for future' )
         
-        self._blocksRead += 1
+        return self._excInfo[1] if self._excInfo else None
+    
+    def add_done_callback( self, fn ):
+        # fn( future ), called right away if the future is already done
         
-        DEBUG_FILE( 'FILE[:position=%s:amount=%s]' % (
-                str( blockNo * FILE_BLOCK_SIZE ),
-                str( FILE_BLOCK_SIZE           ),
-                ))
+        with self._condition:
+            if not self._done:
+                self._callbacks.append( fn )
+                return
         
-        self._fileobj.seek( blockNo * FILE_BLOCK_SIZE )
-        return RadoBlob(
-            name = 'file-block-device/get-block-rado' ,
-            blob = self._fileobj.read( FILE_BLOCK_SIZE )
-            )
+        fn( self )
+    
+    def _resolve_from( self, future ):
+        self._resolve( future._result, future._excInfo )
+    
+    def _resolve( self, result = None, excInfo = None ):
+        with self._condition:
+            self._result    = result
+            self._excInfo   = excInfo
+            self._done      = True
+            callbacks       = self._callbacks
+            self._callbacks = []
+            self._condition.notify_all()
+        
+        for fn in callbacks:
+            try:
+                fn( self )
+            except Exception, e:
+                LOG_ASYNC.error( 'future callback failed\n%s', traceback.format_exc().rstrip() )
 
 
-class RadoRado():
-    # anything requiring a specific segment of another rado should be run through this
-    # as the read capping logic exists only here for simplicity in other rados
+class Executor():
+    # a fixed pool of daemon threads running submitted calls
     
-    def __init__( self, name, rado, offset = 0, size = None ):
-        self._name   = name
-        self._rado   = rado
-        self._offset = offset
+    def __init__( self, workers = ASYNC_WORKERS ):
+        self._queue   = Queue.Queue()
+        self._threads = []
         
-        self._size   = (
-            size if size != None else ( rado.size() - self._offset )
-            )
+        for workerNo in xrange( workers ):
+            thread = threading.Thread(
+                name   = 'uu-async-worker-%s' % workerNo ,
+                target = self._work                      ,
+                )
+            thread.daemon = True
+            thread.start()
+            self._threads.append( thread )
         
         return
     
     def __repr__( self ):
-        return '<RadoRado name:%s offset:%s size:%s rado:%s>' % (
-            repr( self._name   ) ,
-            repr( self._offset ) ,
-            repr( self._size   ) ,
-            repr( self._rado   ) ,
-            )
-    
-    def cursor( self ):
-        return Cursor(
-            name = 'radorado-cursor' ,
-            rado = self              ,
+        return '<Executor workers:%s queued:%s>' % (
+            repr( len( self._threads ) ) ,
+            repr( self._queue.qsize()  ) ,
             )
     
-    def size( self ):
-        return self._size
+    def submit( self, fn, *args, **kwargs ):
+        future = Future()
+        self._queue.put( ( future, fn, args, kwargs ) )
+        return future
     
-    def readatlen( self, position, amount ):
-        if position < 0: raise Exception( 'received negative position' )
-        if amount   < 0: raise Exception( 'received negative amount'   )
+    def shutdown( self, wait = True ):
+        # work already submitted is finished first
         
-        if self._size == None:
-            raise Exception( 'oh god wat' )
+        for _ in self._threads:
+            self._queue.put( None )
         
-        else:
-            # size underflow detection?
-            # like, the size thinks there should be data, but the underlying rado runs out?
-            
-            if position > self._size:
-                return '', 0
+        if wait:
+            for thread in self._threads:
+                thread.join()
+    
+    def _work( self ):
+        while True:
+            work = self._queue.get()
+            if work == None:
+                return
             
-            if position + amount > self._size:
-                amount = self._size - position
+            future, fn, args, kwargs = work
             
-            return self._rado.readatlen( self._offset + position, amount )
+            try:
+                result = fn( *args, **kwargs )
+            except Exception:
+                future._resolve( excInfo = sys.exc_info() )
+            else:
+                future._resolve( result = result )
 
 
-class RadoBlock():
-    # rado over a block device
-    # calls .size()
-    # calls .block_size()
-    # calls .get_block( blockNo )
+EXECUTOR      = None
+EXECUTOR_LOCK = threading.Lock()
+
+def default_executor():
+    # the executor used when none is given, started on first use
     
-    def __init__( self, name, blockDevice ):
-        self._name        = name
-        self._blockDevice = blockDevice
-        self._blockSize   = blockDevice.block_size()
-        self._size        = blockDevice.size()
+    global EXECUTOR
+    
+    with EXECUTOR_LOCK:
+        if EXECUTOR == None:
+            EXECUTOR = Executor()
+        return EXECUTOR
+
+
+class AsyncRado():
+    # asynchronous facade over a rado, each call handing back a Future
+    
+    def __init__( self, rado, executor = None ):
+        self._rado     = rado
+        self._executor = executor or default_executor()
         return
     
     def __repr__( self ):
-        return '<RadoBlock name:%s blocksize:%s size:%s blockDevice:%s>' % (
-            repr( self._name        ) ,
-            repr( self._blockSize   ) ,
-            repr( self._size        ) ,
-            repr( self._blockDevice ) ,
+        return '<AsyncRado rado:%s>' % (
+            repr( self._rado ) ,
             )
     
-    def cursor( self ):
-        # use RadoRado to clip and check incoming readatlen args
-        # 
-        return Cursor(
-            name = 'radoblock-indirect-cursor' ,
-            rado = self                        ,
-            ).rado().cursor()
+    def rado( self ):
+        # the rado underneath, for use off the event loop
+        return self._rado
     
     def size( self ):
-        # not in blocks. final block may be only partially filled with
-        # usable data. we won't read past where we're told is good
-        # 
-        return self._blockDevice.size()
+        # sizes are known up front and never block
+        return self._rado.size()
     
-    def readatlen( self, position, amount ):
-        # position and amount have passed through RadoRado, so they should
-        # never ask for data that the underlying block device does not 
-        # purport to have
-        # 
-        
-        requiredReads = Common.required_reads(
-            blockSize = self._blockSize ,
-            position  = position        ,
-            amount    = amount          ,
+    def read_at( self, position, amount ):
+        # Future of the data, which may be short at the end of the rado
+        return self._executor.submit( self._read_at, position, amount )
+    
+    def _read_at( self, position, amount ):
+        data, _ = self._rado.readatlen( position, amount )
+        return data
+    
+    def extents( self, start = 0, end = None ):
+        return self._executor.submit( self._rado.extents, start, end )
+    
+    def iter_chunks( self, chunkSize = CHUNK_SIZE, start = 0, end = None ):
+        return AsyncChunks(
+            chunks   = self._rado.iter_chunks( chunkSize, start, end ) ,
+            executor = self._executor                                  ,
             )
-        
-        bits = []
-        for requiredRead in requiredReads:
-            blockDataRado = self._blockDevice.get_block( requiredRead['sector'] )
-            cursor = blockDataRado.cursor()
-            cursor.seek( requiredRead['offset'] )
-            bits.append( cursor.read( requiredRead['amount'] ) )
-        
-        data = ''.join( bits )
-        return data, len( data )
 
 
-class RadoZero():
-    # rado providing a range of zeroed memory
+class AsyncChunks():
+    # asynchronous chunk iteration, next() hands back a Future of the next chunk, or of
+    # None once they run out. the following chunk is read ahead while the last is used
     
-    def __init__( self, name, size ):
-        self._name = name
-        self._size = size
+    def __init__( self, chunks, executor ):
+        self._chunks   = chunks
+        self._executor = executor
+        self._lock     = threading.Lock()
+        self._pending  = None
         return
     
     def __repr__( self ):
-        return '<RadoZero name:%s size:%s>' % (
-            repr( self._name ) ,
-            repr( self._size ) ,
+        return '<AsyncChunks chunks:%s>' % (
+            repr( self._chunks ) ,
             )
     
-    def cursor( self ):
-        return Cursor( 
-            name = 'radozero-indirect-cursor' ,
-            rado = self                       ,
-            ).rado().cursor()
+    def next( self ):
+        with self._lock:
+            if self._pending == None:
+                self._pending = self._executor.submit( self._next_chunk )
+            
+            future        = self._pending
+            self._pending = Future()
+            
+            ahead = self._pending
+            future.add_done_callback( lambda done: self._read_ahead( ahead ) )
+            
+            return future
     
-    def size( self ):
-        return self._size
+    def _read_ahead( self, ahead ):
+        # the generator is only advanced once the chunk before is in, keeping them in order
+        self._executor.submit( self._next_chunk ).add_done_callback( ahead._resolve_from )
     
-    def readatlen( self, position, amount ):
-        # requires radorado to do limits?
-        return '\0' * amount, amount
+    def _next_chunk( self ):
+        return next( self._chunks, None )
 
 
-###############################################################################################
-## attributes handler
+class AsyncModel():
+    # asynchronous facade over a model, listing and selecting on the executor
+    
+    def __init__( self, model, executor = None ):
+        self._model    = model
+        self._executor = executor or default_executor()
+        return
+    
+    def __repr__( self ):
+        return '<AsyncModel model:%s>' % (
+            repr( self._model ) ,
+            )
+    
+    def model( self ):
+        # the model underneath, for use off the event loop
+        return self._model
+    
+    def is_listable( self ): return self._model.is_listable()
+    def is_radoable( self ): return self._model.is_radoable()
+    
+    def list( self ):
+        return self._executor.submit( self._model.list )
+    
+    def select( self, what ):
+        # Future of the AsyncModel for the selection
+        return self._executor.submit( self._select, what )
+    
+    def _select( self, what ):
+        return AsyncModel( self._model.select( what ), self._executor )
+    
+    def rado( self ):
+        # Future of an AsyncRado over the models contents
+        return self._executor.submit( self._rado )
+    
+    def _rado( self ):
+        return AsyncRado( self._model.rado(), self._executor )
 
-class Attributes():
-    # an ordered dict with custom string-ing
+
+#########################################################################################
+## models
+
+MODELS         = []
+MODELS_BY_NAME = {}
+
+# models declare where their magic lives as a list of Signature in a `signatures`
+# class attribute, any one of which makes the model a candidate. an empty list
+# marks a model that is never detected, and a model without the attribute is
+# always asked through its matches(), as everything was before the registry
+# 
+# signatures are indexed by their probe window, ( offset, length, mask ), so
+# detection reads each window once and looks the bytes up, rather than asking
+# every model in turn to build a cursor and read for itself. matches() is then
+# only called to confirm the few models whose signatures hit
+# 
+# each distinct window is read once, overlapping windows ( the 4 byte stuffit magic
+# and the 16 byte stuffit 5 one, say ) being merged into a single span. nothing
+# between the windows is read, so a tiny blob deep in a dmg is not made to produce
+# the 32k up to the cdfs magic just to be told it has none
+# 
+
+SIGNATURE_WINDOWS  = OrderedDict() # ( offset, length, mask ) -> { magic -> [ model ] }
+SIGNATURE_SPANS    = []            # ( start, end ) covering the windows, negative from the end
+UNSIGNED_MODELS    = set()         # models without signatures, probed through matches()
+
+class Signature():
+    def __init__( self, offset, magic, mask = None ):
+        if mask is not None and len( mask ) != len( magic ):
+            raise Exception( 'signature mask and magic differ in length : %r %r' % ( mask, magic ) )
+        
+        self.offset = offset
+        self.magic  = Signature.apply( magic, mask )
+        self.mask   = mask
+        return
     
-    class Default(): pass
+    def __repr__( self ):
+        return '<Signature offset:%r magic:%r mask:%r>' % ( self.offset, self.magic, self.mask )
+    
+    def window( self ):
+        return ( self.offset, len( self.magic ), self.mask )
     
     @staticmethod
-    def from_iterator( iterator ):
-        attributes = Attributes()
-        for item in iterator:
-            attributes.append( item )
-        return attributes
+    def apply( data, mask ):
+        if mask is None:
+            return data
+        return ''.join( chr( ord( d ) & ord( m ) ) for d, m in zip( data, mask ) )
     
-    def __init__( self ):
-        self._byname  = {}
-        self._byorder = []
-        
-        self._longestName = 0
+    @staticmethod
+    def spans( windows ):
+        # the windows merged where they overlap, those from the start and those from the
+        # end kept apart
+        
+        spans = []
+        for start, end in sorted( set( ( offset, offset + length ) for offset, length, _ in windows ) ):
+            if spans and ( start < 0 ) == ( spans[-1][0] < 0 ) and start <= spans[-1][1]:
+                spans[-1] = ( spans[-1][0], max( spans[-1][1], end ) )
+            else:
+                spans.append( ( start, end ) )
+        return spans
+
+def model( target ):
+    # a plugin module defining a model registered lazily, now that it is being imported
+    if isinstance( MODELS_BY_NAME.get( target.name ), LazyModel ):
+        return target
+    
+    MODELS.append( target )
+    MODELS_BY_NAME[ target.name ] = target
+    
+    signatures = getattr( target, 'signatures', None )
+    if signatures is None:
+        UNSIGNED_MODELS.add( target )
+    else:
+        for signature in signatures:
+            window = signature.window()
+            SIGNATURE_WINDOWS.setdefault( window, {} ).setdefault( signature.magic, [] ).append( target )
+        SIGNATURE_SPANS[:] = Signature.spans( SIGNATURE_WINDOWS )
+    
+    return target
+
+class LazyModel():
+    # stands in for a model kept in a plugin module, which is only imported once its
+    # signatures hit, or it is asked for by name. the module defines the model with
+    # @model as usual, and the stand in hands everything on to it from then on
+    # 
+    #   lazy_model( 'archive--zoo', 'uu_zoo', 'Archive__Zoo', [ Signature( 20, '\xdc\xa7\xc4\xfd' ) ] )
+    # 
+    
+    def __init__( self, name, module, attribute, signatures ):
+        self.name       = name
+        self.signatures = signatures
+        self._module    = module
+        self._attribute = attribute
+        self._model     = None
         return
     
-    def contains( self, name ):
-        return name in self._byname
+    def __repr__( self ):
+        return '<LazyModel name:%s module:%s loaded:%s>' % (
+            repr( self.name             ) ,
+            repr( self._module          ) ,
+            repr( self._model != None   ) ,
+            )
     
-    def put( self, name, value ):
-        if name in self._byname:
-            self._byname[ name ][ 0 ] = value
-        else:
-            box = [ value ]
-            self._byname[ name ] = box
-            self._byorder.append( (name, box) )
-            if len( name ) > self._longestName:
-                self._longestName = len( name )
+    def load( self ):
+        if self._model == None:
+            LOG_MODELS.debug( 'importing %s for %s', self._module, self.name )
+            module      = __import__( self._module, fromlist = [ self._attribute ] )
+            self._model = getattr( module, self._attribute )
+        return self._model
     
-    def append( self, value ):
-        # will add one to last key ( assumed number ) stored and append
-        # useful for building numeric array, not for anything else really
-        
-        ll = int( self._byorder[-1][0] ) if self._byorder else 0
-        nn = 1 + ll
-        self.put( str( nn ), value )
+    def matches( self, rado ):
+        return self.load().matches( rado )
+    
+    def __call__( self, rado ):
+        return self.load()( rado )
+
+def lazy_model( name, module, attribute, signatures ):
+    # registers a model from a plugin module without importing it
+    return model( LazyModel( name, module, attribute, signatures ) )
+
+class Probe():
+    # the spans of a rado as signature detection sees them, each read once
+    
+    def __init__( self, rado ):
+        self._rado  = rado
+        self._spans = {} # ( start, end ) -> data, short where the rado ends early
+        self._size  = None
         return
     
-    def get( self, name, default = Default ):
-        if name in self._byname:
-            return self._byname[ name ][ 0 ]
-        elif default != self.Default:
-            return default
-        else:
-            raise Exception(
-                'no such attribute %s' % repr( name )
-                )
-        
-    def to_string( self, depth = 0 ):
-        out = []
-        
-        out.append( ( " " * depth ) + "{\n" )
-        for ( name, box ) in self._byorder:
-            out.append(
-                "  "
-                + ( depth * " " )
-                + name
-                + ( " " * ( self._longestName - len( name ) ) )
-                + " : " 
-                + ( "\n" + box[ 0 ].to_string( depth = depth + 2 ) 
-                    if isinstance( box[ 0 ], Attributes ) 
-                    else repr( box[ 0 ] )
-                    )
-                + "\n"
-                )
-        out.append( ( " " * depth ) + "}" )
+    def _span( self, start, end ):
+        if ( start, end ) not in self._spans:
+            position = start
+            if start < 0:
+                if self._size is None:
+                    self._size = self._rado.size()
+                position = self._size + start
+            
+            if position < 0:
+                data = ''
+            else:
+                cursor = self._rado.cursor()
+                cursor.seek( position )
+                data = cursor.read( end - start )
+            
+            self._spans[ ( start, end ) ] = data
         
-        return ''.join( out )
+        return self._spans[ ( start, end ) ]
     
-    def to_flat( self ):
-        return ' ; '.join( re.sub( ' +', ' ', self.to_string() ).split( '\n' ) )
+    def window( self, offset, length ):
+        # the bytes of the window, or None where the rado does not cover it
+        
+        for start, end in SIGNATURE_SPANS:
+            if start <= offset and offset + length <= end:
+                break
+        else:
+            raise Exception( 'no signature span covers window %r' % ( ( offset, length ), ) )
+        
+        data = self._span( start, end )[ offset - start : offset - start + length ]
+        
+        if len( data ) != length:
+            return None
+        
+        return data
     
-    def items( self ):
-        return [ (k, v[0]) for k,v in self._byorder ]
+    def candidates( self ):
+        # every model any of whose signatures hit
+        candidates = set()
+        for ( offset, length, mask ), table in SIGNATURE_WINDOWS.iteritems():
+            data = self.window( offset, length )
+            if data is None:
+                continue
+            candidates.update( table.get( Signature.apply( data, mask ), () ) )
+        return candidates
+
+# what is known of each rado is kept in PROBE_RESULTS for as long as the rado is, so
+# scanning and then assuming on the same rado only probes it once. models are confirmed
+# in order of their hit rate so far, but a hit is only returned once every candidate
+# declared before it has been ruled out, so the answer never depends on that history
+# 
+
+PROBE_RESULTS  = weakref.WeakKeyDictionary() # rado -> Probing
+PROBE_HITS     = {}                          # model -> [ hits, confirmations ]
+PROBE_LOCK     = threading.Lock()
+PROBE_EXECUTOR = None
+
+def probe_executor():
+    # kept apart from the default executor, whose workers may themselves be probing
     
-    def __str__( self ):
-        return self.to_string()
+    global PROBE_EXECUTOR
     
-    def __repr__( self ):
-        return self.to_string()
+    with PROBE_LOCK:
+        if PROBE_EXECUTOR == None:
+            PROBE_EXECUTOR = Executor( PROBE_WORKERS )
+        return PROBE_EXECUTOR
 
+def confirm_model( model, rado ):
+    try:
+        compatible = bool( model.matches( rado ) )
+    except Exception, e:
+        LOG_MODELS.warning( 'exception checking %r : %r', model, e )
+        if LOG_MODELS.debugging:
+            LOG_MODELS.debug( '%s', traceback.format_exc() )
+        compatible = False
+    
+    with PROBE_LOCK:
+        counts = PROBE_HITS.setdefault( model, [ 0, 0 ] )
+        counts[0] += compatible
+        counts[1] += 1
+    
+    return compatible
 
-#########################################################################################
-## models
+def hit_rate( model ):
+    # smoothed, so models never confirmed sit in the middle rather than the bottom
+    hits, confirmations = PROBE_HITS.get( model, ( 0, 0 ) )
+    return ( hits + 1.0 ) / ( confirmations + 2.0 )
 
-MODELS         = []
-MODELS_BY_NAME = {}
+class Probing():
+    # the models compatible with one rado, filled in as they are confirmed
+    # the rado is passed in rather than kept, as it is the key this is kept under
+    
+    def __init__( self ):
+        self._lock    = threading.Lock()
+        self._results = None # model -> compatible, once the signatures have been probed
+        self._futures = {}   # model -> Future of compatible, for those confirming on workers
+        self._slow    = False
+        return
+    
+    def _probe( self, rado ):
+        started = time.time()
+        try:
+            candidates = Probe( rado ).candidates()
+        except Exception, e:
+            # a rado we cannot even probe is left to the models themselves
+            LOG_MODELS.warning( 'exception probing signatures : %r', e )
+            candidates = set( MODELS )
+        
+        self._slow    = time.time() - started > PROBE_SLOW_SECONDS
+        self._results = {}
+        for model in MODELS:
+            if model not in candidates and model not in UNSIGNED_MODELS:
+                self._results[ model ] = False
+        
+        return
+    
+    def _pending( self, rado ):
+        # models yet to be confirmed, in declaration order. when the rado is slow they
+        # are all handed to the workers at once, and nothing is left pending here
+        
+        if self._results is None:
+            self._probe( rado )
+        
+        pending = [
+            model
+            for model in MODELS
+            if model not in self._results and model not in self._futures
+            ]
+        
+        if self._slow and PROBE_WORKERS > 0 and len( pending ) > 1:
+            executor = probe_executor()
+            for model in pending:
+                self._futures[ model ] = executor.submit( confirm_model, model, rado )
+            return []
+        
+        return pending
+    
+    def _result( self, model ):
+        # the result for a model known or confirming, waiting on its worker if need be
+        if model in self._futures:
+            self._results[ model ] = self._futures.pop( model ).result()
+        return self._results[ model ]
+    
+    def _decided( self ):
+        # whether every model before the first compatible one has been ruled out
+        for model in MODELS:
+            if model not in self._results:
+                return False
+            if self._results[ model ]:
+                return True
+        return True
+    
+    def results( self, rado ):
+        with self._lock:
+            for model in self._pending( rado ):
+                self._results[ model ] = confirm_model( model, rado )
+            
+            return [ ( self._result( model ), model ) for model in MODELS ]
+    
+    def first( self, rado ):
+        with self._lock:
+            pending = self._pending( rado )
+            pending.sort( key = lambda model: - hit_rate( model ) )
+            
+            for model in pending:
+                if self._decided():
+                    break
+                self._results[ model ] = confirm_model( model, rado )
+            
+            # anything still unknown is confirming on the workers, and only waited on
+            # until a compatible model turns up
+            for model in MODELS:
+                if model in self._results or model in self._futures:
+                    if self._result( model ):
+                        return model
+            
+            return None
 
-def model( target ):
-    MODELS.append( target )
-    MODELS_BY_NAME[ target.name ] = target
-    return target
+def probing( rado ):
+    # the Probing kept for the rado, or a fresh one for rados that cannot be kept
+    with PROBE_LOCK:
+        try:
+            found = PROBE_RESULTS.get( rado )
+            if found is None:
+                found = PROBE_RESULTS[ rado ] = Probing()
+        except TypeError:
+            found = Probing()
+        return found
 
 def determine_compatible_models( rado ):
-    for model in MODELS:
-        try:
-            if model.matches( rado ):
-                yield True, model
-            else:
-                yield False, model
-        except Exception, e:
-            print '# exception checking %s' % repr( model )
-            traceback.print_exc()
-            yield False, model
+    for compatible, model in probing( rado ).results( rado ):
+        yield compatible, model
 
 def first_compatible_model( rado ):
-    for compatible, model in determine_compatible_models( rado ):
-        if compatible:
-            return model
-    return None
+    return probing( rado ).first( rado )
 
 def model_by_name( name ):
     if name not in MODELS_BY_NAME:
@@ -704,6 +4343,8 @@ class FileSystem__CompactDiskFileSystem():
     _SYSTEM_AREA_SIZE       = 32768
     _VOLUME_DESCRIPTOR_SIZE = 2048
     
+    signatures = [ Signature( _SYSTEM_AREA_SIZE + 1, 'CD001' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -722,6 +4363,10 @@ class FileSystem__CompactDiskFileSystem():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return self._volume_information()
+    
+    @Common.traced( 'list' )
     def list( self ):
         return [
             ('iso'       , 'root directory of the iso filesystem'        ),
@@ -831,6 +4476,7 @@ class FileSystem__CompactDiskFileSystem():
             
         return volumeInformation
     
+    @Common.traced( 'select' )
     def select( self, what ):
         
         if what == 'iso':
@@ -851,42 +4497,46 @@ class FileSystem__CompactDiskFileSystem():
 
 class FileSystem__CompactDiskFileSystem__Common():
     
+    _DIRECTORY_DATE = Layout( 'iso-directory-date', '<', [
+            ( 'years-since-1900', 'B' ) ,
+            ( 'month'           , 'B' ) ,
+            ( 'day'             , 'B' ) ,
+            ( 'hour'            , 'B' ) ,
+            ( 'minute'          , 'B' ) ,
+            ( 'second'          , 'B' ) ,
+            ( 'offset-from-gm'  , 'b' ) ,
+            ])
+    
+    # the numbers are stored both ways round, we take the little endian half
+    # 
+    _DIRECTORY_RECORD = Layout( 'iso-directory-record', '<', [
+            ( 'directory-record-length'         , 'B'  ) ,
+            ( 'extended-attribute-record-length', 'B'  ) ,
+            ( 'lba-of-extent'                   , 'I'  ) ,
+            ( None                              , '4x' ) ,
+            ( 'data-length'                     , 'I'  ) ,
+            ( None                              , '4x' ) ,
+            ( 'date-and-time'                   , _DIRECTORY_DATE ) ,
+            ( 'flags'                           , 'B'  , '_decode__directory_flags' ) ,
+            ( 'file-unit-size'                  , 'B'  ) ,
+            ( 'interleave-gap-size'             , 'B'  ) ,
+            ( 'volume-sequence-number'          , 'H'  ) ,
+            ( None                              , '2x' ) ,
+            ( 'filename-length'                 , 'B'  ) ,
+            ])
+    
     @staticmethod
     def read__directory_record( cursor ):
-        directoryAttributes = Attributes()
-        
         startingOffset = cursor.tell()
         
-        recordLength = cursor.uint8()
-        directoryAttributes.put( 'directory-record-length', recordLength )
-        
-        directoryAttributes.put( 'extended-attribute-record-length', cursor.uint8()     )
-        directoryAttributes.put( 'lba-of-extent'                   , cursor.uint32lsb() )
-        
-        cursor.skip( 4 )
-        
-        directoryAttributes.put( 'data-length'                     , cursor.uint32lsb() )
-        
-        cursor.skip( 4 )
-        
-        directoryAttributes.put(
-            'date-and-time'                                                           ,
-            FileSystem__CompactDiskFileSystem__Common._read__directory_date( cursor ) ,
+        directoryAttributes = FileSystem__CompactDiskFileSystem__Common._DIRECTORY_RECORD.read(
+            cursor ,
+            FileSystem__CompactDiskFileSystem__Common ,
             )
         
-        directoryAttributes.put(
-            'flags'                                                                    ,
-            FileSystem__CompactDiskFileSystem__Common._read__directory_flags( cursor ) ,
-            )
-        
-        directoryAttributes.put( 'file-unit-size'        , cursor.uint8()     )
-        directoryAttributes.put( 'interleave-gap-size'   , cursor.uint8()     )
-        directoryAttributes.put( 'volume-sequence-number', cursor.uint16lsb() )
+        recordLength   = directoryAttributes.get( 'directory-record-length' )
+        filenameLength = directoryAttributes.get( 'filename-length'         )
         
-        cursor.skip( 2 )
-        
-        filenameLength = cursor.uint8()
-        directoryAttributes.put( 'filename-length'    , filenameLength                   )
         directoryAttributes.put( 'filename-identifier', cursor.readall( filenameLength ) )
         
         # osDev says to check filenameLength, I'm checking tell instead
@@ -908,33 +4558,18 @@ class FileSystem__CompactDiskFileSystem__Common():
         
         return directoryAttributes
     
-    @staticmethod
-    def _read__directory_date( cursor ):
-        dateAttributes = Attributes()
-        
-        dateAttributes.put( 'years-since-1900', cursor.uint8() )
-        dateAttributes.put( 'month'           , cursor.uint8() )
-        dateAttributes.put( 'day'             , cursor.uint8() )
-        dateAttributes.put( 'hour'            , cursor.uint8() )
-        dateAttributes.put( 'minute'          , cursor.uint8() )
-        dateAttributes.put( 'second'          , cursor.uint8() )
-        dateAttributes.put( 'offset-from-gm'  , cursor.sint8() )
-        
-        return dateAttributes
+    _DIRECTORY_FLAGS = (
+        ( 'hidden'                                , 0b00000001 ) ,
+        ( 'directory'                             , 0b00000010 ) ,
+        ( 'associated-file'                       , 0b00000100 ) ,
+        ( 'extended-attribute-has-format'         , 0b00001000 ) ,
+        ( 'permissions-set-in-extended-attributes', 0b00010000 ) ,
+        ( 'not-final-directory-record'            , 0b10000000 ) ,
+        )
     
     @staticmethod
-    def _read__directory_flags( cursor ):
-        flagsAttributes = Attributes()
-        flags = cursor.uint8()
-        
-        flagsAttributes.put( 'hidden'                                , bool( flags & 0b00000001 ) )
-        flagsAttributes.put( 'directory'                             , bool( flags & 0b00000010 ) )
-        flagsAttributes.put( 'associated-file'                       , bool( flags & 0b00000100 ) )
-        flagsAttributes.put( 'extended-attribute-has-format'         , bool( flags & 0b00001000 ) )
-        flagsAttributes.put( 'permissions-set-in-extended-attributes', bool( flags & 0b00010000 ) )
-        flagsAttributes.put( 'not-final-directory-record'            , bool( flags & 0b10000000 ) )
-        
-        return flagsAttributes
+    def _decode__directory_flags( flags ):
+        return Flags( FileSystem__CompactDiskFileSystem__Common._DIRECTORY_FLAGS, flags )
 
 
 class FileSystem__CompactDiskFileSystem__IsoDirectory():
@@ -949,6 +4584,10 @@ class FileSystem__CompactDiskFileSystem__IsoDirectory():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return self._directoryAttributes
+    
+    @Common.traced( 'list' )
     def list( self ):
         listing = []
         
@@ -971,6 +4610,7 @@ class FileSystem__CompactDiskFileSystem__IsoDirectory():
         
         return listing
     
+    @Common.traced( 'select' )
     def select( self, what ):
         
         if ';' in what:
@@ -1044,6 +4684,9 @@ class FileSystem__CompactDiskFileSystem__IsoFile():
     def is_listable( self ): return False
     def is_radoable( self ): return True
     
+    def metadata( self ):
+        return self._fileAttributes
+    
     def rado( self ):
         primaryVolumeDescriptor = self._volumeInformation .get ( 'primary-volume-descriptor' )
         logicalBlockSize        = primaryVolumeDescriptor .get ( 'logical-block-size'        )
@@ -1066,6 +4709,8 @@ class FileSystem__CompactDiskFileSystem__IsoFile():
 class DiskImage__AppleDiskImage():
     name = 'disk-image--apple-disk-image'
     
+    signatures = [ Signature( - 512, 'koly' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -1085,9 +4730,16 @@ class DiskImage__AppleDiskImage():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        attributes = Attributes()
+        attributes.put( 'koly-block'       , self._kolyBlock )
+        attributes.put( 'xml-property-list', self._xmlData   )
+        return attributes
+    
     # looks like it currently goes from dmg -> disk -> whatever we find in the disk
     # expose partitions as a list or just a rado?
     
+    @Common.traced( 'list' )
     def list( self ):
         options = []
         
@@ -1100,6 +4752,7 @@ class DiskImage__AppleDiskImage():
         
         return options
     
+    @Common.traced( 'select' )
     def select( self, what ):
         
         for partition in self._find_partitions():
@@ -1148,53 +4801,50 @@ class DiskImage__AppleDiskImage():
             key     = ( lambda v: any( diskname in v['name'] for diskname in disknames ) ) ,
             )
     
+    _KOLY_BLOCK = Layout( 'dmg-koly-block', '>', [
+            ( 'signature'               , '4s'  ) ,
+            ( 'version'                 , 'I'   ) ,
+            ( 'header-size'             , 'I'   ) ,
+            ( 'flags'                   , 'I'   ) ,
+            
+            ( 'running-data-fork-offset', 'Q'   ) ,
+            ( 'data-fork-offset'        , 'Q'   ) ,
+            ( 'data-fork-length'        , 'Q'   ) ,
+            ( 'resource-fork-offset'    , 'Q'   ) ,
+            ( 'resource-fork-length'    , 'Q'   ) ,
+            ( 'segment-number'          , 'I'   ) ,
+            ( 'segment-count'           , 'I'   ) ,
+            ( 'segment-id'              , '16s' , Layout.uuid ) ,
+            
+            ( 'data-checksum-type'      , 'I'   ) ,
+            ( 'data-checksum-size'      , 'I'   ) ,
+            ( 'data-checksum'           , '32I' ) ,
+            
+            ( 'xml-offset'              , 'Q'   ) ,
+            ( 'xml-length'              , 'Q'   ) ,
+            
+            # reserved
+            ( None                      , '120x' ) ,
+            
+            ( 'checksum-type'           , 'I'   ) ,
+            ( 'checksum-size'           , 'I'   ) ,
+            ( 'checksum'                , '32I' ) ,
+            
+            ( 'image-variant'           , 'I'   ) ,
+            ( 'sector-count'            , 'Q'   ) ,
+            
+            ( 'reserved-1'              , 'I'   ) ,
+            ( 'reserved-2'              , 'I'   ) ,
+            ( 'reserved-3'              , 'I'   ) ,
+            ])
+    
     def _koly_block( self ):
-        attributes = Attributes()
         cursor     = self._rado.cursor()
         
         cursor.end()
         cursor.skip( -512 )
         
-        attributes.put( 'signature'               , cursor.read( 4 )   )
-        attributes.put( 'version'                 , cursor.uint32msb() )
-        attributes.put( 'header-size'             , cursor.uint32msb() )
-        attributes.put( 'flags'                   , cursor.uint32msb() )
-        
-        attributes.put( 'running-data-fork-offset', cursor.uint64msb() )
-        attributes.put( 'data-fork-offset'        , cursor.uint64msb() )
-        attributes.put( 'data-fork-length'        , cursor.uint64msb() )
-        attributes.put( 'resource-fork-offset'    , cursor.uint64msb() )
-        attributes.put( 'resource-fork-length'    , cursor.uint64msb() )
-        attributes.put( 'segment-number'          , cursor.uint32msb() )
-        attributes.put( 'segment-count'           , cursor.uint32msb() )
-        attributes.put( 'segment-id'              , cursor.uuid()      )
-        
-        attributes.put( 'data-checksum-type'      , cursor.uint32msb() )
-        attributes.put( 'data-checksum-size'      , cursor.uint32msb() )
-        attributes.put( 'data-checksum'           , [ cursor.uint32msb()
-                                                      for _ in xrange( 32 )
-                                                      ])
-        
-        attributes.put( 'xml-offset'              , cursor.uint64msb() )
-        attributes.put( 'xml-length'              , cursor.uint64msb() )
-        
-        # reserved
-        cursor.skip( 120 )
-        
-        attributes.put( 'checksum-type'           , cursor.uint32msb() )
-        attributes.put( 'checksum-size'           , cursor.uint32msb() )
-        attributes.put( 'checksum'                , [ cursor.uint32msb()
-                                                      for _ in xrange( 32 )
-                                                      ])
-        
-        attributes.put( 'image-variant'           , cursor.uint32msb() )
-        attributes.put( 'sector-count'            , cursor.uint64msb() )
-        
-        attributes.put( 'reserved-1'              , cursor.uint32msb() )
-        attributes.put( 'reserved-2'              , cursor.uint32msb() )
-        attributes.put( 'reserved-3'              , cursor.uint32msb() )
-        
-        return attributes
+        return self._KOLY_BLOCK.read( cursor )
     
     def _xml_property_list_rado( self ):
         return RadoRado(
@@ -1355,6 +5005,11 @@ class DiskImage__AppleDiskImage__Partition():
                 ))
 
 class DiskImage__AppleDiskImage__Partition__BlockDevice():
+    
+    # most runs have to be decompressed, have RadoBlock read ahead in the background
+    # 
+    _slow = True
+    
     def __init__( self, rado, kolyBlock, xmlData, partitionDescriptor ):
         self._rado                = rado
         self._kolyBlock           = kolyBlock
@@ -1373,7 +5028,8 @@ class DiskImage__AppleDiskImage__Partition__BlockDevice():
     def size( self ):
         return self._kolyBlock.get( 'data-fork-length' )
     
-    @Common.memoize( 'apple-disk-image-blocks' )
+    @Common.traced( 'get_block' )
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_CONTENTS )
     def get_block( self, blockNo ):
         
         for run in self._runMap:
@@ -1387,6 +5043,52 @@ class DiskImage__AppleDiskImage__Partition__BlockDevice():
         
         raise Exception( 'wat block : %s' % repr( blockNo ) )
     
+    @Common.traced( 'get_blocks' )
+    def get_blocks( self, blockNo, count ):
+        # each run decodes its share of the range in one pass
+        # 
+        
+        runs = []
+        
+        while count:
+            for run in self._runMap:
+                if run.contains( blockNo ):
+                    break
+            else:
+                raise Exception( 'wat block : %s' % repr( blockNo ) )
+            
+            runCount = min( count, run.get_end_sector_no() - blockNo )
+            runs.append( ( runCount, run.get_sectors_rado( blockNo, runCount ) ) )
+            
+            blockNo += runCount
+            count   -= runCount
+        
+        return runs
+    
+    def get_extents( self, blockNo, count ):
+        # zero fill runs are holes, everything else has to be decoded to be known
+        
+        runs = []
+        
+        while count:
+            for run in self._runMap:
+                if run.contains( blockNo ):
+                    break
+            else:
+                raise Exception( 'wat block : %s' % repr( blockNo ) )
+            
+            runCount = min( count, run.get_end_sector_no() - blockNo )
+            Common.add_run(
+                runs                                                            ,
+                runCount                                                        ,
+                not isinstance( run, DiskImage__AppleDiskImage__ZeroFill__Run ) ,
+                )
+            
+            blockNo += runCount
+            count   -= runCount
+        
+        return runs
+    
     def _build_run_map( self, partitionDescriptor ):
         
         driveRuns = []
@@ -1431,61 +5133,80 @@ class DiskImage__AppleDiskImage__Partition__BlockDevice():
             
         return driveRuns
     
+    _UDIF_CHECKSUM = Layout( 'dmg-udif-checksum', '>', [
+            ( 'type' , 'I'   ) ,
+            ( 'size' , 'I'   ) ,
+            ( 'data' , '32I' ) ,
+            ])
+    
+    _BLOCK_ATTRIBUTES = Layout( 'dmg-block-attributes', '>', [
+            ( 'signature'             , '4s' ) ,
+            ( 'version'               , 'I'  ) ,
+            ( 'sector-number'         , 'Q'  ) ,
+            ( 'sector-count'          , 'Q'  ) ,
+            ( 'data-offset'           , 'Q'  ) ,
+            ( 'buffers-needed'        , 'I'  ) ,
+            ( 'block-descriptors'     , 'I'  ) ,
+            
+            ( 'reserved'              , '6I' ) ,
+            
+            ( 'checksum'              , _UDIF_CHECKSUM ) ,
+            
+            ( 'number-of-block-chunks', 'I'  ) ,
+            ])
+    
+    _BLKX_RUN_ENTRY = Layout( 'dmg-blkx-run-entry', '>', [
+            ( 'entry-type'        , 'I'  ) ,
+            ( 'comment'           , '4s' ) ,
+            ( 'sector-number'     , 'Q'  ) ,
+            ( 'sector-count'      , 'Q'  ) ,
+            ( 'compressed-offset' , 'Q'  ) ,
+            ( 'compressed-length' , 'Q'  ) ,
+            ])
+    
     def _block_attributes( self, rado ):
-        attributes = Attributes()
         cursor = rado.cursor()
         
-        attributes.put( 'signature'             , cursor.read( 4 )   )
-        attributes.put( 'version'               , cursor.uint32msb() )
-        attributes.put( 'sector-number'         , cursor.uint64msb() )
-        attributes.put( 'sector-count'          , cursor.uint64msb() )
-        attributes.put( 'data-offset'           , cursor.uint64msb() )
-        attributes.put( 'buffers-needed'        , cursor.uint32msb() )
-        attributes.put( 'block-descriptors'     , cursor.uint32msb() )
+        attributes = self._BLOCK_ATTRIBUTES.read( cursor )
         
-        attributes.put( 'reserved'              , [ cursor.uint32msb()
-                                                    for _ in xrange( 6 )
-                                                    ])
+        # the declared count should take in the terminal entry, so the run entries are
+        # read together and the terminal entry found with a single scan
         
-        attributes.put( 'checksum'              , self._read__udif_checksum( cursor ) )
+        runEntries = Table.read(
+            name   = 'dmg-blkx-run-entries'                       ,
+            rado   = rado                                         ,
+            layout = self._BLKX_RUN_ENTRY                         ,
+            offset = cursor.tell()                                ,
+            count  = attributes.get( 'number-of-block-chunks' ) ,
+            )
         
-        numberOfBlockChunks = cursor.uint32msb()
-        attributes.put( 'number-of-block-chunks', numberOfBlockChunks )
+        terminal = runEntries.find( 'entry-type', 0xffffffff )
         
         blkxRunEntries = Attributes()
         
-        while True:
-            runEntry = self._read__blkx_run_entry( cursor )
-            blkxRunEntries.append( runEntry )
-            if runEntry.get( 'entry-type' ) == 0xffffffff:
-                # terminal blkxRun entry
-                break
+        if terminal != None:
+            for runEntry in runEntries.records( end = terminal + 1 ):
+                blkxRunEntries.append( runEntry )
+        else:
+            # no terminal entry within the count, take them all and carry on one by one
+            for runEntry in runEntries.records():
+                blkxRunEntries.append( runEntry )
+            
+            cursor.skip( len( runEntries ) * self._BLKX_RUN_ENTRY.size() )
+            
+            while True:
+                runEntry = self._read__blkx_run_entry( cursor )
+                blkxRunEntries.append( runEntry )
+                if runEntry.get( 'entry-type' ) == 0xffffffff:
+                    # terminal blkxRun entry
+                    break
         
         attributes.put( 'block-run-entries'     , blkxRunEntries )
         
         return attributes
     
-    def _read__udif_checksum( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'type' , cursor.uint32msb() )
-        attributes.put( 'size' , cursor.uint32msb() )
-        attributes.put( 'data' , [ cursor.uint32msb()
-                                   for _ in xrange( 32 )
-                                   ])
-        return attributes
-    
     def _read__blkx_run_entry( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'entry-type'        , cursor.uint32msb() )
-        attributes.put( 'comment'           , cursor.read( 4 )   )
-        attributes.put( 'sector-number'     , cursor.uint64msb() )
-        attributes.put( 'sector-count'      , cursor.uint64msb() )
-        attributes.put( 'compressed-offset' , cursor.uint64msb() )
-        attributes.put( 'compressed-length' , cursor.uint64msb() )
-        
-        return attributes
+        return self._BLKX_RUN_ENTRY.read( cursor )
     
 
 class DiskImage__AppleDiskImage__ZeroFill__Run():
@@ -1514,6 +5235,17 @@ class DiskImage__AppleDiskImage__ZeroFill__Run():
                 name = 'zerofill-fake-rado' ,
                 blob = self._data           ,
                 )
+    
+    def get_sectors_rado( self, sectorNo, count ):
+        if not self.contains( sectorNo + count - 1 ): raise Exception( 'asked run for uncontained sector' )
+        
+        return RadoZero(
+            name = 'zerofill-sectors-rado' ,
+            size = count * 512             ,
+            )
+    
+    def get_end_sector_no( self ):
+        return self._sectorNo + self._sectorCount
 
 
 class DiskImage__AppleDiskImage__Uncompressed__Run():
@@ -1543,6 +5275,20 @@ class DiskImage__AppleDiskImage__Uncompressed__Run():
         c = self._rado.cursor()
         c.seek( ( sectorNo - self._sectorNo ) * 512 )
         return c.read( 512 )
+    
+    def get_sector_rado( self, sectorNo ):
+        return self.get_sectors_rado( sectorNo, 1 )
+    
+    def get_sectors_rado( self, sectorNo, count ):
+        if not ( self.contains( sectorNo ) and self.contains( sectorNo + count - 1 ) ):
+            raise Exception( 'asked run for uncontained sector' )
+        
+        c = self._rado.cursor()
+        c.seek( ( sectorNo - self._sectorNo ) * 512 )
+        return c.rado( count * 512 )
+    
+    def get_end_sector_no( self ):
+        return self._sectorNo + self._sectorCount
 
 class DiskImage__AppleDiskImage__UDCO__Run():
     # Apple Data Compression
@@ -1564,7 +5310,28 @@ class DiskImage__AppleDiskImage__UDZO__Run():
         else:
             return False
     
-    def get_sector_rado( self, sectorNo ):
+    def get_end_sector_no( self ):
+        return self._sectorNo + self._sectorCount
+    
+    def get_sectors_rado( self, sectorNo, count ):
+        # decompresses the sectors in a single pass over the run, rather than
+        # restarting from the beginning of the run for every sector
+        # 
+        if not self.contains( sectorNo + count - 1 ): raise Exception( 'asked run for uncontained sector' )
+        
+        sector = self._get_sector( sectorNo )
+        
+        bits = [ sector.get_data() ]
+        for _ in xrange( count - 1 ):
+            sector = sector.next_sector()
+            bits.append( sector.get_data() )
+        
+        return RadoBlob(
+            name = 'dmg-udzo-run-sectors-rado' ,
+            blob = ''.join( bits )             ,
+            )
+    
+    def _get_sector( self, sectorNo ):
         if not self.contains( sectorNo ): raise Exception( 'asked run for uncontained sector' )
         
         closestSector = DiskImage__AppleDiskImage__UDZO__Sector(
@@ -1580,7 +5347,10 @@ class DiskImage__AppleDiskImage__UDZO__Run():
         if not closestSector.get_sector_no() == sectorNo:
             raise Exception( 'wat' )
         
-        return closestSector.rado()
+        return closestSector
+    
+    def get_sector_rado( self, sectorNo ):
+        return self._get_sector( sectorNo ).rado()
         
         # just a reminder to recreate the closest-to cache so we can restart runs from 
         # closer than the beginning of the run
@@ -1631,26 +5401,36 @@ class DiskImage__AppleDiskImage__UDZO__Sector():
         self._decompress_data() # fills data, advances compressedOffset
     
     def _decompress_data( self ):
-        # reading the amount compressed we want uncompressed guarantees
-        # the decompressor will have enough data to always return a full
-        # block
+        # reading the amount compressed we want uncompressed is usually enough for
+        # the decompressor to return a full block, but data that doesn't compress
+        # well can come up short, so we keep feeding it until the block is full or
+        # the run runs out of compressed data
         
         # note that the "unconsumed_tail" isn't the same as the uncompressed data
         # apparently its altered ( and expanded ) by the decompression, so we can't
         # just count the size and pass it on, we have to account for it properly
         
-        oldData         = self._decompressobj.unconsumed_tail
-        newDataRequired = 512 - len( oldData )
-        
         cursor = self._run._rado.cursor()
         cursor.skip( self._compressedOffset )
-        compressedData = cursor.read( newDataRequired )
         
-        self._data = self._decompressobj.decompress( oldData + compressedData, 512 )
+        self._data = ''
         
-        # print 'DECOMPRESSED', repr( self._data )
+        while len( self._data ) < 512:
+            oldData         = self._decompressobj.unconsumed_tail
+            newDataRequired = max( 0, 512 - len( oldData ) )
+            
+            compressedData = cursor.read( newDataRequired )
+            self._compressedOffset += len( compressedData )
+            
+            if not ( oldData or compressedData ):
+                break
+            
+            self._data += self._decompressobj.decompress(
+                oldData + compressedData ,
+                512 - len( self._data )  ,
+                )
         
-        self._compressedOffset += newDataRequired
+        # print 'DECOMPRESSED', repr( self._data )
         
         return
     
@@ -1690,6 +5470,8 @@ class DiskImage__AppleDiskImage__UDBZ__Run():
 class FileSystem__AppleHfsPlus():
     name = 'file-system--apple-hfs-plus'
     
+    signatures = [ Signature( 1024, 'H+' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -1702,7 +5484,7 @@ class FileSystem__AppleHfsPlus():
         
         self._volumeHeader = self._volume_header()
         
-        print self._volumeHeader
+        LOG_HFS.debug( 'volume header\n%s', self._volumeHeader )
         
         self._catalogForkRado  = RadoBlock(
             name        = 'hfs-catalog-fork' ,
@@ -1729,6 +5511,9 @@ class FileSystem__AppleHfsPlus():
     def is_listable( self ): return False
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return self._volumeHeader
+    
     def _volume_header( self ):
         attributes = Attributes()
         cursor = self._rado.cursor()
@@ -1825,6 +5610,7 @@ class FileSystem__AppleHfsPlus__ForkDataStructure__BlockDevice():
     
     # memoize?
     # 
+    @Common.traced( 'get_block' )
     def get_block( self, blockNo ):
         blockOffset = self._get_block_offset( blockNo )
         cursor      = self._rado.cursor()
@@ -1848,22 +5634,24 @@ class FileSystem__AppleHfsPlus__ForkDataStructure__BlockDevice():
             blockCount     = extent.get( 'block-count' )
             blockSize      = self.block_size()           # self._volumeHeader.get( 'block-size' )
             
-            print 'extent-start:%s <= block-number:%s <= extent-start+block-count:%s' % (
-                repr( extentThus              ) ,
-                repr( blockNo                 ) ,
-                repr( extentThus + blockCount ) ,
-                )
+            if LOG_HFS.debugging:
+                LOG_HFS.debug( 'extent-start:%r <= block-number:%r <= extent-start+block-count:%r' ,
+                    extentThus              ,
+                    blockNo                 ,
+                    extentThus + blockCount ,
+                    )
                 
             if extentThus <= blockNo <= extentThus + blockCount:
                 selectedBlock = ( diskStartBlock + ( blockNo - extentThus ) )
                 diskOffset    = selectedBlock * blockSize
                 
-                print 'extentThus:%s blockNo:%s selectedBlock:%s diskOffset:%s' % (
-                    repr( extentThus    ) ,
-                    repr( blockNo       ) ,
-                    repr( selectedBlock ) ,
-                    repr( diskOffset    ) ,
-                    )
+                if LOG_HFS.debugging:
+                    LOG_HFS.debug( 'extentThus:%r blockNo:%r selectedBlock:%r diskOffset:%r' ,
+                        extentThus    ,
+                        blockNo       ,
+                        selectedBlock ,
+                        diskOffset    ,
+                        )
                 
                 return diskOffset
             else:
@@ -1879,8 +5667,7 @@ class FileSystem__AppleHfsPlus__BTree():
         
         self._nodeDescriptor = self._node_descriptor()
         
-        print 'NODE-DESCRIPTOR'
-        print self._nodeDescriptor
+        LOG_HFS.debug( 'node descriptor\n%s', self._nodeDescriptor )
         
         raise Exception( 'extent' )
         return
@@ -1908,6 +5695,8 @@ class FileSystem__AppleHfsPlus__BTree():
 class StorageFormat__QCOW2():
     name = 'storage-format--qcow2'
     
+    signatures = [ Signature( 0, 'QFI\xfb' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -1921,10 +5710,15 @@ class StorageFormat__QCOW2():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return StorageFormat__QCOW2__MainImage__BlockDevice._HEADER.read( self._rado.cursor() )
+    
+    @Common.traced( 'list' )
     def list( self ):
         # in future, this format will also need support for snapshot traversal
         return [ ( 'main-image', 'the primary image in the file, as opposed to any snapshots') ]
     
+    @Common.traced( 'select' )
     def select( self, what ):
         # snapshots not yet implemented
         
@@ -1946,7 +5740,8 @@ class StorageFormat__QCOW2__MainImage():
     
     def rado( self ):
         return RadoBlock( 
-            StorageFormat__QCOW2__MainImage__BlockDevice( self._rado )
+            name        = 'qcow2-main-image-block-device-rado'                     ,
+            blockDevice = StorageFormat__QCOW2__MainImage__BlockDevice( self._rado ) ,
             )
 
 
@@ -1955,6 +5750,10 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
     _FLAG_COPIED     = 1 << 63
     _FLAG_COMPRESSED = 1 << 62
     
+    # every cluster needs a table walk and may defer to a backing image
+    # 
+    _slow = True
+    
     def __init__( self, rado ):
         self._rado        = rado
         self._header      = self._read_header()
@@ -1975,21 +5774,21 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
             cursor.seek( self._header.get( 'backing-file-offset' ) )
             backingFilePath = cursor.read( self._header.get( 'backing-file-size'   ) )
             
-            print '# OPENING QCOW2 BACKING FILE', repr( backingFilePath )
+            LOG_QCOW2.info( 'opening backing file %r', backingFilePath )
             backingRado = RadoBlock(
                 File__BlockDevice(
                     open( backingFilePath )
                     ))
             
-            print '# SCANNING BACKING RADO FOR SCANABLE TYPE'
-            print '# NEED A WAY TO SPECIFY THIS SO WE CAN CHOOSE RAW OR WHATEVER'
+            # need a way to specify this so we can choose raw or whatever
+            LOG_QCOW2.debug( 'scanning backing rado for scanable type' )
             potentialModels = list(
                 modelMatch[ 1 ]
                 for modelMatch in determine_compatible_models( backingRado )
                 if modelMatch[ 0 ]
                 )
             
-            print '# POTENTIAL MODELS', repr( potentialModels )
+            LOG_QCOW2.debug( 'potential models %r', potentialModels )
             
             if len( potentialModels ) > 1:
                 raise Exception( 
@@ -2000,20 +5799,20 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
             
             if not potentialModel.is_radoable():
                 # we use the first ( thus default ) selection if listable, only once to find a radoable
-                print '# MATCHING MODEL NOT SCANNABLE, CHECKING FIRST OPTION'
+                LOG_QCOW2.debug( 'matching model not scannable, checking first option' )
                 firstOption    = potentialModel.list()[0][0]
-                print '# FIRST OPTION', repr( firstOption )
+                LOG_QCOW2.debug( 'first option %r', firstOption )
                 firstOptionModel = potentialModel.select( firstOption )
                 if firstOptionModel.is_radoable():
-                    print '# FIRST OPTION IS SCANNABLE, USING THAT'
+                    LOG_QCOW2.debug( 'first option is scannable, using that' )
                     potentialModel = firstOptionModel
             
             if potentialModel.is_radoable():
-                print '# USING RADO FROM', repr( potentialModels[0] )
+                LOG_QCOW2.info( 'using backing rado from %r', potentialModels[0] )
                 self._backingRado = potentialModel.rado()
                 
             else:
-                print '# USING BACKING FILE AS RAW'
+                LOG_QCOW2.info( 'using backing file as raw' )
                 self._backingRado = backingRado
                 
         return
@@ -2024,9 +5823,130 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
     def block_size( self ):
         return 512
     
-    @Common.memoize( 'qcow2-blocks' )
+    @Common.traced( 'get_block' )
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_CONTENTS )
     def get_block( self, blockNo ):
         
+        blockAddress = self._get_block_address( blockNo )
+        
+        if blockAddress == None:
+            return self._get_unallocated_rado( blockNo, 1 )
+        
+        cursor = self._rado.cursor()
+        cursor.seek( blockAddress )
+        blockRado = cursor.rado( self.block_size() )
+        
+        return blockRado
+    
+    @Common.traced( 'get_blocks' )
+    def get_blocks( self, blockNo, count ):
+        # each cluster needs its own table walk, but clusters that were allocated back
+        # to back in the image, or that are all unallocated, are merged into a single run
+        # 
+        
+        blocksPerCluster = ( 1 << self._header.get( 'cluster-bits' ) ) / self.block_size()
+        
+        # [ blockNo, blockCount, blockAddress or None ]
+        spans = []
+        
+        while count:
+            spanCount    = min( count, blocksPerCluster - blockNo % blocksPerCluster )
+            blockAddress = self._get_block_address( blockNo )
+            
+            if spans and (
+                ( blockAddress == None and spans[-1][2] == None )
+                or
+                ( blockAddress != None 
+                  and spans[-1][2] != None
+                  and spans[-1][2] + spans[-1][1] * self.block_size() == blockAddress
+                  )):
+                spans[-1][1] += spanCount
+            else:
+                spans.append( [ blockNo, spanCount, blockAddress ] )
+            
+            blockNo += spanCount
+            count   -= spanCount
+        
+        runs = []
+        for spanBlockNo, spanCount, blockAddress in spans:
+            if blockAddress == None:
+                runs.append( ( spanCount, self._get_unallocated_rado( spanBlockNo, spanCount ) ) )
+            else:
+                cursor = self._rado.cursor()
+                cursor.seek( blockAddress )
+                runs.append( ( spanCount, cursor.rado( spanCount * self.block_size() ) ) )
+        
+        return runs
+    
+    def get_extents( self, blockNo, count ):
+        # unallocated clusters are holes, unless a backing image shows through them
+        # the level two tables are scanned a table at a time rather than entry by entry
+        
+        if self._backingRado:
+            return [ ( count, True ) ]
+        
+        clusterBits      = self._header.get( 'cluster-bits' )
+        entriesPerTable  = 1 << ( clusterBits - 3 )
+        blocksPerCluster = ( 1 << clusterBits ) / self.block_size()
+        offsetMask       = ( ( 1 << 64 ) - 1 ) & ~( self._FLAG_COPIED | self._FLAG_COMPRESSED )
+        
+        levelOneTable = self._get_table( self._header.get( 'l1-table-offset' ), self._header.get( 'l1-size' ) )
+        
+        endBlockNo  = blockNo + count
+        cluster     = blockNo / blocksPerCluster
+        lastCluster = ( endBlockNo - 1 ) / blocksPerCluster
+        
+        runs = []
+        
+        while cluster <= lastCluster:
+            levelOneIndex, levelTwoIndex = divmod( cluster, entriesPerTable )
+            clusterCount = min( lastCluster + 1 - cluster, entriesPerTable - levelTwoIndex )
+            
+            if levelOneIndex < len( levelOneTable ):
+                levelTwoTableOffset = levelOneTable.get( levelOneIndex, 'offset' ) & offsetMask
+            else:
+                levelTwoTableOffset = 0
+            
+            if levelTwoTableOffset:
+                clusterRuns = self._get_table( levelTwoTableOffset, entriesPerTable ).runs(
+                    name  = 'offset'                      ,
+                    mask  = offsetMask                    ,
+                    start = levelTwoIndex                 ,
+                    end   = levelTwoIndex + clusterCount ,
+                    )
+            else:
+                clusterRuns = []
+            
+            # anything a short table did not cover is unallocated
+            clusterRuns.append( ( clusterCount - sum( n for n, _ in clusterRuns ), False ) )
+            
+            for runClusters, allocated in clusterRuns:
+                runStart = max( cluster * blocksPerCluster, blockNo )
+                runEnd   = min( ( cluster + runClusters ) * blocksPerCluster, endBlockNo )
+                
+                Common.add_run( runs, runEnd - runStart, allocated )
+                
+                cluster += runClusters
+        
+        return runs
+    
+    def _get_unallocated_rado( self, blockNo, count ):
+        if not self._backingRado:
+            LOG_QCOW2.debug( 'unallocated blocks requested, no backing rado, using zeroes' )
+            return RadoZero(
+                name = 'qcow2-unallocated-zero-rado' ,
+                size = count * self.block_size()     ,
+                )
+        else:
+            LOG_QCOW2.debug( 'unallocated blocks requested, deferring to backing rado' )
+            backingCursor = self._backingRado.cursor()
+            backingCursor.seek( blockNo * self.block_size() )
+            return backingCursor.rado( count * self.block_size() )
+    
+    def _get_block_address( self, blockNo ):
+        # walks the tables to find where in the image the given block is stored
+        # returns None if the block is not allocated in this image
+        
         clusterBits         = self._header.get( 'cluster-bits' )
         levelTwoBits        = clusterBits - 3
         levelOneBits        = 64 - 2 - levelTwoBits - clusterBits
@@ -2041,13 +5961,15 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
         levelTwoIndex = ( blockAddress & levelTwoMask ) >> clusterBits
         clusterIndex  = ( blockAddress & clusterMask  )
         
-        cursor = self._rado.cursor()
-        
         levelOneTableOffset = self._header.get( 'l1-table-offset' )
         
-        cursor.seek( levelOneTableOffset )
-        cursor.skip( levelOneIndex * 8   )
-        levelTwoTableOffsetAndFlags = cursor.uint64msb()
+        levelOneTable = self._get_table( levelOneTableOffset, self._header.get( 'l1-size' ) )
+        
+        if levelOneIndex >= len( levelOneTable ):
+            # past the end of the level one table, so past the end of the image
+            return None
+        
+        levelTwoTableOffsetAndFlags = levelOneTable.get( levelOneIndex, 'offset' )
         
         levelTwoCopied     = levelTwoTableOffsetAndFlags & self._FLAG_COPIED
         levelTwoCompressed = levelTwoTableOffsetAndFlags & self._FLAG_COMPRESSED
@@ -2061,18 +5983,15 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
         
         if levelTwoTableOffset == 0:
             # the desired block is not currently allocated
-            if not self._backingRado:
-                DEBUG_BACKING( '# ~~ UNALLOCATED BLOCK REQUESTED, NO BACKING RADO, USING ZEROED' )
-                return RadoZero( self.block_size() )
-            else:
-                DEBUG_BACKING( '# ~~ UNALLOCATED BLOCK REQUESTED, DEFERRING TO BACKING RADO' )
-                backingCursor = self._backingRado.cursor()
-                backingCursor.seek( blockNo * self.block_size() )
-                return backingCursor.rado( self.block_size() )
+            return None
             
-        cursor.seek( levelTwoTableOffset )
-        cursor.skip( levelTwoIndex * 8   )
-        clusterOffsetAndFlags = cursor.uint64msb()
+        levelTwoTable = self._get_table( levelTwoTableOffset, 1 << levelTwoBits )
+        
+        if levelTwoIndex >= len( levelTwoTable ):
+            # the image ends partway through the table
+            return None
+        
+        clusterOffsetAndFlags = levelTwoTable.get( levelTwoIndex, 'offset' )
         
         clusterCopied     = clusterOffsetAndFlags & self._FLAG_COPIED
         clusterCompressed = clusterOffsetAndFlags & self._FLAG_COMPRESSED
@@ -2082,47 +6001,51 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
             raise Exception( 'qcow2 compressed cluster unimplemented' )
         
         if clusterOffset == 0:
-            if not self._backingRado:
-                DEBUG_BACKING( '# ~~ UNALLOCATED CLUSTER, NO BACKING RADO, USING ZEROED' )
-                return RadoZero( self.block_size() )
-            else:
-                DEBUG_BACKING( '# ~~ UNALLOCATED CLUSTER, DEFERRING TO BACKING RADO' )
-                backingCursor = self._backingRado.cursor()
-                backingCursor.seek( blockNo * self.block_size() )
-                return backingCursor.rado( self.block_size() )
-        
-        blockAddress = clusterOffset + clusterIndex
-        
-        cursor.seek( blockAddress )
-        blockRado = cursor.rado( self.block_size() )
-        
-        return blockRado
-        
+            # the cluster holding the block is not allocated
+            return None
+        
+        return clusterOffset + clusterIndex
+    
+    _TABLE_ENTRY = Layout( 'qcow2-table-entry', '>', [
+            ( 'offset', 'Q' ) ,
+            ])
+    
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_METADATA )
+    def _get_table( self, tableOffset, entries ):
+        # every block read walks the same few tables, so they are read whole and kept
+        # above the data blocks that would otherwise push them out of the cache
+        
+        return Table.read(
+            name   = 'qcow2-table'     ,
+            rado   = self._rado        ,
+            layout = self._TABLE_ENTRY ,
+            offset = tableOffset       ,
+            count  = entries           ,
+            )
+    
+    _HEADER = Layout( 'qcow2-header', '>', [
+            ( 'magic'                  , '4s' ) ,
+            ( 'version'                , 'I'  ) ,
+            
+            ( 'backing-file-offset'    , 'Q'  ) ,
+            ( 'backing-file-size'      , 'I'  ) ,
+            
+            ( 'cluster-bits'           , 'I'  ) ,
+            ( 'size'                   , 'Q'  ) ,
+            ( 'crypt-method'           , 'I'  ) ,
+            
+            ( 'l1-size'                , 'I'  ) , # number 8 byte entries in table
+            ( 'l1-table-offset'        , 'Q'  ) , # offset to start of table
+            
+            ( 'refcount-table-offset'  , 'Q'  ) ,
+            ( 'refcount-table-clusters', 'I'  ) ,
+            
+            ( 'nb-snapshots'           , 'I'  ) ,
+            ( 'snapshots-offset'       , 'Q'  ) ,
+            ])
+    
     def _read_header( self ):
-        cursor     = self._rado.cursor()
-        
-        attributes = Attributes()
-        
-        attributes.put( 'magic'                  , cursor.read( 4 )   )
-        attributes.put( 'version'                , cursor.uint32msb() )
-        
-        attributes.put( 'backing-file-offset'    , cursor.uint64msb() )
-        attributes.put( 'backing-file-size'      , cursor.uint32msb() )
-        
-        attributes.put( 'cluster-bits'           , cursor.uint32msb() )
-        attributes.put( 'size'                   , cursor.uint64msb() )
-        attributes.put( 'crypt-method'           , cursor.uint32msb() )
-        
-        attributes.put( 'l1-size'                , cursor.uint32msb() ) # number 8 byte entries in table
-        attributes.put( 'l1-table-offset'        , cursor.uint64msb() ) # offset to start of table
-        
-        attributes.put( 'refcount-table-offset'  , cursor.uint64msb() )
-        attributes.put( 'refcount-table-clusters', cursor.uint32msb() )
-        
-        attributes.put( 'nb-snapshots'           , cursor.uint32msb() )
-        attributes.put( 'snapshots-offset'       , cursor.uint64msb() )
-        
-        return attributes
+        return self._HEADER.read( self._rado.cursor() )
     
         
 
@@ -2136,6 +6059,8 @@ class StorageFormat__QCOW2__MainImage__BlockDevice():
 class DiskFormat__MasterBootRecord():
     name = 'disk-format--master-boot-record'
     
+    signatures = [ Signature( 510, '\x55\xaa' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -2155,32 +6080,44 @@ class DiskFormat__MasterBootRecord():
         cursor.seek( 0x01b4 )
         attributes.put( 'unique-disk-id', cursor.read( 10 ) )
         
+        partitionEntries = Table.read(
+            name   = 'mbr-partition-entries' ,
+            rado   = self._rado              ,
+            layout = self._PARTITION_ENTRY   ,
+            offset = cursor.tell()           ,
+            count  = 4                       ,
+            )
+        
+        if len( partitionEntries ) != 4:
+            raise Exception( 'mbr partition table is truncated' )
+        
+        cursor.skip( 4 * self._PARTITION_ENTRY.size() )
+        
         attributes.put(
             'partition-entries',
-            Attributes.from_iterator(
-                self._read_partition_entry_from( cursor )
-                for _ in xrange( 4 )
-                ))
+            Attributes.from_iterator( partitionEntries.records() ),
+            )
         
         attributes.put( 'magic', cursor.read( 2 ) )
         
         return attributes
     
-    def _read_partition_entry_from( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'bootable-flag'                , cursor.uint8()     )
-        attributes.put( 'starting-head-sector-cylinder', cursor.read( 3 )   )
-        attributes.put( 'system-id'                    , cursor.uint8()     )
-        attributes.put( 'ending-head-sector-cylinder'  , cursor.read( 3 )   )
-        attributes.put( 'relative-sector'              , cursor.uint32lsb() )
-        attributes.put( 'total-sectors'                , cursor.uint32lsb() )
-        
-        return attributes
-    
+    _PARTITION_ENTRY = Layout( 'mbr-partition-entry', '<', [
+            ( 'bootable-flag'                , 'B'  ) ,
+            ( 'starting-head-sector-cylinder', '3s' ) ,
+            ( 'system-id'                    , 'B'  ) ,
+            ( 'ending-head-sector-cylinder'  , '3s' ) ,
+            ( 'relative-sector'              , 'I'  ) ,
+            ( 'total-sectors'                , 'I'  ) ,
+            ])
+    
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return self._mbr
+    
+    @Common.traced( 'list' )
     def list( self ):
         rv = []
         for partitionNo, partitionAttributes in self._mbr.get( 'partition-entries' ).items():
@@ -2195,6 +6132,7 @@ class DiskFormat__MasterBootRecord():
         
         return rv
     
+    @Common.traced( 'select' )
     def select( self, what ):
         for partitionNo, partitionAttributes in self._mbr.get( 'partition-entries' ).items():
             if partitionAttributes.get( 'total-sectors' ) != 0:
@@ -2230,6 +6168,8 @@ class DiskFormat__MasterBootRecord__Partition():
 class FileSystem__Ext():
     name = 'file-system--ext'
     
+    signatures = [ Signature( 1024 + 56, '\x53\xef' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -2245,9 +6185,14 @@ class FileSystem__Ext():
     def is_radoable( self ): return False
     def is_listable( self ): return True
     
+    def metadata( self ):
+        return self._superblock
+    
+    @Common.traced( 'list' )
     def list( self ):
         return [ ('root', 'the root of the filesystem' ) ]
     
+    @Common.traced( 'select' )
     def select( self, what ):
         if what == 'root':
             return FileSystem__Ext__Directory(
@@ -2260,57 +6205,172 @@ class FileSystem__Ext():
     _ROOT_DIRECTORY_INODE = 2   # which inode holds the root directories inode
     _GOOD_OLD_INODE_SIZE  = 0   # flag to use previous standard inode size ( 1 is dynamic inode size )
     
+    # the superblock, up to where the good old revision stops
+    # 
+    _SUPERBLOCK = Layout( 'ext-superblock', '<', [
+            ( 'inodes-count'         , 'I'  ) ,
+            ( 'blocks-count-lo'      , 'I'  ) ,
+            
+            # number blocks allocatable by superuser only
+            ( 'r-blocks-count-lo'    , 'I'  ) ,
+            ( 'free-blocks-count-lo' , 'I'  ) ,
+            ( 'free-inodes-count'    , 'I'  ) ,
+            ( 'first-data-block'     , 'I'  ) ,
+            ( 'log-block-size'       , 'I'  ) ,
+            ( 'log-cluster-size'     , 'I'  ) ,
+            ( 'blocks-per-group'     , 'I'  ) ,
+            ( 'clusters-per-group'   , 'I'  ) ,
+            ( 'inodes-per-group'     , 'I'  ) ,
+            
+            ( 'mtime'                , 'I'  ) , # mount time since epoch
+            ( 'wtime'                , 'I'  ) , # write time since epoch
+            
+            ( 'mnt-count'            , 'H'  ) , # mounts since last fsck
+            ( 'max-mnt-count'        , 'H'  ) , # max mounts w/o fsck
+            
+            ( 'magic'                , '2s' ) ,
+            
+            # 0x0001 - cleanly unmounted
+            # 0x0002 - remount readonly
+            # 0x0004 - orphans being recovered
+            ( 'state'                , 'H'  ) ,
+            
+            # behavior when detecting errors:
+            #   1:continue 2:remount readonly 3:panic
+            ( 'errors'               , 'H'  ) ,
+            
+            ( 'minor-rev-level'      , 'H'  ) ,
+            
+            ( 'last-check'           , 'I'  ) ,
+            ( 'check-interval'       , 'I'  ) ,
+            
+            # 0:linux 1:hurd 2:masix 3:freebsd 4:lites
+            ( 'creator-os'           , 'I'  ) ,
+            
+            # 0:good old rev 1:dynamic rev
+            ( 'rev-level'            , 'I'  ) ,
+            
+            # default uid/gid for reserved blocks
+            ( 'def-resuid'           , 'H'  ) ,
+            ( 'def-resgid'           , 'H'  ) ,
+            ])
+    
+    # the rest of the superblock, present from the dynamic revision on
+    # 
+    _SUPERBLOCK_DYNAMIC = Layout( 'ext-superblock-dynamic', '<', [
+            ( 'first-ino'             , 'I'   ) ,
+            ( 'inode-size'            , 'H'   ) ,
+            ( 'block-group-nr'        , 'H'   ) ,
+            
+            ( 'feature-compat'        , 'I'   , '_decode_feature_compat'   ) ,
+            ( 'feature-incompat'      , 'I'   , '_decode_feature_incompat' ) ,
+            ( 'features-ro'           , 'I'   , '_decode_feature_ro'       ) ,
+            
+            ( 'uuid'                  , '16s' , Layout.uuid ) ,
+            ( 'volume-name'           , '16s' , Layout.clipped ) ,
+            ( 'last-mounted'          , '64s' , Layout.clipped ) ,
+            
+            # unused in linux?
+            ( 'algorithm-used-bitmap' , 'I'   ) ,
+            
+            ( 'prealloc-blocks'       , 'B'   ) ,
+            ( 'prealloc-dir-blocks'   , 'B'   ) ,
+            ( 'reserved-gdt-blocks'   , 'H'   ) ,
+            
+            ( 'journal-uuid'          , '16s' , Layout.uuid ) ,
+            ( 'journal-inum'          , 'I'   ) ,
+            ( 'journal-dev'           , 'I'   ) ,
+            
+            # start of list of orphans to delete
+            ( 'last-orphan'           , 'I'   ) ,
+            
+            ( 'hash-seed'             , '4I'  ) ,
+            
+            # 0:legacy 1:half-md4 2:tea 3:legacy/unsigned 4:half-md4/unsigned 5:tea/unsigned
+            ( 'hash-version'          , 'B'   ) ,
+            
+            ( 'jnl-backup-type'       , 'B'   ) ,
+            
+            ( 'desc-size'             , 'H'   ) ,
+            
+            ( 'default-mount-opts'    , 'I'   , '_decode_default_mount_options' ) ,
+            
+            # I see garbage in the unused mount opts from my test FS. weird.
+            
+            ( 'first-meta-bg'         , 'I'   ) ,
+            ( 'mkfs-time'             , 'I'   ) ,
+            
+            ( 'jnl-blocks'            , '17I' ) ,
+            
+            # hi-bits for values stored here are used if incompat-64bit
+            
+            ( 'blocks-count-hi'       , 'I'   ) ,
+            ( 'r-blocks-count-hi'     , 'I'   ) ,
+            ( 'free-blocks-count-hi'  , 'I'   ) ,
+            
+            ( 'min-extra-isize'       , 'H'   ) ,
+            ( 'want-extra-isize'      , 'H'   ) ,
+            
+            ( 'flags'                 , 'I'   , '_decode_superblock_flags' ) ,
+            
+            ( 'raid-stride'           , 'H'   ) ,
+            ( 'mmp-interval'          , 'H'   ) ,
+            ( 'mmp-block'             , 'Q'   ) ,
+            
+            ( 'raid-stripe-width'     , 'I'   ) ,
+            ( 'log-groups-per-flex'   , 'B'   ) ,
+            
+            # 1:crc32c -- only valid value
+            ( 'checksum-type'         , 'B'   ) ,
+            
+            ( 'reserved-pad'          , '2s'  ) ,
+            
+            ( 'kbytes-written'        , 'Q'   ) ,
+            
+            ( 'snapshot-inum'         , 'I'   ) ,
+            ( 'snapshot-id'           , 'I'   ) ,
+            ( 'snapshot-r-block-count', 'Q'   ) ,
+            ( 'snapshot-list'         , 'I'   ) ,
+            
+            ( 'errors-count'          , 'I'   ) ,
+            ( 'first-error-time'      , 'I'   ) ,
+            ( 'first-error-ino'       , 'I'   ) ,
+            ( 'first-error-block'     , 'Q'   ) ,
+            ( 'first-error-func'      , '32s' , Layout.clipped ) ,
+            ( 'first-error-line'      , 'I'   ) ,
+            
+            ( 'last-error-time'       , 'I'   ) ,
+            ( 'last-error-ino'        , 'I'   ) ,
+            ( 'last-error-line'       , 'I'   ) ,
+            ( 'last-error-block'      , 'Q'   ) ,
+            ( 'last-error-func'       , '32s' , Layout.clipped ) ,
+            
+            ( 'mount-opts'            , '64s' , Layout.clipped ) ,
+            
+            ( 'usr-quota-inum'        , 'I'   ) ,
+            ( 'grp-quota-inum'        , 'I'   ) ,
+            
+            ( 'overhead-blocks'       , 'I'   ) ,
+            
+            ( 'backup-bgs'            , '2I'  ) ,
+            
+            # upto 4 algos can be active at a time
+            # why 4 32 ints and not flags I don't know
+            # 0:invalid 1:aes-256-xts 2:aes-256-gcm 3:aes-256-cbc
+            ( 'encrypt-algos'         , '4I'  ) ,
+            
+            # reserved
+            ( None                    , '105x' ) ,
+            
+            ( 'checksum'              , 'I'   ) ,
+            ])
+    
     def _read_superblock( self ):
         cursor     = self._rado.cursor()
-        attributes = Attributes()
         
         cursor.seek( 1024 )
         
-        attributes.put( 'inodes-count'         , cursor.uint32lsb() )
-        attributes.put( 'blocks-count-lo'      , cursor.uint32lsb() )
-        
-        # number blocks allocatable by superuser only
-        attributes.put( 'r-blocks-count-lo'    , cursor.uint32lsb() ) 
-        attributes.put( 'free-blocks-count-lo' , cursor.uint32lsb() )
-        attributes.put( 'free-inodes-count'    , cursor.uint32lsb() )
-        attributes.put( 'first-data-block'     , cursor.uint32lsb() )
-        attributes.put( 'log-block-size'       , cursor.uint32lsb() )
-        attributes.put( 'log-cluster-size'     , cursor.uint32lsb() )
-        attributes.put( 'blocks-per-group'     , cursor.uint32lsb() )
-        attributes.put( 'clusters-per-group'   , cursor.uint32lsb() )
-        attributes.put( 'inodes-per-group'     , cursor.uint32lsb() )
-        
-        attributes.put( 'mtime'                , cursor.uint32lsb() ) # mount time since epoch
-        attributes.put( 'wtime'                , cursor.uint32lsb() ) # write time since epoch
-        
-        attributes.put( 'mnt-count'            , cursor.uint16lsb() ) # mounts since last fsck
-        attributes.put( 'max-mnt-count'        , cursor.uint16lsb() ) # max mounts w/o fsck
-        
-        attributes.put( 'magic'                , cursor.read( 2 )   )
-        
-        # 0x0001 - cleanly unmounted
-        # 0x0002 - remount readonly
-        # 0x0004 - orphans being recovered
-        attributes.put( 'state'                , cursor.uint16lsb() )
-        
-        # behavior when detecting errors:
-        #   1:continue 2:remount readonly 3:panic
-        attributes.put( 'errors'               , cursor.uint16lsb() )
-        
-        attributes.put( 'minor-rev-level'      , cursor.uint16lsb() )
-        
-        attributes.put( 'last-check'           , cursor.uint32lsb() )
-        attributes.put( 'check-interval'       , cursor.uint32lsb() )
-        
-        # 0:linux 1:hurd 2:masix 3:freebsd 4:lites
-        attributes.put( 'creator-os'           , cursor.uint32lsb() )
-        
-        # 0:good old rev 1:dynamic rev
-        attributes.put( 'rev-level'            , cursor.uint32lsb() )
-        
-        # default uid/gid for reserved blocks
-        attributes.put( 'def-resuid'           , cursor.uint16lsb() )
-        attributes.put( 'def-resgid'           , cursor.uint16lsb() )
+        attributes = self._SUPERBLOCK.read( cursor, self )
         
         #
         # if not EXT4_DYNAMIC_REV, we return early here!
@@ -2318,134 +6378,14 @@ class FileSystem__Ext():
         if attributes.get( 'rev-level' ) == 0:
             return attributes
         
-        attributes.put( 'first-ino'            , cursor.uint32lsb() )
-        attributes.put( 'inode-size'           , cursor.uint16lsb() )
-        attributes.put( 'block-group-nr'       , cursor.uint16lsb() )
-        
-        attributes.put( 'feature-compat'       , self._read_feature_compat( cursor ) )
-        attributes.put( 'feature-incompat'     , self._read_feature_incompat( cursor ) )
-        attributes.put( 'features-ro'          , self._read_feature_ro( cursor ) )
-        
-        attributes.put( 'uuid'                 , cursor.uuid() )
-        attributes.put( 'volume-name'          , cursor.clipped( 16 ) )
-        attributes.put( 'last-mounted'         , cursor.clipped( 64 ) )
-        
-        # unused in linux?
-        attributes.put(
-            'algorithm-used-bitmap',
-            cursor.uint32lsb()
-            )
-        
-        attributes.put( 'prealloc-blocks'     , cursor.uint8()     )
-        attributes.put( 'prealloc-dir-blocks' , cursor.uint8()     )
-        attributes.put( 'reserved-gdt-blocks' , cursor.uint16lsb() )
-        
-        attributes.put( 'journal-uuid'        , cursor.uuid()      )
-        attributes.put( 'journal-inum'        , cursor.uint32lsb() )
-        attributes.put( 'journal-dev'         , cursor.uint32lsb() )
-        
-        # start of list of orphans to delete
-        attributes.put( 'last-orphan'         , cursor.uint32lsb() )
-        
-        attributes.put( 'hash-seed'           , [ cursor.uint32lsb() for _ in xrange( 4 ) ])
-        
-        # 0:legacy 1:half-md4 2:tea 3:legacy/unsigned 4:half-md4/unsigned 5:tea/unsigned
-        attributes.put( 'hash-version'        , cursor.uint8() )
-        
-        attributes.put( 'jnl-backup-type'     , cursor.uint8() )
-        
-        attributes.put( 'desc-size'           , cursor.uint16lsb() )
-        
-        attributes.put( 'default-mount-opts'  , self._read_default_mount_options( cursor ) )
-        
-        # I see garbage in the unused mount opts from my test FS. weird.
-        
-        attributes.put( 'first-meta-bg'       , cursor.uint32lsb() )
-        attributes.put( 'mkfs-time'           , cursor.uint32lsb() )
-        
-        attributes.put( 'jnl-blocks'          , [ cursor.uint32lsb() for _ in xrange( 17 ) ] )
-        
-        # hi-bits for values stored here are used if incompat-64bit
-        
-        attributes.put( 'blocks-count-hi'     , cursor.uint32lsb() )
-        attributes.put( 'r-blocks-count-hi'   , cursor.uint32lsb() )
-        attributes.put( 'free-blocks-count-hi', cursor.uint32lsb() )
-        
-        attributes.put( 'min-extra-isize'     , cursor.uint16lsb() )
-        attributes.put( 'want-extra-isize'    , cursor.uint16lsb() )
-        
-        attributes.put( 'flags'               , self._read_superblock_flags( cursor ) )
-        
-        attributes.put( 'raid-stride'         , cursor.uint16lsb() )
-        attributes.put( 'mmp-interval'        , cursor.uint16lsb() )
-        attributes.put( 'mmp-block'           , cursor.uint64lsb() )
-        
-        attributes.put( 'raid-stripe-width'   , cursor.uint32lsb() )
-        attributes.put( 'log-groups-per-flex' , cursor.uint8() )
-        
-        # 1:crc32c -- only valid value
-        attributes.put( 'checksum-type'       , cursor.uint8() )
-        
-        attributes.put( 'reserved-pad'        , cursor.read( 2 ) )
-        
-        attributes.put( 'kbytes-written'      , cursor.uint64lsb() )
-        
-        attributes.put( 'snapshot-inum'       , cursor.uint32lsb() )
-        attributes.put( 'snapshot-id'         , cursor.uint32lsb() )
-        attributes.put(
-            'snapshot-r-block-count',
-            cursor.uint64lsb()      ,
-            )
-        attributes.put( 'snapshot-list'       , cursor.uint32lsb() )
-        
-        attributes.put( 'errors-count'        , cursor.uint32lsb() )
-        attributes.put( 'first-error-time'    , cursor.uint32lsb() )
-        attributes.put( 'first-error-ino'     , cursor.uint32lsb() )
-        attributes.put( 'first-error-block'   , cursor.uint64lsb() )
-        attributes.put( 'first-error-func'    , cursor.clipped( 32 ) )
-        attributes.put( 'first-error-line'    , cursor.uint32lsb() )
-        
-        attributes.put( 'last-error-time'     , cursor.uint32lsb() )
-        attributes.put( 'last-error-ino'      , cursor.uint32lsb() )
-        attributes.put( 'last-error-line'     , cursor.uint32lsb() )
-        attributes.put( 'last-error-block'    , cursor.uint64lsb() )
-        attributes.put( 'last-error-func'     , cursor.clipped( 32 ) )
-        
-        attributes.put( 'mount-opts'          , cursor.clipped( 64 ) )
-        
-        attributes.put( 'usr-quota-inum'      , cursor.uint32lsb() )
-        attributes.put( 'grp-quota-inum'      , cursor.uint32lsb() )
-        
-        attributes.put( 'overhead-blocks'     , cursor.uint32lsb() )
-        
-        attributes.put( 'backup-bgs'          , [ cursor.uint32lsb() for _ in xrange( 2 ) ])
-        
-        # upto 4 algos can be active at a time
-        # why 4 32 ints and not flags I don't know
-        # 0:invalid 1:aes-256-xts 2:aes-256-gcm 3:aes-256-cbc
-        attributes.put( 'encrypt-algos'       , [ cursor.uint32lsb() for _ in xrange( 4 ) ])
-        
-        # reserved
-        cursor.skip( 105 )
-        
-        attributes.put( 'checksum'            , cursor.uint32lsb() )
+        self._SUPERBLOCK_DYNAMIC.read( cursor, self, attributes )
         
         return attributes
         
     def _check_flags( self, flags, value ):
-        attributes    = Attributes()
-        
-        for flagName, flagValue in flags:
-            # this lets it work with multi-flag values
-            active = ( flagValue & value ) == flagValue
-            attributes.put( flagName, active )
-            if active:
-                value -= flagValue
-        
-        attributes.put( '::unknown', value )
-        return attributes
+        return Flags( flags, value, unknown = True )
     
-    def _read_feature_compat( self, cursor ):
+    def _decode_feature_compat( self, value ):
         # an implementation can safely read and write regardless of support for these features
         features = [
             ( 'compat-dir-prealloc'  , 0x001 ) ,
@@ -2459,9 +6399,9 @@ class FileSystem__Ext():
             ( 'compat-exclude-bitmap', 0x100 ) ,
             ( 'compat-sparse-super2' , 0x200 ) ,
             ]
-        return self._check_flags( features, cursor.uint32lsb() )
+        return self._check_flags( features, value )
         
-    def _read_feature_incompat( self, cursor ):
+    def _decode_feature_incompat( self, value ):
         # an implementation should stop immediately if it doesn't support one of these features
         features = [
             ( 'incompat-compression'     , 0x00001 ) ,
@@ -2480,9 +6420,9 @@ class FileSystem__Ext():
             ( 'incompat-inline-data'     , 0x08000 ) ,
             ( 'incompat-encrypt'         , 0x10000 ) ,
             ]
-        return self._check_flags( features, cursor.uint32lsb() )
+        return self._check_flags( features, value )
     
-    def _read_feature_ro( self, cursor ):
+    def _decode_feature_ro( self, value ):
         # an implementation may only read if it doesn't support one of these features
         features = [
             ( 'ro-sparse-superblocks', 0x0001 ) ,
@@ -2499,9 +6439,9 @@ class FileSystem__Ext():
             ( 'ro-replica'           , 0x0800 ) ,
             ( 'ro-readonly'          , 0x1000 ) ,
             ]
-        return self._check_flags( features, cursor.uint32lsb() )
+        return self._check_flags( features, value )
     
-    def _read_default_mount_options( self, cursor ):
+    def _decode_default_mount_options( self, value ):
         options = [
             ( 'defm-debug'         , 0x0001 ) ,
             ( 'defm-bsdgroups'     , 0x0002 ) ,
@@ -2517,7 +6457,7 @@ class FileSystem__Ext():
             ( 'defm-nodelalloc'    , 0x0800 ) ,
             ]
         
-        flags = self._check_flags( options, cursor.uint32lsb() )
+        flags = self._check_flags( options, value )
         
         # fixup this, which is active when both other features are
         # it also bears two macros to define it in the original source
@@ -2526,101 +6466,121 @@ class FileSystem__Ext():
         
         return flags
     
-    def _read_superblock_flags( self, cursor ):
+    def _decode_superblock_flags( self, value ):
         flags = [
             ( 'signed-directory-hash-in-use'  , 0x01 ),
             ( 'unsigned-directory-hash-in-use', 0x02 ),
             ( 'testing-development-code'      , 0x04 ),
             ]
         
-        return self._check_flags( flags, cursor.uint32lsb() )
+        return self._check_flags( flags, value )
     
     # # # # # # # # # # # # # # # # # #
     # these read functions expect the superblock to already be in place
     # 
     
+    _GROUP_DESCRIPTOR = Layout( 'ext-group-descriptor', '<', [
+            ( 'block-bitmap-lo'     , 'I' ) ,
+            ( 'inode-bitmap-lo'     , 'I' ) ,
+            ( 'inode-table-lo'      , 'I' ) ,
+            ( 'free-blocks-count-lo', 'H' ) ,
+            ( 'free-inodes-count-lo', 'H' ) ,
+            ( 'used-dirs-count-lo'  , 'H' ) ,
+            ( 'flags'               , 'H' , '_decode_group_descriptor_flags' ) ,
+            ( 'exclude-bitmap-lo'   , 'I' ) ,
+            ( 'block-bitmap-csum-lo', 'H' ) ,
+            ( 'inode-bitmap-csum-lo', 'H' ) ,
+            ( 'itable-unused-lo'    , 'H' ) ,
+            ( 'checksum'            , 'H' ) ,
+            ])
+    
+    _GROUP_DESCRIPTOR_64BIT = Layout( 'ext-group-descriptor-64bit', '<', [
+            ( 'block-bitmap-hi'     , 'I' ) ,
+            ( 'inode-bitmap-hi'     , 'I' ) ,
+            ( 'inode-table-hi'      , 'I' ) ,
+            ( 'free-blocks-count-hi', 'H' ) ,
+            ( 'free-inodes-count-hi', 'H' ) ,
+            ( 'used-dirs-count-hi'  , 'H' ) ,
+            ( 'itable-unused-hi'    , 'H' ) ,
+            ( 'exclude-bitmap-hi'   , 'I' ) ,
+            ( 'block-bitmap-csum-hi', 'H' ) ,
+            ( 'inode-bitmap-csum-hi', 'H' ) ,
+            ])
+    
     def _read_group_descriptor( self, cursor ):
-        attributes = Attributes()
         start      = cursor.tell()
         
         descSize = self._get_desc_size()
         
-        attributes.put( 'block-bitmap-lo'     , cursor.uint32lsb() )
-        attributes.put( 'inode-bitmap-lo'     , cursor.uint32lsb() )
-        attributes.put( 'inode-table-lo'      , cursor.uint32lsb() )
-        attributes.put( 'free-blocks-count-lo', cursor.uint16lsb() )
-        attributes.put( 'free-inodes-count-lo', cursor.uint16lsb() )
-        attributes.put( 'used-dirs-count-lo'  , cursor.uint16lsb() )
-        attributes.put( 'flags'               , self._read_group_descriptor_flags( cursor ) )
-        attributes.put( 'exclude-bitmap-lo'   , cursor.uint32lsb() )
-        attributes.put( 'block-bitmap-csum-lo', cursor.uint16lsb() )
-        attributes.put( 'inode-bitmap-csum-lo', cursor.uint16lsb() )
-        attributes.put( 'itable-unused-lo'    , cursor.uint16lsb() )
-        attributes.put( 'checksum'            , cursor.uint16lsb() )
+        attributes = self._GROUP_DESCRIPTOR.read( cursor, self )
         
         flag64Bit = self._superblock.get( 'feature-incompat' ).get( 'incompat-64bit' )
         
-        DEBUG_EXT( '## descSize:%s > 32 && flag64Bit:%s = gather-64-bit-fields:%s' % (
-                repr( descSize  ) ,
-                repr( flag64Bit ) ,
-                repr( bool( flag64Bit and ( descSize > 32 ) ) ) ,
-                ))
+        LOG_EXT.debug( 'descSize:%r > 32 && flag64Bit:%r = gather-64-bit-fields:%r' ,
+            descSize                                ,
+            flag64Bit                               ,
+            bool( flag64Bit and ( descSize > 32 ) ) ,
+            )
         
         if flag64Bit and ( descSize > 32 ):
-            attributes.put( 'block-bitmap-hi'     , cursor.uint32lsb() )
-            attributes.put( 'inode-bitmap-hi'     , cursor.uint32lsb() )
-            attributes.put( 'inode-table-hi'      , cursor.uint32lsb() )
-            attributes.put( 'free-blocks-count-hi', cursor.uint16lsb() )
-            attributes.put( 'free-inodes-count-hi', cursor.uint16lsb() )
-            attributes.put( 'used-dirs-count-hi'  , cursor.uint16lsb() )
-            attributes.put( 'itable-unused-hi'    , cursor.uint16lsb() )
-            attributes.put( 'exclude-bitmap-hi'   , cursor.uint32lsb() )
-            attributes.put( 'block-bitmap-csum-hi', cursor.uint16lsb() )
-            attributes.put( 'inode-bitmap-csum-hi', cursor.uint16lsb() )
+            self._GROUP_DESCRIPTOR_64BIT.read( cursor, self, attributes )
             
             # only seek if descSize is set, otherwise let the 32bits taken stick
             cursor.seek( start + descSize )
         
         return attributes
     
-    def _read_group_descriptor_flags( self, cursor ):
+    def _decode_group_descriptor_flags( self, value ):
         flags = [
             ( 'inode-uninit', 0x1 ) ,
             ( 'block-uninit', 0x2 ) ,
             ( 'inode-zeroed', 0x4 ) ,
             ]
         
-        return self._check_flags( flags, cursor.uint16lsb() )
+        return self._check_flags( flags, value )
+    
+    _INODE_DESCRIPTOR_OS_SPECIFIC_2 = Layout( 'ext-inode-descriptor-os-specific-2', '<', [
+            ( 'blocks-high'  , 'H' ) ,
+            ( 'file-acl-high', 'H' ) ,
+            ( 'uid-high'     , 'H' ) ,
+            ( 'gid-high'     , 'H' ) ,
+            ( 'checksum-lo'  , 'H' ) ,
+            ( 'reserved'     , 'H' ) ,
+            ])
+    
+    # the inode as far as the good old revision goes
+    # 
+    _INODE_DESCRIPTOR = Layout( 'ext-inode-descriptor', '<', [
+            ( 'mode'               , 'H'   , '_decode_inode_descriptor_mode' ) ,
+            ( 'uid'                , 'H'   ) ,
+            ( 'size-lo'            , 'I'   ) ,
+            ( 'atime'              , 'I'   ) ,
+            ( 'ctime'              , 'I'   ) ,
+            ( 'mtime'              , 'I'   ) ,
+            ( 'dtime'              , 'I'   ) ,
+            ( 'gid'                , 'H'   ) ,
+            ( 'links-count'        , 'H'   ) ,
+            ( 'blocks-lo'          , 'I'   ) ,
+            ( 'flags'              , 'I'   , '_decode_inode_descriptor_flags' ) ,
+            
+            ( 'os-specific'        , 'I'   ) ,
+            
+            ( 'block-map'          , '60s' ) ,
+            
+            # file version for nfs
+            ( 'generation'         , 'I'   ) ,
+            
+            ( 'file-acl-lo'        , 'I'   ) ,
+            ( 'dir-acl-or-size-hi' , 'I'   ) ,
+            ( 'obso-faddr'         , 'I'   ) ,
+            
+            ( 'os-specific-2'      , _INODE_DESCRIPTOR_OS_SPECIFIC_2 ) ,
+            ])
     
     def _read_inode_descriptor( self, cursor ):
-        attributes = Attributes()
-        
         inodeDescriptorStart = cursor.tell()
         
-        attributes.put( 'mode'               , self._read_inode_descriptor_mode( cursor ) )
-        attributes.put( 'uid'                , cursor.uint16lsb() )
-        attributes.put( 'size-lo'            , cursor.uint32lsb() )
-        attributes.put( 'atime'              , cursor.uint32lsb() )
-        attributes.put( 'ctime'              , cursor.uint32lsb() )
-        attributes.put( 'mtime'              , cursor.uint32lsb() )
-        attributes.put( 'dtime'              , cursor.uint32lsb() )
-        attributes.put( 'gid'                , cursor.uint16lsb() )
-        attributes.put( 'links-count'        , cursor.uint16lsb() )
-        attributes.put( 'blocks-lo'          , cursor.uint32lsb() )
-        attributes.put( 'flags'              , self._read_inode_descriptor_flags( cursor ) )
-        
-        attributes.put( 'os-specific'        , cursor.uint32lsb() )
-        
-        attributes.put( 'block-map'          , cursor.read( 60 ) )
-        
-        # file version for nfs
-        attributes.put( 'generation'         , cursor.uint32lsb() )
-        
-        attributes.put( 'file-acl-lo'        , cursor.uint32lsb() )
-        attributes.put( 'dir-acl-or-size-hi' , cursor.uint32lsb() )
-        attributes.put( 'obso-faddr'         , cursor.uint32lsb() )
-        
-        attributes.put( 'os-specific-2'      , self._read_inode_descriptor_os_specific_2( cursor ) )
+        attributes = self._INODE_DESCRIPTOR.read( cursor, self )
         
         if attributes.get( 'flags' ).get( '::unknown' ) != 0:
             raise Exception( 'fill in the flags' )
@@ -2631,42 +6591,55 @@ class FileSystem__Ext():
         if self._superblock.get( 'rev-level' ) == self._GOOD_OLD_INODE_SIZE:
             return attributes
         
-        extraStart = cursor.tell()
+        # no room for any extra fields in inodes of the original size
+        # 
+        if self._get_inode_size() <= self._INODE_DESCRIPTOR.size():
+            return attributes
+        
+        # the extra fields come and go with extra-isize, so they are still taken one at
+        # a time, but from a single read of the rest of the inode rather than the rados
+        # 
+        extraCursor = RadoBlob(
+            name = 'ext-inode-descriptor-extra-rado'                                     ,
+            blob = cursor.read( self._get_inode_size() - self._INODE_DESCRIPTOR.size() ) ,
+            ).cursor()
+        
+        extraStart = extraCursor.tell()
         
         # continuous checks for end of inode data so all inodes need not be extended on filesystem upgrade
         # probably not needed till 64 bytes further in, but whatever
         
-        attributes.put( 'extra-isize'   , cursor.uint16lsb() )
+        attributes.put( 'extra-isize'   , extraCursor.uint16lsb() )
         
         extraISize = attributes.get( 'extra-isize' )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'checksum-hi'   , cursor.uint16lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'checksum-hi'   , extraCursor.uint16lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'ctime-extra'   , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'ctime-extra'   , extraCursor.uint32lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'mtime-extra'   , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'mtime-extra'   , extraCursor.uint32lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'atime-extra'   , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'atime-extra'   , extraCursor.uint32lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'crtime'        , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'crtime'        , extraCursor.uint32lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'crtime-extra'  , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'crtime-extra'  , extraCursor.uint32lsb() )
         
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'verion-hi'     , cursor.uint32lsb() )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'verion-hi'     , extraCursor.uint32lsb() )
         
         # more future bits here
         
         # if it gets here, there's unknown junk at the end that should be known, note it and leave
-        if cursor.tell() - extraStart < extraISize:
-            attributes.put( 'remaining-isize' , cursor.read( 
-                    attributes.get( 'extra-isize' ) - ( cursor.tell() - extraStart )
+        if extraCursor.tell() - extraStart < extraISize:
+            attributes.put( 'remaining-isize' , extraCursor.read( 
+                    attributes.get( 'extra-isize' ) - ( extraCursor.tell() - extraStart )
                     ))
         
         # print 'AT tell:%s start:%s thus:%s extra-isize:%s inode-size:%s' % (
@@ -2677,15 +6650,12 @@ class FileSystem__Ext():
         #     str( self._get_inode_size() ) ,
         #     )
         
-        # skip any empty space after the extra isize chunk and before the next inode
+        # the whole inode was read, leaving the callers cursor at the next one
         # ( not that we currently walk the inode entries, but this will make it not break if we do )
-        cursor.seek( inodeDescriptorStart + self._get_inode_size() )
-        
-        # print 'END', cursor.tell()
         
         return attributes
     
-    def _read_inode_descriptor_mode( self, cursor ):
+    def _decode_inode_descriptor_mode( self, value ):
         
         modes = [
             ( 'ixoth',   0x1 ) ,
@@ -2706,7 +6676,7 @@ class FileSystem__Ext():
             
             ]
         
-        checked = self._check_flags( modes, cursor.uint16lsb() )
+        checked = self._check_flags( modes, value )
         
         # the following are mutually exclusive
         # 
@@ -2728,7 +6698,7 @@ class FileSystem__Ext():
         
         return checked
     
-    def _read_inode_descriptor_flags( self, cursor ):
+    def _decode_inode_descriptor_flags( self, value ):
         flags = [
             ( 'secrm-fl'           , 0x00000001 ) , # requires secure deletion ( unimplemented )
             ( 'unrm-fl'            , 0x00000002 ) , # preserve for undelete    ( unimplemented )
@@ -2760,19 +6730,7 @@ class FileSystem__Ext():
             ( 'reserved-fl'        , 0x80000000 ) , # reserved for ext4 library
             ]
         # todo: add aggregate flags?
-        return self._check_flags( flags, cursor.uint32lsb() )
-    
-    def _read_inode_descriptor_os_specific_2( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'blocks-high'  , cursor.uint16lsb() )
-        attributes.put( 'file-acl-high', cursor.uint16lsb() )
-        attributes.put( 'uid-high'     , cursor.uint16lsb() )
-        attributes.put( 'gid-high'     , cursor.uint16lsb() )
-        attributes.put( 'checksum-lo'  , cursor.uint16lsb() )
-        attributes.put( 'reserved'     , cursor.uint16lsb() )
-        
-        return attributes
+        return self._check_flags( flags, value )
     
     # # # # # # # # # # # # # # # # # #
     # functions for traversing the data
@@ -2807,7 +6765,7 @@ class FileSystem__Ext():
         if descSize >= 32:
             return descSize
         else:
-            print 'BAD DESCRIPTOR SIZE SPECIFICATION IN EXT*? USING 32 INSTEAD OF %s' % str( descSize )
+            LOG_EXT.warning( 'bad descriptor size specification, using 32 instead of %s', descSize )
             return 32
     
     def _get_group_descriptor_table_offset( self ):
@@ -2821,23 +6779,49 @@ class FileSystem__Ext():
             # just use the second
             return blockSize
         
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_METADATA )
+    def _get_group_descriptor_table( self ):
+        # the whole table, one descriptor for every group of inodes
+        
+        groupCount = (
+            ( self._superblock.get( 'inodes-count'     ) + self._superblock.get( 'inodes-per-group' ) - 1 )
+            / self._superblock.get( 'inodes-per-group' )
+            )
+        
+        LOG_EXT.debug( 'group descriptor table offset %s', self._get_group_descriptor_table_offset() )
+        LOG_EXT.debug( 'group descriptor count %s', groupCount )
+        
+        return Table.read(
+            name   = 'ext-group-descriptors'                    ,
+            rado   = self._rado                                 ,
+            layout = self._GROUP_DESCRIPTOR                     ,
+            offset = self._get_group_descriptor_table_offset() ,
+            count  = groupCount                                 ,
+            stride = self._get_desc_size()                      ,
+            )
+    
     def _get_group_descriptor( self, groupNo ):
         if groupNo < 0:
             raise Exception( 'attempt to find descriptor for impossible group no' )
         
-        descSize = self._get_desc_size()
-        cursor   = self._rado.cursor()
+        groupDescriptorTable = self._get_group_descriptor_table()
         
-        cursor.seek( self._get_group_descriptor_table_offset() )
-        cursor.skip( descSize * groupNo )
+        if groupNo >= len( groupDescriptorTable ):
+            raise Exception( 'attempt to find descriptor for group %s of %s' % (
+                    repr( groupNo                     ) ,
+                    repr( len( groupDescriptorTable ) ) ,
+                    ))
         
-        DEBUG_EXT( 'GROUP DESCRIPTOR TABLE OFFSET', self._get_group_descriptor_table_offset() )
-        DEBUG_EXT( 'READING GROUP DESCRIPTOR FROM', cursor.tell() )
+        # the 64 bit fields follow the 32 byte record within the stride, so the
+        # descriptor is read from its whole stride of the table, not just the record
+        cursor = RadoBlob(
+            name = 'ext-group-descriptor-rado'                  ,
+            blob = groupDescriptorTable.stride_data( groupNo ) ,
+            ).cursor()
         
         groupDescriptor = self._read_group_descriptor( cursor )
         
-        DEBUG_EXT( 'GROUP DESCRIPTOR', groupNo )
-        DEBUG_EXT( groupDescriptor )
+        LOG_EXT.debug( 'group descriptor %s\n%s', groupNo, groupDescriptor )
         
         return groupDescriptor
     
@@ -2877,9 +6861,10 @@ class FileSystem__Ext():
     
 
 class FileSystem__Ext__InodeContents__BlockDevice():
-    def __init__( self, fileSystemExt, inodeDescriptor ):
+    def __init__( self, fileSystemExt, inodeDescriptor, cachePriority = CACHE_PRIORITY_CONTENTS ):
         self._fileSystemExt   = fileSystemExt
         self._inodeDescriptor = inodeDescriptor
+        self._cachePriority   = cachePriority
         return
     
     def size( self ):
@@ -2896,21 +6881,56 @@ class FileSystem__Ext__InodeContents__BlockDevice():
     def block_size( self ):
         return self._fileSystemExt._get_block_size()
     
-    @Common.memoize( 'ext-inode-contents-blocks' )
+    @Common.traced( 'get_block' )
+    @Common.memoize( 'blocks', priority = CACHE_PRIORITY_CONTENTS )
     def get_block( self, blockNo ):
         rawBlockNo = self._get_raw_block_no(
             contentsBlockNo = blockNo ,
             )
         
+        if rawBlockNo == None:
+            return self._get_sparse_rado( 1 )
+        
         return self.get_raw_block( rawBlockNo )
+    
+    @Common.traced( 'get_blocks' )
+    def get_blocks( self, blockNo, count ):
+        # contents blocks that map onto consecutive raw blocks are handed back as a single run
+        # as are runs of sparse blocks
+        # 
+        
+        runs = []
+        for rawBlockNo, blockCount in self._get_raw_runs( blockNo, count ):
+            if rawBlockNo == None:
+                runs.append( ( blockCount, self._get_sparse_rado( blockCount ) ) )
+            else:
+                runs.append( ( blockCount, self.get_raw_block( rawBlockNo, blockCount ) ) )
+        
+        return runs
+    
+    def get_extents( self, blockNo, count ):
+        # sparse blocks, those with no raw block behind them, are holes
+        
+        runs = []
+        
+        for rawBlockNo, blockCount in self._get_raw_runs( blockNo, count ):
+            Common.add_run( runs, blockCount, rawBlockNo != None )
+        
+        return runs
+    
+    def _get_sparse_rado( self, count ):
+        return RadoZero(
+            name = 'ext-sparse-blocks-rado'  ,
+            size = count * self.block_size() ,
+            )
         
-    def get_raw_block( self, rawBlockNo ):
+    def get_raw_block( self, rawBlockNo, count = 1 ):
         
         availableBlocks = (
             self._fileSystemExt._rado.size() / self.block_size()
             )
         
-        if rawBlockNo > availableBlocks:
+        if rawBlockNo + count - 1 > availableBlocks:
             raise Exception(
                 'requested block beyond end of underlying device'
                 )
@@ -2921,12 +6941,135 @@ class FileSystem__Ext__InodeContents__BlockDevice():
             name   = 'inode-contents-block-rado' ,
             rado   = self._fileSystemExt._rado   ,
             offset = rawBlockPosition            ,
-            size   = self.block_size()           ,
+            size   = count * self.block_size()   ,
             )
     
-    def _get_raw_block_no( self, contentsBlockNo ):
-        # converts contents block no to a raw block no
+    def _get_raw_runs( self, blockNo, count ):
+        # [ rawBlockNo or None, blockCount ] for the contents blocks from blockNo, the
+        # block map walked once for the whole range rather than once per block. blocks
+        # mapping onto consecutive raw blocks share a run, as do sparse ones
+        
+        self._check_contents()
+        
+        if self._inodeDescriptor.get( 'flags' ).get( 'extents-fl' ):
+            pieces = self._get_raw_pieces_via_extents( blockNo, count )
+        else:
+            pieces = self._get_raw_pieces_via_indirect_blocks( blockNo, count )
+        
+        runs = []
+        for rawBlockNo, blockCount in pieces:
+            if runs and rawBlockNo == None and runs[-1][0] == None:
+                runs[-1][1] += blockCount
+            elif runs and rawBlockNo != None and runs[-1][0] != None and runs[-1][0] + runs[-1][1] == rawBlockNo:
+                runs[-1][1] += blockCount
+            else:
+                runs.append( [ rawBlockNo, blockCount ] )
+        
+        return runs
+    
+    def _get_raw_pieces_via_extents( self, blockNo, count ):
+        # ( rawBlockNo or None, blockCount ) pieces, an extent or the gap before one each
+        
+        cursor = RadoBlob(
+            name = 'ext-extent-inode-block-map-blob-rado-cursor' ,
+            blob = self._inodeDescriptor.get( 'block-map' )      ,
+            ).cursor()
+        
+        extentHeader = self._read_ext4_extent_header( cursor )
+        
+        if extentHeader.get( 'depth' ) != 0:
+            raise Exception( 'no handling indirection yet' )
+        
+        # ( first contents block, length, first raw block or None when unwritten )
+        extents = []
+        for _ in xrange( extentHeader.get( 'entries' ) ):
+            extent    = self._read_ext4_extent( cursor )
+            extentLen = extent.get( 'len' )
+            
+            if extentLen > self._EXT_INIT_MAX_LEN:
+                extents.append( ( extent.get( 'block' ), extentLen - self._EXT_INIT_MAX_LEN, None ) )
+            else:
+                rawBlockNo = ( extent.get( 'start-hi' ) << 16 ) + extent.get( 'start-lo' )
+                extents.append( ( extent.get( 'block' ), extentLen, rawBlockNo ) )
+        
+        extents.sort()
+        
+        position = blockNo
+        end      = blockNo + count
+        
+        for extentBlock, extentLen, rawBlockNo in extents:
+            if extentBlock + extentLen <= position:
+                continue
+            if extentBlock >= end:
+                break
+            
+            if extentBlock > position:
+                yield None, extentBlock - position
+                position = extentBlock
+            
+            taken = min( extentBlock + extentLen, end ) - position
+            yield ( None if rawBlockNo == None else rawBlockNo + position - extentBlock ), taken
+            position += taken
+        
+        if position < end:
+            yield None, end - position
+    
+    def _get_raw_pieces_via_indirect_blocks( self, blockNo, count ):
+        # ( rawBlockNo or None, 1 ) for each block. every indirect block is read once
+        # for the range, and only the one in use is held
+        
+        cursor = RadoBlob(
+            name = 'block-map-rado'                         ,
+            blob = self._inodeDescriptor.get( 'block-map' ) ,
+            ).cursor()
+        
+        directs = [ cursor.uint32lsb() for _ in xrange( 12 ) ]
+        
+        singleIndirect = cursor.uint32lsb()
+        doubleIndirect = cursor.uint32lsb()
+        
+        perBlock = self.block_size() / 4
         
+        def pointers( rawBlockNo ):
+            # the block numbers held in an indirect block, None for a sparse one
+            if not rawBlockNo:
+                return None
+            data = self.get_raw_block( rawBlockNo ).cursor().read( self.block_size() )
+            return struct.unpack( '<%sI' % perBlock, data )
+        
+        singlePointers = False # not read yet
+        doublePointers = False
+        indirect       = ( None, None ) # ( rawBlockNo, pointers ) under the double indirect
+        
+        for contentsBlockNo in xrange( blockNo, blockNo + count ):
+            if contentsBlockNo < 12:
+                rawBlockNo = directs[ contentsBlockNo ]
+            
+            elif contentsBlockNo < 12 + perBlock:
+                if singlePointers is False:
+                    singlePointers = pointers( singleIndirect )
+                rawBlockNo = singlePointers[ contentsBlockNo - 12 ] if singlePointers else 0
+            
+            elif contentsBlockNo < 12 + perBlock + perBlock ** 2:
+                if doublePointers is False:
+                    doublePointers = pointers( doubleIndirect )
+                
+                slot            = contentsBlockNo - 12 - perBlock
+                indirectBlockNo = doublePointers[ slot / perBlock ] if doublePointers else 0
+                
+                if indirect[0] != indirectBlockNo:
+                    indirect = ( indirectBlockNo, pointers( indirectBlockNo ) )
+                
+                rawBlockNo = indirect[1][ slot % perBlock ] if indirect[1] else 0
+            
+            else:
+                raise Exception(
+                    'unable to locate block : ( double indirect and triple indirect blocks unimplemented'
+                    )
+            
+            yield rawBlockNo or None, 1
+    
+    def _check_contents( self ):
         mode = self._inodeDescriptor.get( 'mode' )
         
         if not ( mode.get( 'dir' ) or mode.get( 'reg' ) ):
@@ -2939,6 +7082,14 @@ class FileSystem__Ext__InodeContents__BlockDevice():
             # directly in the inode i_block field, the 'block-map' attribute
             raise Exception( 'possibilities of inline data are not currently handled' )
         
+        return
+    
+    def _get_raw_block_no( self, contentsBlockNo ):
+        # converts contents block no to a raw block no
+        # None for sparse blocks, which have nothing allocated and read as zeros
+        
+        self._check_contents()
+        
         if self._inodeDescriptor.get( 'flags' ).get( 'extents-fl' ):
             return self._get_raw_block_no_via_extents( contentsBlockNo )
         
@@ -2960,13 +7111,23 @@ class FileSystem__Ext__InodeContents__BlockDevice():
             for _ in xrange( currentExtentHeader.get( 'entries' ) ):
                 extent = self._read_ext4_extent( cursor )
                 
+                # lengths over 32768 mark extents that are allocated but not yet
+                # written, which read as zeros the same as blocks with no extent
+                extentLen = extent.get( 'len' )
+                unwritten = extentLen > self._EXT_INIT_MAX_LEN
+                if unwritten:
+                    extentLen -= self._EXT_INIT_MAX_LEN
+                
                 desiredBlockContainedInExtent = (
                     extent.get( 'block' ) 
                     <= contentsBlockNo 
-                    <= ( extent.get( 'block' ) + extent.get( 'len' ) )
+                    < ( extent.get( 'block' ) + extentLen )
                     )
                 
                 if desiredBlockContainedInExtent:
+                    if unwritten:
+                        return None
+                    
                     blockEntryInExtent = contentsBlockNo - extent.get( 'block' )
                     # print 'BLOCK ENTRY IN EXTENT', blockEntryInExtent
                     
@@ -2974,8 +7135,9 @@ class FileSystem__Ext__InodeContents__BlockDevice():
                     # print 'RAW BLOCK NO', rawBlockNo
                     
                     return rawBlockNo + blockEntryInExtent
-                
-            raise Exception( 'what now?' )
+            
+            # no extent covers the block, so it is sparse
+            return None
         
         else:
             blocksToProcess = []
@@ -2986,26 +7148,28 @@ class FileSystem__Ext__InodeContents__BlockDevice():
         
         raise Exception( 'raw extent' )
     
+    _EXT_INIT_MAX_LEN = 32768
+    
+    _EXT4_EXTENT_HEADER = Layout( 'ext4-extent-header', '<', [
+            ( 'magic'     , '2s' ) ,
+            ( 'entries'   , 'H'  ) ,
+            ( 'max'       , 'H'  ) ,
+            ( 'depth'     , 'H'  ) ,
+            ( 'generation', 'I'  ) ,
+            ])
+    
+    _EXT4_EXTENT = Layout( 'ext4-extent', '<', [
+            ( 'block'   , 'I' ) , # which contents block this is
+            ( 'len'     , 'H' ) , # how many blocks it covers
+            ( 'start-hi', 'H' ) , # hi part of 64bit raw block no
+            ( 'start-lo', 'I' ) , # lo part of 64bit raw block no
+            ])
+    
     def _read_ext4_extent_header( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'magic'     , cursor.read( 2 ) )
-        attributes.put( 'entries'   , cursor.uint16lsb() )
-        attributes.put( 'max'       , cursor.uint16lsb() )
-        attributes.put( 'depth'     , cursor.uint16lsb() )
-        attributes.put( 'generation', cursor.uint32lsb() )
-        
-        return attributes
+        return self._EXT4_EXTENT_HEADER.read( cursor )
     
     def _read_ext4_extent( self, cursor ):
-        attributes = Attributes()
-        
-        attributes.put( 'block'   , cursor.uint32lsb() ) # which contents block this is
-        attributes.put( 'len'     , cursor.uint16lsb() ) # how many blocks it covers
-        attributes.put( 'start-hi', cursor.uint16lsb() ) # hi part of 64bit raw block no
-        attributes.put( 'start-lo', cursor.uint32lsb() ) # lo part of 64bit raw block no
-        
-        return attributes
+        return self._EXT4_EXTENT.read( cursor )
     
     def _get_raw_block_no_via_indirect_blocks( self, contentsBlockNo ):
         
@@ -3030,9 +7194,7 @@ class FileSystem__Ext__InodeContents__BlockDevice():
             rawBlockNo = directs[ contentsBlockNo ]
             
             if rawBlockNo == 0:
-                raise Exception(
-                    'requested contentsBlockNo with null rawBlockNo'
-                    )
+                return None
             
             return rawBlockNo
         
@@ -3041,29 +7203,36 @@ class FileSystem__Ext__InodeContents__BlockDevice():
         
         if ( singleIndirectBlocksFirst <= contentsBlockNo <= singleIndirectBlocksLast ):
             if not singleIndirect:
-                raise Exception( 'asked for indirect block, no indirect blocks' )
+                return None
             
             indirectBlock = self.get_raw_block( singleIndirect )
             cursor = indirectBlock.cursor()
             cursor.skip( 4 * ( contentsBlockNo - 12 ) )
             actualRawBlockNo = cursor.uint32lsb()
-            return actualRawBlockNo
+            return actualRawBlockNo or None
         
         doubleIndirectBlocksFirst = ( self.block_size() / 4 ) + 12
         doubleIndirectBlocksLast  = ( self.block_size() / 4 ) ** 2 + ( self.block_size() / 4 ) + 11
         
         if ( doubleIndirectBlocksFirst <= contentsBlockNo <= doubleIndirectBlocksLast ):
-            slot               = ( contentsBlockNo - singleIndirectBlocksLast )
+            slot               = ( contentsBlockNo - doubleIndirectBlocksFirst )
             indirectBlockSlot  = slot / ( self.block_size() / 4 )
             indirectOffsetSlot = slot % ( self.block_size() / 4 )
             
+            if not doubleIndirect:
+                return None
+            
             doubleBlockCursor = self.get_raw_block( doubleIndirect ).cursor()
             doubleBlockCursor.skip( indirectBlockSlot * 4 )
             
-            indirectBlockCursor = self.get_raw_block( doubleBlockCursor.uint32lsb() ).cursor()
+            indirectBlockNo = doubleBlockCursor.uint32lsb()
+            if not indirectBlockNo:
+                return None
+            
+            indirectBlockCursor = self.get_raw_block( indirectBlockNo ).cursor()
             indirectBlockCursor.skip( indirectOffsetSlot * 4 )
             
-            return indirectBlockCursor.uint32lsb()
+            return indirectBlockCursor.uint32lsb() or None
             
         raise Exception(
             'unable to locate block : ( double indirect and triple indirect blocks unimplemented'
@@ -3084,6 +7253,10 @@ class FileSystem__Ext__Directory():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    def metadata( self ):
+        return self._fileSystemExt._get_inode_descriptor( self._inodeNo )
+    
+    @Common.traced( 'list' )
     def list( self ):
         inodeDescriptor = self._fileSystemExt._get_inode_descriptor( self._inodeNo )
         dirents         = self._get_directory_entries( inodeDescriptor )
@@ -3097,6 +7270,7 @@ class FileSystem__Ext__Directory():
         
         return entries
     
+    @Common.traced( 'select' )
     def select( self, what ):
         inodeDescriptor = self._fileSystemExt._get_inode_descriptor( self._inodeNo )
         dirents         = self._get_directory_entries( inodeDescriptor )
@@ -3127,8 +7301,9 @@ class FileSystem__Ext__Directory():
         contentsRado = RadoBlock( 
             name        = 'directory-inodes-blockdevice-rado' ,
             blockDevice = FileSystem__Ext__InodeContents__BlockDevice(
-                fileSystemExt   = self._fileSystemExt ,
-                inodeDescriptor = inodeDescriptor     ,
+                fileSystemExt   = self._fileSystemExt     ,
+                inodeDescriptor = inodeDescriptor         ,
+                cachePriority   = CACHE_PRIORITY_METADATA ,
                 ))
         
         cursor = contentsRado.cursor()
@@ -3136,7 +7311,7 @@ class FileSystem__Ext__Directory():
         contentsSize = contentsRado.size()
         
         if inodeDescriptor.get( 'flags' ).get( 'index-fl' ):
-            print 'directory hash trees not yet implemented ( is regular form preserved? )'
+            LOG_EXT.info( 'directory hash trees not yet implemented ( is regular form preserved? )' )
         
         entries = []
         
@@ -3150,7 +7325,7 @@ class FileSystem__Ext__Directory():
             if cursor.tell() > contentsSize:
                 # erm, something's fucky in the dirent structure
                 # 
-                print 'FYI : BAD DIRENT IN DIRECTORY'
+                LOG_EXT.warning( 'bad dirent in directory' )
                 break
             
             # print 'READING dirent from %s of %s' % (
@@ -3171,7 +7346,7 @@ class FileSystem__Ext__Directory():
             #     )
             
             if entry.get( 'rec-len' ) == 0:
-                print 'FYI : BAD RECLEN IN DIRECTORY DIRENT'
+                LOG_EXT.warning( 'bad rec-len in directory dirent' )
                 break
             
             cursor.seek( previousPosition + entry.get( 'rec-len' ) )
@@ -3183,16 +7358,19 @@ class FileSystem__Ext__Directory():
         
         return entries
     
+    # name-len was uint16lsb in the original, but the value was never >= 255
+    # so the high bytes were stolen for a file-type field to avoid having to
+    # load all inodes of all files to determine type
+    # 
+    _DIRECTORY_ENTRY = Layout( 'ext-directory-entry', '<', [
+            ( 'inode'     , 'I' ) ,
+            ( 'rec-len'   , 'H' ) ,
+            ( 'name-len'  , 'B' ) ,
+            ( 'file-type' , 'B' ) ,
+            ])
+    
     def _read_directory_entry( self, cursor ):
-        # name-len was uint16lsb in the original, but the value was never >= 255
-        # so the high bytes were stolen for a file-type field to avoid having to
-        # load all inodes of all files to determine type
-        # 
-        attributes = Attributes()
-        attributes.put( 'inode'     , cursor.uint32lsb() )
-        attributes.put( 'rec-len'   , cursor.uint16lsb() )
-        attributes.put( 'name-len'  , cursor.uint8() )
-        attributes.put( 'file-type' , cursor.uint8() )
+        attributes = self._DIRECTORY_ENTRY.read( cursor )
         attributes.put( 'name'      , cursor.read( attributes.get( 'name-len' ) ) )
         return attributes
 
@@ -3208,10 +7386,13 @@ class FileSystem__Ext__RegularFile():
     def is_listable( self ): return False
     def is_radoable( self ): return True
     
+    def metadata( self ):
+        return self._fileSystemExt._get_inode_descriptor( self._inodeNo )
+    
     def rado( self ):
         inodeDescriptor = self._fileSystemExt._get_inode_descriptor( self._inodeNo )
         
-        print inodeDescriptor
+        LOG_EXT.debug( 'inode %s\n%s', self._inodeNo, inodeDescriptor )
         
         return RadoBlock( 
             name        = 'ext-file-inode-blockdevice-rado' ,
@@ -3254,6 +7435,8 @@ class FileSystem__Ext__RegularFile():
 class DiskFormat__ApplePartitionMap__Disk():
     name = 'disk-format--apple-partition-map--disk'
     
+    signatures = [ Signature( 0, 'PM' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor      = rado.cursor()
@@ -3267,9 +7450,11 @@ class DiskFormat__ApplePartitionMap__Disk():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    @Common.traced( 'list' )
     def list( self ):
         raise Exception( 'nope' )
     
+    @Common.traced( 'select' )
     def select( self ):
         raise Exception( 'nope' )
 
@@ -3291,6 +7476,8 @@ class Archive__Stuff_It():
     
     MAGIC_NUMBERS = [ 'SIT!', 'ST46', 'ST50', 'ST60', 'ST65', 'STin', 'STi2', 'STi3', 'STi4' ]
     
+    signatures = [ Signature( 0, magicNumber ) for magicNumber in MAGIC_NUMBERS ]
+    
     def __init__( self, rado ):
         self._rado = rado
         return
@@ -3319,6 +7506,8 @@ STUFFIT__COMPRESSION_ALGORITHMS = {
 class Archive__Stuff_It_Five():
     name = 'archive--stuff-it-five'
     
+    signatures = [ Signature( 0, 'StuffIt (c)1997-' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -3357,6 +7546,7 @@ class Archive__Stuff_It_Five():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    @Common.traced( 'list' )
     def list( self ):
         # can the first entry ever not be a directory?
         # we'd have to peek at the header to determine
@@ -3371,6 +7561,7 @@ class Archive__Stuff_It_Five():
             offset = self._firstEntryHeaderOffset ,
             ).list()
     
+    @Common.traced( 'select' )
     def select( self, what ):
         return Archive__Stuff_It_Five__Directory(
             rado   = self._rado                   ,
@@ -3644,6 +7835,7 @@ class Archive__Stuff_It_Five__Directory():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    @Common.traced( 'list' )
     def list( self ):
         entries = []
         
@@ -3661,6 +7853,7 @@ class Archive__Stuff_It_Five__Directory():
                 
         return entries
     
+    @Common.traced( 'select' )
     def select( self, what ):
         for header in self._folder_entry_headers():
             if header.get( '@is-folder' ):
@@ -3687,7 +7880,7 @@ class Archive__Stuff_It_Five__File__BlockDevice():
         self._base   = base
         self._header = header
         
-        print self._header
+        LOG_STUFFIT.debug( 'header\n%s', self._header )
     
     def block_size( self ):
         return 512
@@ -3695,6 +7888,7 @@ class Archive__Stuff_It_Five__File__BlockDevice():
     def size( self ):
         raise Exception( 'unimplemented' )
     
+    @Common.traced( 'get_block' )
     def get_block( self, blockNo ):
         raise Exception( 'file unimplemented' )
 
@@ -3800,6 +7994,9 @@ class StuffIt5__Arsenic__Decoder():
 class FileSystem__FAT():
     name = 'file-system--fat'
     
+    # the boot sector magic it shares with the mbr, matches() checks the jump
+    signatures = [ Signature( 510, '\x55\xaa' ) ]
+    
     @staticmethod
     def matches( rado ):
         # FAT formats start with a 3 byte far or near jump in asm
@@ -3836,8 +8033,7 @@ class FileSystem__FAT():
         
         self._bootSector = self._read_boot_sector( rado )
         
-        print 'FAT'
-        print self._bootSector
+        LOG_FAT.debug( 'boot sector\n%s', self._bootSector )
         
         return
     
@@ -3883,6 +8079,8 @@ class Test__BlockLayout():
     
     name = 'test--block-layout'
     
+    signatures = []
+    
     @staticmethod
     def matches( rado ):
         return False
@@ -3894,9 +8092,11 @@ class Test__BlockLayout():
     def is_radoable( self ): return False
     def is_listable( self ): return True
     
+    @Common.traced( 'list' )
     def list( self ):
         return [ ('block-0', 'first-block'), ('block-n', 'nth-block') ]
     
+    @Common.traced( 'select' )
     def select( self, what ):
         _, no = what.split( '-' )
         
@@ -3919,6 +8119,8 @@ class Test__BlockLayout():
 class Archive_Ar():
     name = 'archive--ar'
     
+    signatures = [ Signature( 0, '!<arch>' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -3931,6 +8133,7 @@ class Archive_Ar():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    @Common.traced( 'list' )
     def list( self ):
         return [
             ( f.get('filename'), 'file' )
@@ -3965,6 +8168,7 @@ class Archive_Ar():
             
         return files
     
+    @Common.traced( 'select' )
     def select( self, what ):
         for f in self._files():
             if what == f.get('filename'):
@@ -3992,6 +8196,8 @@ class Archive_Ar():
 class Archive__CpioNewAsciiFormat():
     name = 'archive--cpio--new-ascii-format'
     
+    signatures = [ Signature( 0, '070701' ) ]
+    
     @staticmethod
     def matches( rado ):
         cursor = rado.cursor()
@@ -4005,6 +8211,7 @@ class Archive__CpioNewAsciiFormat():
     def is_listable( self ): return True
     def is_radoable( self ): return False
     
+    @Common.traced( 'list' )
     def list( self ):
         return [
             containedFile.get('@filename' )
@@ -4029,7 +8236,7 @@ class Archive__CpioNewAsciiFormat():
             
             # lol, what a ridiculous way to end it
             # 
-            print repr( fileName )
+            LOG_CPIO.debug( 'entry %r', fileName )
             if fileName == 'TRAILER!!!' and header.get('filesize') == 0:
                 break
             
@@ -4041,7 +8248,8 @@ class Archive__CpioNewAsciiFormat():
             cursor.skip( header.get('filesize') )
 
         if cursor.tell() != fullSize:
-            print 'upcoming', repr( cursor.read( fullSize - cursor.tell() ) )
+            if LOG_CPIO.debugging:
+                LOG_CPIO.debug( 'trailing data %r', cursor.read( fullSize - cursor.tell() ) )
             attributes = Attributes()
             attributes.put( '@filename', '@trailingData' )
             yield attributes
@@ -4070,3 +8278,14 @@ class Archive__CpioNewAsciiFormat():
         # round up to next multiple of 4
         return namesize + ( 4 - ( ( ( namesize + offset ) % 4 ) or 4 ) )
     
+
+
+#########################################################################################
+## plugins
+##   UU_PLUGINS names modules, separated by commas, imported once the built in models
+##   are registered. they should only call lazy_model, leaving the formats themselves
+##   to be imported when first detected ( see LazyModel )
+
+for pluginIndex in os.environ.get( 'UU_PLUGINS', '' ).split( ',' ):
+    if pluginIndex.strip():
+        __import__( pluginIndex.strip() )
@@ -1,5 +1,6 @@
 
 import sys
+import errno
 
 import subprocess
 from contextlib import contextmanager
@@ -18,13 +19,65 @@ def main():
         fail( 'given filename does not appear to be a file : %s' % repr( targetFilename ) )
         return
     
+    # reads are only accounted for when someone is going to ask for them
+    # 
+    if '-io-stats' in arguments:
+        uu.Common.set_io_accounting( True )
+    
+    # spans are only recorded when they are going to be written out, after the
+    # last command has run
+    # 
+    traceFilename = None
+    if '-trace' in arguments:
+        at = arguments.index( '-trace' )
+        if at + 1 >= len( arguments ):
+            fail( '-trace needs the filename to write the trace to' )
+            return
+        
+        traceFilename = arguments[ at + 1 ]
+        del arguments[ at : at + 2 ]
+        
+        uu.Common.set_tracing( True )
+    
+    # records for programs written to stdout must not be mixed with the echo of the
+    # commands and the comments, so those go to stderr instead when a format other
+    # than text is asked for before any -output
+    # 
+    stdout = sys.stdout
+    for at, argument in enumerate( arguments ):
+        if argument == '-output':
+            break
+        if argument == '-format' and arguments[ at + 1 : at + 2 ] != [ 'text' ]:
+            sys.stdout = sys.stderr
+            break
+    
+    # the trace is written however the commands end, failing runs being the ones
+    # most worth tracing, and fail() leaving through sys.exit
+    # 
+    try:
+        inspect( targetFilename, arguments, stdout )
+    finally:
+        if traceFilename:
+            with open( traceFilename, 'w' ) as traceFile:
+                uu.Common.write_trace( traceFile )
+            print '# trace written to %s' % repr( traceFilename )
+
+def inspect( targetFilename, arguments, stdout ):
     with open( targetFilename ) as ff:
         print '-open %s' % repr( targetFilename )
         
-        fileBlockDevice = uu.File__BlockDevice(
-            name    = 'initial-file-blockdevice' ,
-            fileobj = ff                         ,
-            )
+        # regular files are mapped into memory, anything else ( devices, pipes ) is read
+        # 
+        if uu.Common.is_mappable( ff ):
+            fileBlockDevice = uu.Mmap__BlockDevice(
+                name    = 'initial-mmap-blockdevice' ,
+                fileobj = ff                         ,
+                )
+        else:
+            fileBlockDevice = uu.File__BlockDevice(
+                name    = 'initial-file-blockdevice' ,
+                fileobj = ff                         ,
+                )
         
         rado = uu.RadoBlock( 
             name        = 'initial-file-rado-block' ,
@@ -33,6 +86,22 @@ def main():
         
         currentModel = uu.ModelUnknownBlob( rado )
         
+        # listings, metadata and stats go through the writer, text unless -format
+        # asks for something meant for programs, to stdout unless -output says where
+        # 
+        outputFormat = 'text'
+        outputFile   = stdout
+        writer       = uu.Common.attributes_writer( outputFormat, outputFile )
+        
+        # the rado of the current model is kept while the model is, so -scan, -ff
+        # and -assume on the same data reuse what probing it already found out
+        # 
+        radoOf = [ None, None ]
+        def current_rado():
+            if radoOf[0] is not currentModel:
+                radoOf[:] = [ currentModel, currentModel.rado() ]
+            return radoOf[1]
+        
         while arguments:
             
             argument = arguments.pop( 0 )
@@ -68,22 +137,50 @@ def main():
                                 continue
                     
                     if currentModel.is_radoable():
-                        compatibleModel = uu.first_compatible_model( currentModel.rado() )
+                        compatibleModel = uu.first_compatible_model( current_rado() )
                         if not compatibleModel:
                             fail( 'could not fast forward, unknown binary type in chain' )
                         else:
                             print '-ff -assume %s' % repr( compatibleModel.name )
-                            currentModel = compatibleModel( currentModel.rado() )
+                            currentModel = compatibleModel( current_rado() )
                             continue
                     
                     raise Exception( 'model is neither listable nor scanable' )
                 
                 continue
                 
+            if argument == '-format':
+                outputFormat = arguments.pop( 0 )
+                print argument, repr( outputFormat )
+                if outputFormat not in uu.ATTRIBUTES_FORMATS:
+                    fail( 'format must be one of %s' % ', '.join( uu.ATTRIBUTES_FORMATS ) )
+                writer = uu.Common.attributes_writer( outputFormat, outputFile )
+                continue
+            
+            if argument == '-output':
+                outputFilename = arguments.pop( 0 )
+                print argument, repr( outputFilename )
+                if outputFile is not stdout:
+                    outputFile.close()
+                outputFile = open( outputFilename, 'wb' )
+                writer     = uu.Common.attributes_writer( outputFormat, outputFile )
+                continue
+            
+            if argument == '-metadata':
+                print argument
+                if hasattr( currentModel, 'metadata' ):
+                    writer.write( currentModel.metadata() )
+                else:
+                    print '# model %s has no metadata' % repr( currentModel.name )
+                continue
+            
             if argument == '-list':
                 print argument
                 if currentModel.is_listable():
-                    print repr( currentModel.list() )
+                    if outputFormat == 'text' and outputFile is stdout:
+                        print repr( currentModel.list() )
+                    else:
+                        writer.write( currentModel.list() )
                     continue
                 else:
                     print '# model %s cannot list' % repr( currentModel.name )
@@ -92,7 +189,7 @@ def main():
                 print argument
                 if currentModel.is_radoable():
                     hadany = False
-                    for compatible, compatibleModel in uu.determine_compatible_models( currentModel.rado() ):
+                    for compatible, compatibleModel in uu.determine_compatible_models( current_rado() ):
                         if compatible:
                             hadany = True
                             print '# == %s' % repr( compatibleModel.name )
@@ -111,21 +208,56 @@ def main():
                 if not currentModel.is_radoable():
                     fail( 'current model is not radoable' )
                 else:
-                    compatibleModel = uu.first_compatible_model( currentModel.rado() )
+                    compatibleModel = uu.first_compatible_model( current_rado() )
                     if not compatibleModel:
                         fail( 'no compatible model to assume :(' )
                     else:
                         print '# assumed %s' % repr( compatibleModel.name )
-                        currentModel = compatibleModel( currentModel.rado() )
+                        currentModel = compatibleModel( current_rado() )
                         continue
             
             if argument == '-as':
                 target = arguments.pop( 0 )
                 print argument, repr( target )
-                currentModel = uu.model_by_name( target )( currentModel.rado() )
+                currentModel = uu.model_by_name( target )( current_rado() )
                 print '# !!', target
                 continue
             
+            if argument == '-memoize':
+                # change how many bytes a memoization may hold from here on
+                name   = arguments.pop( 0 )
+                budget = arguments.pop( 0 )
+                print argument, repr( name ), repr( budget )
+                uu.Common.set_memoization_budget( name, uu.Common.parse_size( budget ) )
+                continue
+            
+            if argument == '-memoize-stats':
+                print argument
+                writer.write( uu.Common.memoization_stats() )
+                continue
+            
+            if argument == '-memory-stats':
+                print argument
+                writer.write( uu.Common.memory_stats() )
+                continue
+            
+            if argument == '-check-threads':
+                # reads the current rado from many threads at once, and compares with one
+                threads = int( arguments.pop( 0 ) )
+                print argument, threads
+                if not currentModel.is_radoable():
+                    fail( 'current model is not radoable' )
+                result = uu.Common.check_threads( current_rado(), threads )
+                writer.write( result )
+                if result.get( 'mismatches' ) or result.get( 'failures' ):
+                    fail( 'threads read differently from a single thread' )
+                continue
+            
+            if argument == '-io-stats':
+                print argument
+                writer.write( uu.Common.io_stats() )
+                continue
+            
             if argument == '-dump':
                 print argument
                 
@@ -143,16 +275,23 @@ def main():
             if argument == '-hex':
                 print argument
                 
-                cursor = currentModel.rado().cursor()
-                
                 def two( v ):
                     if len( v ) == 1: return '0' + v
                     return v
                 
-                while True:
-                    grabbed = cursor.read( 16 )
-                    if not grabbed:
-                        break
+                def lines():
+                    # the chunks are cut into sixteens, carrying any remainder into the next
+                    remainder = ''
+                    for chunk in currentModel.rado().iter_chunks():
+                        chunk = remainder + chunk
+                        split = len( chunk ) - len( chunk ) % 16
+                        for offset in xrange( 0, split, 16 ):
+                            yield chunk[ offset : offset + 16 ]
+                        remainder = chunk[ split: ]
+                    if remainder:
+                        yield remainder
+                
+                for grabbed in lines():
                     
                     print ' '.join([
                         two( hex( ord( c ) ).split('x')[1] )
@@ -193,7 +332,7 @@ def main():
                     # keeps us from accidentally closing stdout when we're done pumping out file to it
                     @contextmanager
                     def opener():
-                        yield sys.stdout
+                        yield stdout
                     
                 elif not target.startswith( 'COPY-' ):
                     raise Exception( 'target must begin COPY-' )
@@ -202,14 +341,27 @@ def main():
                     def opener():
                         return open( target, 'w' )
                 
+                # holes are never read. a file target seeks over them and is left sparse,
+                # stdout has the zeros written out instead
+                
+                rado = currentModel.rado()
+                
                 with opener() as f:
-                    cursor = currentModel.rado().cursor()
-                    while True:
-                        blob = cursor.read( 2048 )
-                        if blob:
-                            f.write( blob )
+                    for position, length, isData in rado.extents():
+                        if isData:
+                            for chunk in rado.iter_chunks( start = position, end = position + length ):
+                                f.write( chunk )
+                        elif target != '-':
+                            f.seek( length, 1 )
                         else:
-                            break
+                            zeros = '\0' * min( length, uu.CHUNK_SIZE )
+                            while length:
+                                f.write( zeros[ : length ] )
+                                length -= min( length, len( zeros ) )
+                    
+                    if target != '-':
+                        # a trailing hole has only been seeked over, so size the file to it
+                        f.truncate()
                     continue
             
             if argument == '-magic':
@@ -221,18 +373,24 @@ def main():
                     stderr = subprocess.PIPE ,
                 )
                 
-                currentRado = currentModel.rado()
+                # the data is streamed over rather than read whole
+                # file hangs up once it has seen enough to decide, which is fine
+                # 
+                try:
+                    for chunk in currentModel.rado().iter_chunks():
+                        p.stdin.write( chunk )
+                except IOError, e:
+                    if e.errno != errno.EPIPE:
+                        raise
                 
-                ( stdout, stderr ) = p.communicate(
-                    currentRado.cursor().read( currentRado.size() )
-                )
+                ( magicOut, magicErr ) = p.communicate()
                 
                 if p.returncode != 0:
-                    raise Exception( '"file" command failed with %s' % repr( stderr ) )
+                    raise Exception( '"file" command failed with %s' % repr( magicErr ) )
                 
                 else:
                     print '# -magic : output of "file -"'
-                    print stdout
+                    print magicOut
                 
                 continue
             
@@ -264,6 +422,9 @@ def main():
         print '# done reads:%s' % (
             repr( fileBlockDevice.get_blocks_read() ) ,
             )
+        
+        if outputFile is not stdout:
+            outputFile.close()
 
 def fail( message ):
     print '# ! %s' % message